@@ -0,0 +1,298 @@
+"""성능 측정 도구. 임시 디렉토리를 루트로 쓰는 SFTP 서버(paramiko ServerInterface/SFTPServerInterface)를 이 프로세스 안에서 띄우고,
+GUI와 같은 코드 경로(목록 읽기 iter_remote_listing, 업로드/다운로드/서버 간 전송 TransferEngine)로 합성 데이터셋을 보내
+초당 파일 수, MB/s, 최대 메모리를 JSON 기준값으로 출력합니다. 실제 서버나 저장된 프로필은 쓰지 않습니다.
+
+    python bench.py --quick
+    python bench.py --latency 40 --bandwidth 10240 --output baseline.json
+    python bench.py --datasets tiny --scenarios listing upload --baseline baseline.json
+
+--latency(왕복 밀리초)와 --bandwidth(KB/s)를 주면 클라이언트와 서버 사이에 지연과 대역폭 제한을 넣는 중계 소켓을 둡니다.
+--baseline을 주면 같은 (데이터셋, 시나리오) 결과와의 속도 비율을 함께 기록합니다.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import tracemalloc
+from threading import Thread
+from queue import Queue
+from core import (TRANSFER_WORKERS, SshConnectionPool, TokenBucket, TransferEngine, TransferProgress,
+                  iter_remote_listing, paramiko, remote_join, with_reconnect)
+try: import resource
+except ImportError: resource = None     # Windows에는 없음 (최대 RSS를 기록하지 않음)
+
+DATASETS = ('huge', 'tiny', 'deep')
+SCENARIOS = ('listing', 'upload', 'download', 'relay')
+HUGE_FILE_MB = 256          # 'huge' 데이터셋의 파일 크기 (MB, SEGMENT_THRESHOLD 이상이면 구간 분할 전송 경로를 탑니다)
+TINY_FILE_COUNT = 100000    # 'tiny' 데이터셋의 한 디렉토리에 만드는 파일 수
+TINY_FILE_SIZE = 256        # 작은 파일 하나의 크기 (바이트)
+DEEP_TREE_DEPTH = 10        # 'deep' 데이터셋의 디렉토리 깊이
+DEEP_TREE_BRANCHING = 2     # 'deep' 데이터셋의 디렉토리당 하위 디렉토리 수
+DEEP_TREE_FILES = 5         # 'deep' 데이터셋의 디렉토리당 파일 수
+DEEP_FILE_SIZE = 4096       # 'deep' 데이터셋의 파일 하나의 크기 (바이트)
+QUICK_PRESET = {'huge_mb': 16, 'tiny_files': 2000, 'depth': 6}
+LINK_CHUNK_SIZE = 64 * 1024 # 지연/대역폭 중계 소켓이 한 번에 옮기는 최대 바이트
+
+class _BenchServer(paramiko.ServerInterface):
+    """비밀번호를 묻지 않고 세션 채널만 허용하는 측정용 서버"""
+    def check_auth_password(self, username, password): return paramiko.AUTH_SUCCESSFUL
+    def get_allowed_auths(self, username): return 'password'
+    def check_channel_request(self, kind, chanid):
+        return paramiko.OPEN_SUCCEEDED if kind == 'session' else paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+class _BenchHandle(paramiko.SFTPHandle):
+    def stat(self):
+        try: return paramiko.SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        try:
+            if attr.st_size is not None: self.writefile.truncate(attr.st_size)
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+class _BenchSftp(paramiko.SFTPServerInterface):
+    """서버 루트(임시 디렉토리)를 '/'로 보여 주는 SFTP 하위 시스템. 클라이언트 경로는 항상 루트 안으로 바뀝니다."""
+    def __init__(self, server, *args, root=None, **kwargs):
+        super().__init__(server, *args, **kwargs); self.root = root
+
+    def _real(self, path): return os.path.join(self.root, self.canonicalize(path).lstrip('/'))
+
+    def _call(self, func, *args):
+        try: func(*args)
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+        return paramiko.SFTP_OK
+
+    def canonicalize(self, path): return os.path.normpath('/' + path).replace('\\', '/').replace('//', '/')
+
+    def list_folder(self, path):
+        try:
+            result = []
+            with os.scandir(self._real(path)) as entries:
+                for entry in entries:
+                    attr = paramiko.SFTPAttributes.from_stat(entry.stat(follow_symlinks=False)); attr.filename = entry.name; result.append(attr)
+            return result
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try: return paramiko.SFTPAttributes.from_stat(os.stat(self._real(path)))
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        try: return paramiko.SFTPAttributes.from_stat(os.lstat(self._real(path)))
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        try: fd = os.open(self._real(path), flags | getattr(os, 'O_BINARY', 0), 0o644)
+        except OSError as e: return paramiko.SFTPServer.convert_errno(e.errno)
+        if flags & os.O_WRONLY: mode = 'ab' if flags & os.O_APPEND else 'wb'
+        elif flags & os.O_RDWR: mode = 'a+b' if flags & os.O_APPEND else 'r+b'
+        else: mode = 'rb'
+        handle = _BenchHandle(flags); handle.filename = path; handle.readfile = handle.writefile = os.fdopen(fd, mode); return handle
+
+    def remove(self, path): return self._call(os.remove, self._real(path))
+    def rename(self, oldpath, newpath): return self._call(os.rename, self._real(oldpath), self._real(newpath))
+    def posix_rename(self, oldpath, newpath): return self._call(os.replace, self._real(oldpath), self._real(newpath))
+    def mkdir(self, path, attr): return self._call(os.mkdir, self._real(path))
+    def rmdir(self, path): return self._call(os.rmdir, self._real(path))
+
+    def chattr(self, path, attr):
+        real = self._real(path)
+        def apply():
+            if attr.st_size is not None: os.truncate(real, attr.st_size)
+            if attr.st_atime is not None and attr.st_mtime is not None: os.utime(real, (attr.st_atime, attr.st_mtime))
+        return self._call(apply)
+
+class _Link:
+    """클라이언트와 서버 사이의 중계 소켓. 방향마다 편도 지연(왕복의 절반)을 주고, 대역폭은 방향마다 TokenBucket으로 제한합니다.
+    보낸 시각을 붙여 대기열에 넣으므로 지연 중에도 뒤따르는 데이터가 계속 흘러(파이프라이닝) 실제 회선처럼 동작합니다."""
+    def __init__(self, target_port, latency_ms=0, bandwidth=0):
+        self.target_port = target_port; self.delay = latency_ms / 2000; self.bandwidth = bandwidth
+        self.sock = socket.socket(); self.sock.bind(('127.0.0.1', 0)); self.sock.listen(16); self.port = self.sock.getsockname()[1]
+        Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try: client, _ = self.sock.accept()
+            except OSError: return
+            server = socket.create_connection(('127.0.0.1', self.target_port))
+            for src, dst in ((client, server), (server, client)): self._pipe(src, dst)
+
+    def _pipe(self, src, dst):
+        chunks = Queue(); bucket = TokenBucket(self.bandwidth)
+        def read():
+            while True:
+                try: data = src.recv(LINK_CHUNK_SIZE)
+                except OSError: data = b''
+                chunks.put((time.monotonic() + self.delay, data))
+                if not data: return
+        def write():
+            while True:
+                due, data = chunks.get()
+                if not data: break
+                wait = due - time.monotonic()
+                if wait > 0: time.sleep(wait)
+                bucket.consume(len(data))
+                try: dst.sendall(data)
+                except OSError: break
+            try: dst.shutdown(socket.SHUT_WR)
+            except OSError: pass
+        Thread(target=read, daemon=True).start(); Thread(target=write, daemon=True).start()
+
+    def close(self): self.sock.close()
+
+class BenchServer:
+    """root를 '/'로 보여 주는 SFTP 서버를 백그라운드 스레드에서 실행합니다. latency_ms나 bandwidth(바이트/초)가 있으면
+    port는 지연/대역폭 중계 소켓의 포트입니다."""
+    def __init__(self, root, latency_ms=0, bandwidth=0):
+        self.root = root; self.host_key = paramiko.RSAKey.generate(2048); self.transports = []
+        self.sock = socket.socket(); self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', 0)); self.sock.listen(16); self.port = self.sock.getsockname()[1]
+        Thread(target=self._accept, daemon=True).start()
+        self.link = _Link(self.port, latency_ms, bandwidth) if latency_ms or bandwidth else None
+        if self.link: self.port = self.link.port
+
+    def _accept(self):
+        while True:
+            try: client, _ = self.sock.accept()
+            except OSError: return
+            transport = paramiko.Transport(client); transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler('sftp', paramiko.SFTPServer, _BenchSftp, root=self.root)
+            transport.start_server(server=_BenchServer()); self.transports.append(transport)
+
+    def close(self):
+        if self.link: self.link.close()
+        self.sock.close()
+        for transport in self.transports: transport.close()
+
+def _write_random(path, size):
+    with open(path, 'wb') as f:
+        for offset in range(0, size, 1024 * 1024): f.write(os.urandom(min(1024 * 1024, size - offset)))
+
+def make_dataset(name, root, options):
+    """합성 데이터셋을 root/name 아래에 만들고 (파일 수, 바이트 수)를 돌려줍니다. 내용은 압축되지 않도록 무작위 바이트입니다."""
+    base = os.path.join(root, name); os.makedirs(base)
+    if name == 'huge':
+        size = options.huge_mb * 1024 * 1024; _write_random(os.path.join(base, 'huge.bin'), size); return 1, size
+    if name == 'tiny':
+        payload = os.urandom(TINY_FILE_SIZE)
+        for index in range(options.tiny_files):
+            with open(os.path.join(base, f"f{index:06d}.dat"), 'wb') as f: f.write(payload)
+        return options.tiny_files, options.tiny_files * TINY_FILE_SIZE
+    files = 0; payload = os.urandom(DEEP_FILE_SIZE); level = [base]
+    for depth in range(options.depth):
+        next_level = []
+        for directory in level:
+            for index in range(DEEP_TREE_FILES):
+                with open(os.path.join(directory, f"f{index}.dat"), 'wb') as f: f.write(payload)
+            files += DEEP_TREE_FILES
+            if depth + 1 < options.depth:
+                for index in range(DEEP_TREE_BRANCHING): child = os.path.join(directory, f"d{index}"); os.mkdir(child); next_level.append(child)
+        level = next_level
+    return files, files * DEEP_FILE_SIZE
+
+def list_tree(connection, path):
+    """GUI 목록과 같은 경로(채널 풀 + 재연결 + iter_remote_listing 묶음)로 path 아래 모든 디렉토리를 차례로 읽습니다."""
+    entries = 0; pending = [path]
+    while pending:
+        directory = pending.pop()
+        def read():
+            with connection.channels.channel() as sftp: return [entry for batch in iter_remote_listing(sftp, directory) for entry in batch]
+        listing = with_reconnect([connection], read); entries += len(listing)
+        pending.extend(remote_join(directory, entry.name) for entry in listing if entry.is_dir)
+    return entries
+
+def _peak_rss_kb():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def measure(dataset, scenario, files, size, func, trace_memory):
+    """func를 한 번 실행하고 결과 한 줄을 만듭니다. peak_memory는 --trace-memory일 때만 (서버 스레드 할당도 포함)."""
+    if trace_memory: tracemalloc.start(); tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try: count = func()
+    finally:
+        seconds = time.perf_counter() - started; peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory: tracemalloc.stop()
+    files = count if scenario == 'listing' else files
+    return {'dataset': dataset, 'scenario': scenario, 'files': files, 'bytes': 0 if scenario == 'listing' else size, 'seconds': round(seconds, 3),
+            'files_per_s': round(files / seconds, 1) if seconds else None,
+            'mb_per_s': round(size / seconds / 1024 / 1024, 2) if seconds and scenario != 'listing' else None,
+            'peak_memory': peak, 'max_rss_kb': _peak_rss_kb()}
+
+def run_benchmarks(options, log=lambda message: None):
+    """선택한 데이터셋마다 로컬에 만들고, 업로드 → 목록 → 다운로드 → 서버 간 전송 순서로 측정합니다.
+    목록/다운로드/서버 간 전송은 업로드된 원격 사본을 원본으로 쓰므로 업로드를 빼도 먼저 올려 둡니다(측정하지 않음)."""
+    work = tempfile.mkdtemp(prefix="sshfe-bench-"); local = os.path.join(work, 'local'); remote = os.path.join(work, 'remote')
+    for path in (local, os.path.join(work, 'download'), os.path.join(remote, 'upload'), os.path.join(remote, 'relay')): os.makedirs(path)
+    server = BenchServer(remote, options.latency, options.bandwidth * 1024); pool = SshConnectionPool(); results = []
+    try:
+        connection, _ = pool.acquire('127.0.0.1', server.port, 'bench', 'bench')
+        relay_dst, _ = pool.acquire('127.0.0.1', server.port, 'bench-dst', 'bench')
+        def transfer(kind, items, src=None, dst=None):
+            engine = TransferEngine(kind, src and src.channels, dst and dst.channels, options.workers)
+            return engine.run(items, TransferProgress(f"bench {kind}"))
+        for name in options.datasets:
+            log(f"데이터셋 생성: {name}"); files, size = make_dataset(name, local, options)
+            source = os.path.join(local, name); uploaded = f"/upload/{name}"
+            steps = [('upload', lambda: transfer('upload', [(source, uploaded, True)], dst=connection)),
+                     ('listing', lambda: list_tree(connection, uploaded)),
+                     ('download', lambda: transfer('download', [(uploaded, os.path.join(work, 'download', name), True)], src=connection)),
+                     ('relay', lambda: transfer('relay', [(uploaded, f"/relay/{name}", True)], connection, relay_dst))]
+            for scenario, func in steps:
+                if scenario not in options.scenarios:
+                    if scenario == 'upload': func()
+                    continue
+                log(f"측정: {name} / {scenario}"); result = measure(name, scenario, files, size, func, options.trace_memory); results.append(result)
+                log(f"  {result['seconds']}초, {result['files_per_s']} 파일/s, {result['mb_per_s']} MB/s")
+            for path in (source, os.path.join(work, 'download', name), os.path.join(remote, 'upload', name), os.path.join(remote, 'relay', name)):
+                shutil.rmtree(path, ignore_errors=True)
+    finally: pool.close_all(); server.close(); shutil.rmtree(work, ignore_errors=True)
+    return results
+
+def compare(results, baseline):
+    """baseline 보고서와 같은 (데이터셋, 시나리오)가 있으면 speedup(기준 대비 시간 비율, 1보다 크면 빨라짐)을 붙입니다."""
+    previous = {(r['dataset'], r['scenario']): r for r in baseline.get('results', [])}
+    for result in results:
+        before = previous.get((result['dataset'], result['scenario']))
+        if before and result['seconds']: result['speedup'] = round(before['seconds'] / result['seconds'], 2)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bench.py", description="SSH File Explorer 성능 측정 (프로세스 안의 SFTP 서버 사용)")
+    parser.add_argument('--datasets', nargs='+', choices=DATASETS, default=list(DATASETS), help="측정할 데이터셋")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS), help="측정할 시나리오")
+    parser.add_argument('--quick', action='store_true', help="작은 데이터셋으로 빠르게 측정 (개발 중 확인용)")
+    parser.add_argument('--huge-mb', type=int, default=HUGE_FILE_MB, help="큰 파일 하나의 크기 (MB)")
+    parser.add_argument('--tiny-files', type=int, default=TINY_FILE_COUNT, help="작은 파일 수")
+    parser.add_argument('--depth', type=int, default=DEEP_TREE_DEPTH, help="깊은 트리의 깊이")
+    parser.add_argument('--workers', type=int, default=TRANSFER_WORKERS, help="동시 전송 수")
+    parser.add_argument('--latency', type=int, default=0, help="주입할 왕복 지연 (밀리초)")
+    parser.add_argument('--bandwidth', type=int, default=0, help="주입할 대역폭 제한 (KB/s, 0=무제한)")
+    parser.add_argument('--trace-memory', action='store_true', help="tracemalloc으로 시나리오별 최대 메모리를 잽니다 (측정이 느려짐)")
+    parser.add_argument('--baseline', help="비교할 이전 보고서 (JSON)")
+    parser.add_argument('--output', help="보고서를 쓸 파일 (기본: 표준 출력)")
+    return parser
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if options.quick: options.huge_mb, options.tiny_files, options.depth = QUICK_PRESET['huge_mb'], QUICK_PRESET['tiny_files'], QUICK_PRESET['depth']
+    results = run_benchmarks(options, lambda message: print(message, file=sys.stderr, flush=True))
+    if options.baseline:
+        with open(options.baseline, 'r', encoding='utf-8') as f: compare(results, json.load(f))
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(), 'paramiko': paramiko.__version__, 'platform': platform.platform(),
+              'settings': {'huge_mb': options.huge_mb, 'tiny_files': options.tiny_files, 'depth': options.depth, 'workers': options.workers,
+                           'latency_ms': options.latency, 'bandwidth_kb': options.bandwidth}, 'results': results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f: f.write(text + "\n")
+    else: print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""명령줄(배치) 도구. 저장된 프로필(CONFIG_DIR)로 연결해 GUI 없이 전송하며, tkinter와 ttkthemes를 불러오지 않습니다.
+진행 상황과 결과는 한 줄에 하나씩 JSON 객체로 표준 출력에 씁니다 (--format text 이면 사람이 읽는 형식).
+
+    python cli.py ls user@10.0.0.5:22 /var/log
+    python cli.py find user@10.0.0.5 /var/log --name '*.gz' --days 7 --depth 3
+    python cli.py du user@10.0.0.5 /var/log /srv/app
+    python cli.py upload user@10.0.0.5 ./build ./README.md /srv/app --workers 8
+    python cli.py download user@10.0.0.5 /var/log/app.log ./logs
+    python cli.py relay user@src-host user@backup-host /data/dump.sql /backup --bandwidth 10240
+    python cli.py fanout user@src-host /data/release /srv --to user@web1 --to user@web2 --to user@web3
+    python cli.py sync user@10.0.0.5 ./site /var/www --strict
+
+프로필이 없는 호스트는 환경 변수 SSHFE_PASSWORD의 비밀번호로 연결합니다.
+--metrics를 주면 끝날 때 호스트별 작업 시간과 요청 수를 'metrics' 이벤트로 출력합니다.
+종료 코드: 0 성공, 1 실패, 130 취소(Ctrl+C, 저널에 남은 위치부터 GUI나 같은 명령으로 이어받을 수 있음)
+"""
+import argparse
+import json
+import os
+import posixpath
+import stat
+import sys
+import time
+from threading import Thread, Event, Lock
+from core import (METRICS, METRICS_LOG_PATH, TRANSFER_WORKERS, FanoutTransfer, SearchQuery, SshConnectionPool, TokenBucket, TransferCancelled, TransferEngine, TransferJournal, TransferProgress,
+                  load_profile, remote_disk_usage, remote_free_space, remote_join, remote_search)
+
+PROGRESS_INTERVAL = 1.0     # 진행 상황을 출력하는 주기 (초)
+
+class CliError(Exception):
+    """사용자에게 그대로 보여 줄 명령줄 오류"""
+
+class Reporter:
+    """이벤트를 JSON 한 줄(기본) 또는 사람이 읽는 한 줄로 출력합니다. 작업 스레드에서도 부르므로 한 줄을 잠금 안에서 한 번에 씁니다."""
+    def __init__(self, fmt='json'): self.fmt = fmt; self._lock = Lock()
+
+    def emit(self, event, **fields):
+        if self.fmt == 'json': stream = sys.stdout; line = json.dumps({'event': event, **fields}, ensure_ascii=False)
+        else:
+            stream = sys.stderr if event in ('status', 'progress') else sys.stdout
+            line = f"[{event}] " + (fields.get('message') or ", ".join(f"{key}={value}" for key, value in fields.items()))
+        with self._lock: stream.write(line + "\n"); stream.flush()
+
+    def progress(self, progress):
+        done_bytes, done_files, rate, eta = progress.snapshot()
+        if self.fmt == 'json':
+            self.emit('progress', label=progress.label, bytes=done_bytes, total_bytes=progress.total_bytes, files=done_files,
+                      total_files=progress.total_files, rate=round(rate), eta=None if eta is None else round(eta, 1))
+        else: self.emit('progress', message=progress.describe())
+
+def parse_profile(spec):
+    """'user@host[:port]' → (user, host, port). 포트가 없으면 22입니다."""
+    user, sep, host = spec.rpartition('@')
+    if not sep or not user or not host: raise CliError(f"프로필 형식은 user@host[:port] 입니다: {spec}")
+    host, _, port = host.partition(':')
+    return user, host, port or '22'
+
+def connect(pool, spec):
+    user, host, port = parse_profile(spec); config = load_profile(user, host, port)
+    password = config.get('pwd') if config else os.environ.get('SSHFE_PASSWORD')
+    if password is None: raise CliError(f"저장된 프로필이 없습니다: {spec} (SSHFE_PASSWORD 환경 변수로 비밀번호를 줄 수 있습니다)")
+    connection, _ = pool.acquire(host, int(port), user, password, (config or {}).get('transport'))
+    return connection
+
+def remote_is_dir(connection, path):
+    with connection.channels.channel() as sftp: return stat.S_ISDIR(sftp.stat(path).st_mode)
+
+def run_engine(reporter, label, engine, items, bandwidth):
+    """엔진을 작업 스레드에서 실행하고, 메인 스레드는 진행 상황을 출력하며 Ctrl+C를 받으면 취소를 알립니다."""
+    progress = TransferProgress(label); progress.limiter = TokenBucket(bandwidth * 1024); result = {}; started = time.monotonic()
+    def worker():
+        try: result['count'] = engine.run(items, progress)
+        except BaseException as e: result['error'] = e
+    thread = Thread(target=worker, daemon=True); thread.start()
+    while thread.is_alive():
+        try: thread.join(PROGRESS_INTERVAL)
+        except KeyboardInterrupt: progress.cancel.set(); reporter.emit('status', message="취소 중...")
+        reporter.progress(progress)
+    if 'error' in result: raise result['error']
+    return result['count'], progress.snapshot()[0], round(time.monotonic() - started, 2)
+
+def command_ls(args, pool, reporter):
+    connection = connect(pool, args.profile)
+    with connection.channels.channel() as sftp:
+        for attr in sftp.listdir_iter(args.path):
+            reporter.emit('entry', name=attr.filename, is_dir=stat.S_ISDIR(attr.st_mode or 0), size=attr.st_size, mtime=attr.st_mtime)
+
+def command_find(args, pool, reporter):
+    """찾은 항목을 받는 대로 출력합니다. Ctrl+C는 검색을 멈추고 취소로 끝냅니다."""
+    connection = connect(pool, args.profile); cancel = Event(); result = {}
+    query = SearchQuery(args.name, args.regex, args.min_size, args.max_size, time.time() - args.days * 86400 if args.days else None, None, args.depth)
+    def emit(entries):
+        for entry in entries: reporter.emit('entry', path=remote_join(args.path, entry.name), is_dir=entry.is_dir, size=entry.size, mtime=entry.mtime)
+    def worker():
+        try: result['found'] = remote_search(connection, args.path, query, emit, cancel)
+        except BaseException as e: result['error'] = e
+    thread = Thread(target=worker, daemon=True); thread.start()
+    while thread.is_alive():
+        try: thread.join(PROGRESS_INTERVAL)
+        except KeyboardInterrupt: cancel.set()
+    if 'error' in result: raise result['error']
+    if cancel.is_set(): raise TransferCancelled()
+    count, method = result['found']; reporter.emit('done', label='find', files=count, method=method)
+
+def command_du(args, pool, reporter):
+    connection = connect(pool, args.profile); usages, method = remote_disk_usage(connection, args.paths)
+    for path, (size, count) in usages.items(): reporter.emit('usage', path=path, bytes=size, entries=count, method=method)
+    reporter.emit('done', label='du', bytes=sum(size for size, _ in usages.values()), free=remote_free_space(connection.client, args.paths[0]))
+
+def command_transfer(args, pool, reporter):
+    """upload / download / relay / sync 공통 처리: 연결하고, (원본, 대상, 디렉토리 여부) 항목을 만든 뒤 엔진을 실행합니다."""
+    local_sources = args.sources if args.command == 'upload' else [args.local] if args.command == 'sync' and not args.download else []
+    missing = [path for path in local_sources if not os.path.exists(path)]
+    if missing: raise CliError(f"로컬 경로가 없습니다: {', '.join(missing)}")
+    if args.command == 'upload':
+        dst = connect(pool, args.profile); src = None; kind = 'upload'
+        items = [(os.path.abspath(path), remote_join(args.dest, os.path.basename(os.path.abspath(path))), os.path.isdir(path)) for path in args.sources]
+    elif args.command == 'download':
+        src = connect(pool, args.profile); dst = None; kind = 'download'
+        items = [(path, os.path.join(args.dest, posixpath.basename(path.rstrip('/'))), remote_is_dir(src, path)) for path in args.sources]
+    elif args.command == 'relay':
+        src = connect(pool, args.source_profile); dst = connect(pool, args.dest_profile); kind = 'relay'
+        items = [(path, remote_join(args.dest, posixpath.basename(path.rstrip('/'))), remote_is_dir(src, path)) for path in args.sources]
+    else:
+        # sync는 원본 디렉토리의 내용을 대상 디렉토리와 같게 맞춥니다(대상 아래에 원본 이름의 폴더를 만들지 않습니다).
+        connection = connect(pool, args.profile)
+        if args.download: src, dst, kind, items = connection, None, 'download', [(args.remote, os.path.abspath(args.local), True)]
+        else: src, dst, kind, items = None, connection, 'upload', [(os.path.abspath(args.local), args.remote, True)]
+    sync = args.command == 'sync'
+    engine = TransferEngine(kind, src and src.channels, dst and dst.channels, args.workers, status=lambda message: reporter.emit('status', message=message),
+                            journal=None if args.no_journal else TransferJournal(), sync=sync, strict=sync and args.strict,
+                            archive=args.tar, compress=args.gzip, verify=args.verify)
+    count, size, seconds = run_engine(reporter, args.command, engine, items, args.bandwidth)
+    reporter.emit('done', label=args.command, files=count, bytes=size, seconds=seconds)
+
+def command_fanout(args, pool, reporter):
+    """원본을 한 번만 읽어 --to로 준 모든 서버에 보냅니다. 대상마다 'destination' 이벤트를 내고, 하나라도 실패하면 종료 코드 1입니다."""
+    src = connect(pool, args.source_profile); destinations = {}
+    for spec in dict.fromkeys(args.to):
+        try: destinations[spec] = connect(pool, spec)
+        except CliError: raise
+        except Exception as e: reporter.emit('destination', profile=spec, sent=0, failed=0, dropped=f"{type(e).__name__}: {e}")
+    if not destinations: raise CliError("연결된 대상 서버가 없습니다")
+    items = [(path, remote_join(args.dest, posixpath.basename(path.rstrip('/'))), remote_is_dir(src, path)) for path in args.sources]
+    transfer = FanoutTransfer(src, destinations, args.workers, status=lambda message: reporter.emit('status', message=message))
+    results, size, seconds = run_engine(reporter, 'fanout', transfer, items, args.bandwidth); failed = len(destinations) < len(dict.fromkeys(args.to))
+    for spec, outcome in results.items():
+        failed = failed or bool(outcome['failed'] or outcome['dropped'])
+        reporter.emit('destination', profile=spec, sent=outcome['sent'], failed=len(outcome['failed']),
+                      errors=[f"{path}: {error}" for path, error in outcome['failed'][:10]], dropped=outcome['dropped'] and str(outcome['dropped']))
+    reporter.emit('done', label='fanout', files=sum(outcome['sent'] for outcome in results.values()), bytes=size, seconds=seconds)
+    if failed: raise CliError("일부 대상 서버로 배포하지 못했습니다")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="SSH File Explorer 명령줄 전송 도구")
+    parser.add_argument('--format', choices=('json', 'text'), default='json', help="출력 형식 (기본: 한 줄에 하나의 JSON)")
+    parser.add_argument('--metrics', action='store_true', help="끝날 때 호스트별 작업 시간, 요청 수, 왕복 시간을 출력")
+    parser.add_argument('--metrics-log', action='store_true', help=f"작업마다 JSON 한 줄을 {METRICS_LOG_PATH}에 덧붙임")
+    commands = parser.add_subparsers(dest='command', required=True)
+    def transfer_options(command):
+        command.add_argument('--workers', type=int, default=TRANSFER_WORKERS, help="동시 전송 수")
+        command.add_argument('--bandwidth', type=int, default=0, help="대역폭 제한 (KB/s, 0=무제한)")
+        command.add_argument('--tar', action='store_true', help="폴더를 tar 스트림으로 전송")
+        command.add_argument('--gzip', action='store_true', help="tar 스트림을 gzip으로 압축")
+        command.add_argument('--no-journal', action='store_true', help="이어받기 저널에 기록하지 않음")
+        command.add_argument('--verify', action='store_true', help="전송 후 원본과 대상의 sha256을 비교하고 다른 파일은 다시 전송")
+        return command
+    ls = commands.add_parser('ls', help="원격 디렉토리 목록"); ls.add_argument('profile'); ls.add_argument('path')
+    du = commands.add_parser('du', help="원격 폴더 크기와 항목 수 (서버의 du, 없으면 SFTP 병렬 순회)"); du.add_argument('profile'); du.add_argument('paths', nargs='+')
+    find = commands.add_parser('find', help="원격 트리 검색 (서버의 find, 없으면 SFTP 병렬 순회)"); find.add_argument('profile'); find.add_argument('path')
+    find.add_argument('--name', default='*', help="이름 glob (기본 *)"); find.add_argument('--regex', action='store_true', help="--name을 정규식으로 해석")
+    find.add_argument('--min-size', type=int, help="최소 크기 (바이트)"); find.add_argument('--max-size', type=int, help="최대 크기 (바이트)")
+    find.add_argument('--days', type=float, help="최근 며칠 안에 수정된 항목만"); find.add_argument('--depth', type=int, help="최대 깊이 (1=바로 아래만)")
+    upload = transfer_options(commands.add_parser('upload', help="로컬 → 원격"))
+    upload.add_argument('profile'); upload.add_argument('sources', nargs='+'); upload.add_argument('dest')
+    download = transfer_options(commands.add_parser('download', help="원격 → 로컬"))
+    download.add_argument('profile'); download.add_argument('sources', nargs='+'); download.add_argument('dest')
+    relay = transfer_options(commands.add_parser('relay', help="원격 → 원격 (서버 간 직접 전송)"))
+    relay.add_argument('source_profile'); relay.add_argument('dest_profile'); relay.add_argument('sources', nargs='+'); relay.add_argument('dest')
+    fanout = commands.add_parser('fanout', help="원격 → 여러 원격 (원본을 한 번 읽어 모든 대상에 동시에 전송)")
+    fanout.add_argument('source_profile'); fanout.add_argument('sources', nargs='+'); fanout.add_argument('dest')
+    fanout.add_argument('--to', action='append', required=True, metavar='PROFILE', help="대상 서버 프로필 (여러 번 지정)")
+    fanout.add_argument('--workers', type=int, default=TRANSFER_WORKERS, help="동시 전송 수")
+    fanout.add_argument('--bandwidth', type=int, default=0, help="원본 읽기 대역폭 제한 (KB/s, 0=무제한)")
+    sync = transfer_options(commands.add_parser('sync', help="새 파일과 바뀐 파일만 전송해 디렉토리를 맞춤"))
+    sync.add_argument('profile'); sync.add_argument('local'); sync.add_argument('remote')
+    sync.add_argument('--download', action='store_true', help="원격 → 로컬 방향으로 맞춤 (기본은 로컬 → 원격)")
+    sync.add_argument('--strict', action='store_true', help="크기가 같은 파일은 sha256 해시로 비교")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv); reporter = Reporter(args.format); pool = SshConnectionPool()
+    if args.metrics or args.metrics_log: METRICS.configure(True, METRICS_LOG_PATH if args.metrics_log else None)
+    try:
+        if args.command == 'ls': command_ls(args, pool, reporter)
+        elif args.command == 'find': command_find(args, pool, reporter)
+        elif args.command == 'du': command_du(args, pool, reporter)
+        elif args.command == 'fanout': command_fanout(args, pool, reporter)
+        else: command_transfer(args, pool, reporter)
+        return 0
+    except (TransferCancelled, KeyboardInterrupt): reporter.emit('cancelled', message="취소됨"); return 130
+    except CliError as e: reporter.emit('error', message=str(e)); return 1
+    except Exception as e: reporter.emit('error', message=f"{type(e).__name__}: {e}"); return 1
+    finally:
+        pool.close_all()
+        if args.metrics: reporter.emit('metrics', hosts=METRICS.snapshot())
+        METRICS.configure(False)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1789 @@
+"""연결, 목록, 전송 로직. Tk에 의존하지 않으므로 GUI(main.py)와 명령줄 도구(cli.py)가 함께 씁니다."""
+import importlib
+import os
+import stat
+from threading import Thread, Lock, BoundedSemaphore, Event, local
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, nullcontext, ExitStack
+import json
+import hashlib
+import multiprocessing
+import posixpath
+import shlex
+from queue import Queue, Empty, Full
+from collections import OrderedDict, deque
+import time
+import sys
+import ctypes
+import struct
+import tarfile
+import mmap
+import shutil
+import re
+import fnmatch
+import socket
+
+class _LazyModule:
+    """첫 속성 접근 때 모듈을 불러옵니다. paramiko(와 cryptography)를 불러오는 데 수백 밀리초가 걸리므로 첫 연결 때까지 미룹니다."""
+    def __init__(self, name): self._name = name; self._module = None
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+paramiko = _LazyModule('paramiko')
+
+# --- 설정 파일 경로 정의 ---
+APP_DIR = os.path.join(os.path.expanduser('~'), '.SshFileExplorer')
+CONFIG_DIR = os.path.join(APP_DIR, 'config')
+JOURNAL_PATH = os.path.join(APP_DIR, 'journal.json')
+JOURNAL_FLUSH_BYTES = 8 * 1024 * 1024   # 이만큼 전송할 때마다 저널을 디스크에 기록
+JOURNAL_CONFIRM_BYTES = 8 * 1024 * 1024 # 구간·순차 복사에서 대상의 쓰기 응답을 모두 받고 저널 오프셋을 올리는 간격
+JOURNAL_FLUSH_FILES = 500               # 이만큼 파일이 끝날 때마다 저널을 디스크에 기록
+JOURNAL_FLUSH_SECONDS = 5.0             # 마지막 기록 뒤 이 시간이 지나면 다음 갱신 때 저널을 디스크에 기록
+
+# --- 서버 간 직접 전송(relay) 설정: 최대 메모리 사용량 = 청크 크기 x (대기열 깊이 + 2) ---
+RELAY_CHUNK_SIZE = 1024 * 1024
+RELAY_QUEUE_DEPTH = 8
+
+def relay_file(sftp_src, sftp_dst, src_path, dst_path, offset=0, progress=None):
+    """두 SFTP 세션에 파일을 동시에 열고, 읽기 스레드와 쓰기 스레드가 고정 크기 청크 대기열을 통해 데이터를 넘깁니다.
+    offset이 주어지면 그 위치부터 이어서 쓰고, progress(쓴 위치)를 청크마다 호출합니다."""
+    chunks = Queue(maxsize=RELAY_QUEUE_DEPTH); stop = []
+    def put(item):
+        while not stop:
+            try: chunks.put(item, timeout=0.5); return
+            except Full: continue
+    def producer():
+        try:
+            with sftp_src.open(src_path, 'rb') as src:
+                size = src.stat().st_size
+                for position in range(offset, size, RELAY_CHUNK_SIZE):
+                    if stop: return
+                    # readv는 청크 하나를 여러 SFTP 읽기 요청으로 나눠 파이프라인 처리합니다.
+                    put(b"".join(src.readv([(position, min(RELAY_CHUNK_SIZE, size - position))])))
+            put(None)
+        except Exception as e: put(e)
+    reader = Thread(target=producer, daemon=True); reader.start()
+    try:
+        with sftp_dst.open(dst_path, 'r+b' if offset else 'wb') as dst:
+            dst.set_pipelined(True); dst.seek(offset)
+            while True:
+                chunk = chunks.get()
+                if chunk is None: break
+                if isinstance(chunk, Exception): raise chunk
+                dst.write(chunk); offset += len(chunk)
+                if progress: progress(offset)
+    finally:
+        stop.append(True)
+        try:
+            while True: chunks.get_nowait()
+        except Empty: pass
+        reader.join()
+
+def fanout_file(sftp_src, destinations, src_path, dst_path, on_bytes=None):
+    """destinations: {이름: SFTP 세션}. 원본을 한 번만 읽어 대상마다 있는 쓰기 스레드에 같은 청크를 넘깁니다.
+    대상마다 RELAY_QUEUE_DEPTH 크기의 대기열을 두고, 읽기는 살아 있는 모든 대상의 대기열에 넣은 뒤에야 다음 청크를 읽으므로
+    가장 느린 대상에 맞춰 속도가 조절됩니다. 한 대상의 쓰기가 실패하면 그 대상만 빠지고 나머지는 계속합니다.
+    on_bytes(바이트 수)는 청크마다 부르며, 여기서 난 예외(취소 등)나 원본 읽기 오류는 모든 쓰기를 멈추고 그대로 올립니다.
+    대상에는 dst_path + PART_SUFFIX로 쓰고 원본을 끝까지 보낸 뒤에만 제자리로 옮기므로, 실패하거나 중단된 부분 파일은
+    최종 이름으로 남지 않습니다(부분 파일은 지움). {이름: 예외 또는 None}을 돌려줍니다."""
+    queues = {name: Queue(maxsize=RELAY_QUEUE_DEPTH) for name in destinations}; errors = dict.fromkeys(destinations); aborted = []
+    part_path = dst_path + PART_SUFFIX
+    def writer(name, sftp):
+        chunks = queues[name]; chunk = b""
+        try:
+            with sftp.open(part_path, 'wb') as dst:
+                dst.set_pipelined(True)
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None or aborted: break
+                    dst.write(chunk)
+            if aborted: raise TransferCancelled()
+            try: sftp.posix_rename(part_path, dst_path)
+            except IOError:
+                try: sftp.remove(dst_path)
+                except IOError: pass
+                sftp.rename(part_path, dst_path)
+        except BaseException as e:
+            if not aborted: errors[name] = e
+            try: sftp.remove(part_path)
+            except Exception: pass
+        # 실패했거나 중단된 대상도 끝 표시가 올 때까지 대기열을 비워 읽기 쪽이 막히지 않게 합니다.
+        while chunk is not None: chunk = chunks.get()
+    writers = [Thread(target=writer, args=item, daemon=True) for item in destinations.items()]
+    for thread in writers: thread.start()
+    try:
+        with sftp_src.open(src_path, 'rb') as src:
+            size = src.stat().st_size
+            for position in range(0, size, RELAY_CHUNK_SIZE):
+                if all(errors.values()): break
+                chunk = b"".join(src.readv([(position, min(RELAY_CHUNK_SIZE, size - position))]))
+                for name, chunks in queues.items():
+                    if errors[name] is None: chunks.put(chunk)
+                if on_bytes: on_bytes(len(chunk))
+    except BaseException: aborted.append(True); raise
+    finally:
+        for chunks in queues.values(): chunks.put(None)
+        for thread in writers: thread.join()
+    return errors
+
+# --- 병렬 전송 설정 ---
+TRANSFER_WORKERS = 4            # 기본 동시 전송 수 (작업당 SFTP 채널 수)
+HOST_CONCURRENCY_LIMIT = 8      # 한 호스트에 동시에 실행할 수 있는 최대 파일 전송 수
+SEGMENT_THRESHOLD = 256 * 1024 * 1024   # 이 크기 이상의 파일은 구간으로 나눠 여러 채널에서 동시에 전송
+SEGMENT_COUNT = 4                       # 큰 파일 하나를 나눌 구간 수
+PART_SUFFIX = '.part'                   # 분할 전송 중인 파일에 붙는 임시 확장자
+MTIME_TOLERANCE = 1                     # 동기화 시 같은 파일로 볼 수정 시각 차이 (초, 파일시스템 정밀도 보정)
+HASH_BATCH_SIZE = 100                   # 원격 sha256sum 명령 하나에 넘길 최대 파일 수
+HASH_COMMANDS = 4                       # 한 서버에서 동시에 실행할 sha256sum 명령 수
+HASH_CHUNK_SIZE = 8 * 1024 * 1024       # 로컬 해시 시 메모리 매핑한 파일을 한 번에 넘기는 크기
+HASH_PROCESS_MIN_BYTES = 64 * 1024 * 1024   # 로컬 파일 합계가 이보다 크고 파일이 여러 개면 프로세스 풀에서 해시 (작으면 시작 비용이 더 큼)
+VERIFY_RETRY_LIMIT = 2                  # 검증에서 해시가 다른 파일을 다시 보내는 최대 횟수
+
+# --- SSH 연결 풀 설정 ---
+SSH_CONNECT_TIMEOUT = 5         # 연결(핸드셰이크) 제한 시간 (초)
+SSH_KEEPALIVE_INTERVAL = 30     # 유휴 연결이 중간 장비에서 끊기지 않도록 keepalive를 보내는 주기 (초)
+SSH_IDLE_TIMEOUT = 300          # 어느 창도 쓰지 않는 연결을 다시 쓸 수 있게 열어 두는 시간 (초)
+SSH_RETRY_LIMIT = 2             # 연결이 끊겨 실패한 작업을 다시 연결해 재시도하는 횟수
+SSH_CHANNEL_LIMIT = 8           # 연결 하나에 열 수 있는 최대 작업용 SFTP 채널 수 (서버의 MaxSessions보다 작게)
+
+# --- 프로필별 전송 계층 설정 (프로필 파일의 'transport' 항목, 비어 있는 값은 paramiko 기본값) ---
+TRANSPORT_DEFAULTS = {'compress': False, 'ciphers': [], 'window_size': None, 'max_packet_size': None}
+BENCHMARK_BYTES = 16 * 1024 * 1024      # 링크 측정 시 후보 설정마다 올리고 내려받는 데이터 크기
+BENCHMARK_CANDIDATES = [                # 링크 측정에서 비교할 후보 설정 (LAN은 기본값, 지연이 큰 WAN은 큰 윈도, 느린 회선은 압축이 유리)
+    ("기본값", {}),
+    ("AES-CTR + 큰 윈도", {'ciphers': ['aes128-ctr'], 'window_size': 16 * 1024 * 1024}),
+    ("AES-GCM + 큰 윈도", {'ciphers': ['aes128-gcm@openssh.com'], 'window_size': 16 * 1024 * 1024}),
+    ("압축 + 큰 윈도", {'compress': True, 'window_size': 16 * 1024 * 1024}),
+]
+
+# --- 원격 디렉토리 목록 캐시 설정 ---
+LISTING_CACHE_TTL = 60          # 캐시된 목록의 유효 시간 (초)
+LISTING_CACHE_SIZE = 256        # 연결당 보관할 최대 디렉토리 수 (초과 시 가장 오래 안 쓴 것부터 제거)
+LISTING_PREFETCH_LIMIT = 32     # 현재 디렉토리에서 미리 읽어 둘 하위 디렉토리 수
+LISTING_BATCH_SIZE = 500        # 백그라운드 목록 읽기가 한 번에 화면으로 넘기는 항목 수
+
+# --- 원격 검색 설정 ---
+SEARCH_WORKERS = 8              # find를 쓸 수 없을 때 동시에 읽는 디렉토리 수 (SFTP 채널 수)
+SEARCH_READ_SIZE = 64 * 1024    # find 출력을 한 번에 읽는 크기 (읽을 때마다 결과 묶음 하나를 넘김)
+USAGE_CACHE_TTL = 600           # 계산한 폴더 크기를 다시 쓰는 시간 (초, 이 앱이 바꾼 경로는 그 전에 버림)
+
+# --- 전송 대기열 설정 ---
+QUEUE_MAX_RUNNING = 4           # 동시에 실행할 수 있는 최대 작업 수 (작업 하나가 여러 파일을 동시에 보낼 수 있음)
+QUEUE_HOST_LIMIT = 2            # 한 호스트에 동시에 실행할 수 있는 최대 작업 수
+_host_slots = {}; _host_slots_lock = Lock()
+
+# --- 계측 설정 ---
+METRICS_LOG_PATH = os.path.join(APP_DIR, 'metrics.jsonl')
+METRICS_RTT_SAMPLES = 200       # 호스트별로 보관할 최근 왕복 시간 표본 수
+
+class Metrics:
+    """호스트별 작업 시간(connect, listdir, stat, put/get, mkdir, remove 등), 바이트 수, SFTP 요청 수, 왕복 시간 표본을 모읍니다.
+    꺼져 있으면(기본) 호출하는 쪽이 enabled만 확인하고 지나가므로 비용이 거의 없습니다. 로그를 켜면 작업마다 JSON 한 줄을 덧붙입니다."""
+    def __init__(self): self.enabled = False; self.log_path = None; self._log = None; self._hosts = {}; self._lock = Lock()
+
+    def configure(self, enabled, log_path=None):
+        """계측을 켜고 끕니다. log_path가 있으면 그 파일에 작업 기록을 덧붙이고, 없으면 로그를 닫습니다."""
+        with self._lock:
+            if self._log and (not enabled or log_path != self.log_path): self._log.close(); self._log = None
+            if enabled and log_path and not self._log:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True); self._log = open(log_path, 'a', encoding='utf-8', buffering=1)
+            self.enabled = enabled; self.log_path = log_path if enabled else None
+
+    def _host(self, host):
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = {'ops': {}, 'requests': {}, 'bytes_sent': 0, 'bytes_received': 0, 'rtt': deque(maxlen=METRICS_RTT_SAMPLES)}
+        return stats
+
+    def record(self, host, op, seconds, size=0, error=None):
+        """작업 하나의 소요 시간과 바이트 수를 기록합니다."""
+        if not self.enabled: return
+        with self._lock:
+            op_stats = self._host(host)['ops'].setdefault(op, {'count': 0, 'errors': 0, 'seconds': 0.0, 'max': 0.0, 'bytes': 0})
+            op_stats['count'] += 1; op_stats['seconds'] += seconds; op_stats['max'] = max(op_stats['max'], seconds); op_stats['bytes'] += size
+            if error: op_stats['errors'] += 1
+            if self._log:
+                line = {'time': round(time.time(), 3), 'host': host, 'op': op, 'seconds': round(seconds, 6), 'bytes': size}
+                if error: line['error'] = str(error)
+                self._log.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    @contextmanager
+    def timer(self, host, op, size=0):
+        """with 블록의 소요 시간을 기록합니다. 예외가 나면 오류로 셉니다."""
+        if not self.enabled: yield; return
+        started = time.perf_counter()
+        try: yield
+        except Exception as e: self.record(host, op, time.perf_counter() - started, size, e); raise
+        self.record(host, op, time.perf_counter() - started, size)
+
+    def request(self, host, name, sent=0, received=0):
+        """SFTP 요청 하나를 셉니다. sent/received는 쓰기 데이터와 읽기 요청 크기입니다."""
+        with self._lock:
+            stats = self._host(host); stats['requests'][name] = stats['requests'].get(name, 0) + 1
+            stats['bytes_sent'] += sent; stats['bytes_received'] += received
+
+    def round_trip(self, host, seconds):
+        with self._lock: self._host(host)['rtt'].append(seconds)
+
+    def snapshot(self):
+        """{호스트: {'ops', 'requests', 'bytes_sent', 'bytes_received', 'rtt': {'samples', 'min', 'avg', 'max'}}} 복사본"""
+        with self._lock:
+            result = {}
+            for host, stats in self._hosts.items():
+                rtt = list(stats['rtt'])
+                result[host] = {'ops': {op: dict(values) for op, values in stats['ops'].items()}, 'requests': dict(stats['requests']),
+                                'bytes_sent': stats['bytes_sent'], 'bytes_received': stats['bytes_received'],
+                                'rtt': {'samples': len(rtt), 'min': min(rtt, default=0), 'avg': sum(rtt) / len(rtt) if rtt else 0, 'max': max(rtt, default=0)}}
+            return result
+
+    def reset(self):
+        with self._lock: self._hosts.clear()
+
+METRICS = Metrics()
+_metered_sftp_class = None
+
+def open_sftp(client, host):
+    """client 위에 SFTP 채널을 엽니다. 계측이 켜져 있을 때 요청 수와 왕복 시간을 host 이름으로 기록하는 채널입니다."""
+    global _metered_sftp_class
+    if _metered_sftp_class is None:
+        # SFTPClient를 상속해야 하므로 paramiko를 불러온 뒤(첫 연결 때) 클래스를 만듭니다.
+        class MeteredSFTPClient(paramiko.SFTPClient):
+            def _async_request(self, fileobj, t, *args):
+                if METRICS.enabled:
+                    sftp = paramiko.sftp
+                    METRICS.request(self.host, sftp.CMD_NAMES.get(t, t), len(args[2]) if t == sftp.CMD_WRITE else 0, args[2] if t == sftp.CMD_READ else 0)
+                return super()._async_request(fileobj, t, *args)
+
+            def _request(self, t, *args):
+                # 응답을 기다리는 요청(stat, mkdir, remove, open 등)은 왕복 시간이 곧 작업 시간입니다.
+                if not METRICS.enabled: return super()._request(t, *args)
+                started = time.perf_counter(); name = paramiko.sftp.CMD_NAMES.get(t, t)
+                with METRICS.timer(self.host, name): result = super()._request(t, *args)
+                METRICS.round_trip(self.host, time.perf_counter() - started); return result
+        _metered_sftp_class = MeteredSFTPClient
+    sftp = _metered_sftp_class.from_transport(client.get_transport())
+    if sftp is None: raise paramiko.SSHException("SFTP 채널을 열 수 없습니다.")
+    sftp.host = host; return sftp
+
+@contextmanager
+def host_slots(*hosts):
+    """호스트별 동시 전송 수 제한을 지킵니다. 교착을 막기 위해 항상 정렬된 순서로 획득합니다."""
+    with _host_slots_lock:
+        slots = [_host_slots.setdefault(h, BoundedSemaphore(HOST_CONCURRENCY_LIMIT)) for h in sorted(set(h for h in hosts if h))]
+    for slot in slots: slot.acquire()
+    try: yield
+    finally:
+        for slot in reversed(slots): slot.release()
+
+class SftpChannelPool:
+    """하나의 SSH 연결 위에 여러 SFTP 채널을 열어 두고 작업 스레드에 빌려주는 풀. 연결이 다시 맺어지면 reset()으로 이전 채널을 버립니다."""
+    def __init__(self, connection, size=SSH_CHANNEL_LIMIT):
+        self.connection = connection; self.host = connection.host; self.size = size
+        self._idle = Queue(); self._opened = []; self._lock = Lock(); self._pair_lock = Lock()
+
+    @property
+    def ssh_client(self): return self.connection.client
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                idle = self._idle
+                if idle.empty() and len(self._opened) < self.size:
+                    try: sftp = open_sftp(self.connection.client, self.host)
+                    except paramiko.SSHException:
+                        # 서버의 세션 수 제한에 걸린 경우에만 이미 열린 채널을 기다리고, 연결이 끊긴 경우에는 그대로 실패합니다.
+                        if not self._opened or not self.connection.is_alive(): raise
+                        self.size = len(self._opened)
+                    else: self._opened.append(sftp); return sftp
+            # 다시 연결되어 대기열이 바뀌었을 수 있으므로 주기적으로 깨어나 확인합니다.
+            try: return idle.get(timeout=1)
+            except Empty: continue
+
+    def release(self, sftp):
+        with self._lock:
+            if sftp in self._opened: self._idle.put(sftp)
+
+    @contextmanager
+    def channel(self):
+        sftp = self.acquire()
+        try: yield sftp
+        finally: self.release(sftp)
+
+    @contextmanager
+    def pair(self):
+        """채널 두 개를 함께 빌립니다. 같은 연결 안에서 원본과 대상을 모두 쓰는 작업이 하나씩 나눠 잡고 서로 기다리는 교착을 막습니다."""
+        with self._pair_lock: first = self.acquire(); second = self.acquire()
+        try: yield first, second
+        finally: self.release(first); self.release(second)
+
+    def reset(self, size=SSH_CHANNEL_LIMIT):
+        with self._lock: opened, self._opened, self._idle, self.size = self._opened, [], Queue(), size
+        for sftp in opened:
+            try: sftp.close()
+            except Exception: pass
+
+    def close(self): self.reset(self.size)
+
+def profile_path(user, ip, port): return os.path.join(CONFIG_DIR, f"{user}@{ip}_{port}.json")
+
+def load_profile(user, ip, port):
+    try:
+        with open(profile_path(user, ip, port), 'r', encoding='utf-8') as f: return json.load(f)
+    except (OSError, ValueError): return None
+
+class ProfileIndex:
+    """CONFIG_DIR의 프로필 색인. 파일마다 (수정 시각, 크기)를 기억해 바뀐 파일만 다시 읽으므로, 목록을 새로 고치거나 프로필을 고를 때
+    디렉토리를 한 번 훑는 비용만 듭니다. 두 창이 하나의 색인을 함께 씁니다."""
+    def __init__(self, directory=CONFIG_DIR): self.directory = directory; self._cache = {}; self._lock = Lock()
+
+    @staticmethod
+    def display_name(config): return f"{config.get('user')}@{config.get('ip')}:{config.get('port')}"
+
+    def _load(self, filename, signature):
+        cached = self._cache.get(filename)
+        if cached and cached[0] == signature: return cached[1]
+        try:
+            with open(os.path.join(self.directory, filename), 'r', encoding='utf-8') as f: config = json.load(f)
+        except (OSError, ValueError): config = None
+        self._cache[filename] = (signature, config); return config
+
+    def profiles(self):
+        """[(표시 이름, 파일 이름, 설정)]을 파일 이름 순으로 돌려줍니다. 읽을 수 없는 파일은 건너뜁니다."""
+        with self._lock:
+            try:
+                with os.scandir(self.directory) as entries:
+                    signatures = {entry.name: (entry.stat().st_mtime_ns, entry.stat().st_size) for entry in entries if entry.name.endswith('.json') and entry.is_file()}
+            except FileNotFoundError: signatures = {}
+            for filename in set(self._cache) - set(signatures): del self._cache[filename]
+            loaded = [(filename, self._load(filename, signatures[filename])) for filename in sorted(signatures)]
+        return [(self.display_name(config), filename, config) for filename, config in loaded if config is not None]
+
+    def get(self, filename):
+        """파일 하나의 설정. 수정 시각이 바뀌었을 때만 다시 읽습니다."""
+        with self._lock:
+            try: st = os.stat(os.path.join(self.directory, filename))
+            except OSError: self._cache.pop(filename, None); return None
+            return self._load(filename, (st.st_mtime_ns, st.st_size))
+
+    def save(self, config):
+        """프로필을 user@ip_port.json 파일로 저장하고 파일 이름을 돌려줍니다."""
+        path = os.path.join(self.directory, os.path.basename(profile_path(config['user'], config['ip'], config['port']))); os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f: json.dump(config, f, indent=4)
+        return os.path.basename(path)
+
+    def delete(self, filename):
+        os.remove(os.path.join(self.directory, filename))
+        with self._lock: self._cache.pop(filename, None)
+
+def transport_settings(config):
+    """프로필의 'transport' 항목을 기본값과 합칩니다."""
+    return {**TRANSPORT_DEFAULTS, **((config or {}).get('transport') or {})}
+
+def open_ssh_client(hostname, port, user, password, tuning=None):
+    """tuning(압축, 선호 암호 방식, 윈도 크기, 최대 패킷 크기)을 적용해 SSH 클라이언트를 연결합니다."""
+    tuning = {**TRANSPORT_DEFAULTS, **(tuning or {})}
+    def make_transport(sock, **kwargs):
+        transport = paramiko.Transport(sock, default_window_size=tuning['window_size'] or paramiko.common.DEFAULT_WINDOW_SIZE,
+                                       default_max_packet_size=tuning['max_packet_size'] or paramiko.common.DEFAULT_MAX_PACKET_SIZE, **kwargs)
+        if tuning['ciphers']:
+            # 지정한 암호 방식을 앞에 두고 나머지는 서버와 맞지 않을 때를 위해 뒤에 남겨 둡니다.
+            options = transport.get_security_options(); supported = options.ciphers
+            options.ciphers = tuple(c for c in tuning['ciphers'] if c in supported) + tuple(c for c in supported if c not in tuning['ciphers'])
+        return transport
+    client = paramiko.SSHClient(); client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        client.connect(hostname=hostname, port=int(port), username=user, password=password, timeout=SSH_CONNECT_TIMEOUT, compress=tuning['compress'], transport_factory=make_transport)
+        client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+    except Exception: client.close(); raise
+    return client
+
+def benchmark_link(hostname, port, user, password, candidates=BENCHMARK_CANDIDATES, size=BENCHMARK_BYTES, on_bytes=None):
+    """후보 설정마다 새로 연결해 홈 디렉토리에 size 바이트를 올리고 내려받아 처리량을 잽니다.
+    [(이름, 설정, 초당 바이트)]를 빠른 순으로 돌려주며, 서버가 받아들이지 않은 설정은 0입니다."""
+    # 절반은 무작위, 절반은 0인 블록: 압축이 전혀 안 되는 경우와 아주 잘 되는 경우의 중간입니다.
+    block = os.urandom(RELAY_CHUNK_SIZE // 2) + bytes(RELAY_CHUNK_SIZE // 2); count = max(1, size // len(block)); results = []
+    for label, tuning in candidates:
+        client = None
+        try:
+            client = open_ssh_client(hostname, port, user, password, tuning); sftp = client.open_sftp()
+            path = posixpath.join(sftp.normalize('.'), f".sshfe-benchmark-{os.getpid()}"); started = time.monotonic()
+            try:
+                with sftp.open(path, 'wb') as f:
+                    f.set_pipelined(True)
+                    for _ in range(count):
+                        f.write(block)
+                        if on_bytes: on_bytes(len(block))
+                with sftp.open(path, 'rb') as f:
+                    f.prefetch(count * len(block))
+                    while True:
+                        data = f.read(RELAY_CHUNK_SIZE)
+                        if not data: break
+                        if on_bytes: on_bytes(len(data))
+            finally:
+                try: sftp.remove(path)
+                except IOError: pass
+            results.append((label, tuning, 2 * count * len(block) / (time.monotonic() - started)))
+        except Exception: results.append((label, tuning, 0))
+        finally:
+            if client: client.close()
+    return sorted(results, key=lambda result: -result[2])
+
+class SshConnection:
+    """프로필(user@ip:port) 하나의 SSH 연결. keepalive로 유휴 연결을 유지하고, 끊기면 같은 정보로 다시 연결합니다.
+    다시 연결할 때마다 generation이 바뀌므로, 같은 끊김을 본 여러 스레드 중 한 스레드만 실제로 다시 연결합니다."""
+    def __init__(self, key, hostname, port, user, password, tuning=None):
+        self.key = key; self.hostname = hostname; self.port = int(port); self.user = user; self.password = password; self.tuning = tuning or {}
+        self.host = f"{hostname}:{port}"; self.client = None; self.sftp = None; self.generation = 0; self.refs = 0; self.idle_since = None
+        self.channels = SftpChannelPool(self); self._lock = Lock()
+
+    def is_alive(self):
+        transport = self.client.get_transport() if self.client else None
+        return bool(transport and transport.is_active())
+
+    def ensure_connected(self):
+        """살아 있는 연결이 있으면 그대로 쓰고 False를, 새로 연결했으면 True를 돌려줍니다."""
+        generation = self.generation
+        if self.is_alive(): return False
+        return self.reconnect(generation)
+
+    def reconnect(self, generation):
+        with self._lock:
+            if generation != self.generation and self.is_alive(): return False
+            self._close_client()
+            with METRICS.timer(self.host, 'connect'): client = open_ssh_client(self.hostname, self.port, self.user, self.password, self.tuning)
+            try: sftp = open_sftp(client, self.host)
+            except Exception: client.close(); raise
+            self.client, self.sftp = client, sftp; self.generation += 1
+            return True
+
+    def _close_client(self):
+        self.channels.reset()
+        for resource in (self.sftp, self.client):
+            try:
+                if resource: resource.close()
+            except Exception: pass
+        self.client = self.sftp = None
+
+    def close(self):
+        with self._lock: self._close_client()
+
+def with_reconnect(connections, func, *args):
+    """func를 실행하고, 실패했을 때 관련 연결 중 끊긴 것이 있으면 다시 연결해 재시도합니다.
+    연결이 살아 있는데 난 오류(파일 없음, 권한 등)는 그대로 올려 보냅니다."""
+    connections = [connection for connection in connections if connection]
+    for attempt in range(SSH_RETRY_LIMIT + 1):
+        generations = [connection.generation for connection in connections]
+        try: return func(*args)
+        except Exception:
+            dead = [(connection, generation) for connection, generation in zip(connections, generations) if generation != connection.generation or not connection.is_alive()]
+            if not dead or attempt == SSH_RETRY_LIMIT: raise
+            for connection, generation in dead: connection.reconnect(generation)
+
+class SshConnectionPool:
+    """프로필(user@ip:port)별 SSH 연결 풀. 두 창이 같은 프로필에 연결하거나 끊었다 다시 연결하면 열려 있는 연결을 그대로 다시 씁니다.
+    어느 창도 쓰지 않는 연결은 SSH_IDLE_TIMEOUT 동안 남겨 두었다가 닫습니다."""
+    def __init__(self, idle_timeout=SSH_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout; self._connections = {}; self._lock = Lock()
+
+    @staticmethod
+    def key(user, hostname, port): return f"{user}@{hostname}:{port}"
+
+    def acquire(self, hostname, port, user, password, tuning=None):
+        """(연결, 재사용 여부)를 돌려줍니다. 네트워크 작업을 하므로 Tk 스레드가 아닌 곳에서 호출합니다.
+        아무도 쓰지 않는 연결의 전송 설정이 바뀌었으면 새 설정으로 다시 연결합니다."""
+        key = self.key(user, hostname, port); tuning = tuning or {}
+        with self._lock:
+            self._expire()
+            connection = self._connections.get(key)
+            if connection is None: connection = self._connections[key] = SshConnection(key, hostname, port, user, password, tuning)
+            elif connection.tuning != tuning and connection.refs <= 0: connection.tuning = tuning; connection.close()
+            connection.refs += 1; connection.idle_since = None
+        try: return connection, not connection.ensure_connected()
+        except Exception: self.release(connection); raise
+
+    def retain(self, connection):
+        """이미 받은 connection에 참조를 하나 더합니다(네트워크 작업 없음). 대기열 작업이 실행되는 동안 잡아 두어, 창이 연결을 끊어도
+        유휴 정리가 작업 중인 연결을 닫지 않게 합니다. 그사이 풀에서 빠진 연결이면 다시 넣어 풀이 관리하게 합니다."""
+        with self._lock:
+            self._connections.setdefault(connection.key, connection)
+            connection.refs += 1; connection.idle_since = None
+
+    def release(self, connection):
+        with self._lock:
+            connection.refs -= 1; orphan = False
+            if connection.refs <= 0:
+                # 같은 프로필로 새 연결이 풀에 들어가 있으면 이 연결은 더 이상 누구도 받을 수 없으므로 바로 닫습니다.
+                if self._connections.get(connection.key) is connection: connection.idle_since = time.monotonic()
+                else: orphan = True
+            self._expire()
+        if orphan: connection.close()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, connection in list(self._connections.items()):
+            if connection.idle_since is not None and (now - connection.idle_since >= self.idle_timeout or not connection.is_alive()):
+                del self._connections[key]; connection.close()
+
+    def close_all(self):
+        with self._lock: connections = list(self._connections.values()); self._connections.clear()
+        for connection in connections: connection.close()
+
+class FileEntry:
+    """목록 항목 하나. 화면 문자열 대신 이 레코드로 정렬하고 선택 항목의 이름을 얻습니다."""
+    __slots__ = ('name', 'is_dir', 'size', 'mtime', 'mode')
+    SORT_KEYS = {'name': lambda entry: entry.name.lower(), 'size': lambda entry: entry.size, 'mtime': lambda entry: entry.mtime}
+    def __init__(self, name, is_dir, size=0, mtime=0, mode=None): self.name = name; self.is_dir = is_dir; self.size = size or 0; self.mtime = mtime or 0; self.mode = mode
+
+    @classmethod
+    def from_attr(cls, attr): return cls(attr.filename, stat.S_ISDIR(attr.st_mode or 0), attr.st_size, attr.st_mtime, attr.st_mode)
+
+    @classmethod
+    def from_dir_entry(cls, entry):
+        """os.scandir 항목에서 만듭니다. 종류는 디렉토리 항목에 캐시된 정보로, 크기와 시각은 stat 한 번으로 얻습니다."""
+        st = entry.stat(); return cls(entry.name, entry.is_dir(), st.st_size, st.st_mtime)
+
+    @classmethod
+    def from_path(cls, parent, name): st = os.stat(os.path.join(parent, name)); return cls(name, stat.S_ISDIR(st.st_mode), st.st_size, st.st_mtime)
+
+def scan_local_dir(path):
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try: entries.append(FileEntry.from_dir_entry(entry))
+            except OSError: continue
+    return entries
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB": return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class LocalDirWatcher:
+    """Linux inotify로 디렉토리 하나를 감시해 추가/삭제/변경된 이름을 모아 돌려줍니다. 다른 OS에서는 available이 False입니다."""
+    IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE, IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x2, 0x4, 0x8, 0x40, 0x80, 0x100, 0x200
+    IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW, IN_IGNORED = 0x400, 0x800, 0x4000, 0x8000
+    IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+    _libc = None
+
+    def __init__(self):
+        self.fd = None; self.wd = None
+        if not sys.platform.startswith('linux'): return
+        try:
+            if LocalDirWatcher._libc is None: LocalDirWatcher._libc = ctypes.CDLL(None, use_errno=True)
+            fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+            if fd >= 0: self.fd = fd
+        except (OSError, AttributeError): pass
+
+    @property
+    def available(self): return self.fd is not None
+
+    def watch(self, path):
+        if not self.available: return False
+        if self.wd is not None: self._libc.inotify_rm_watch(self.fd, self.wd); self.wd = None
+        mask = (self.IN_MODIFY | self.IN_ATTRIB | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+                | self.IN_DELETE_SELF | self.IN_MOVE_SELF)
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        self.wd = wd if wd >= 0 else None; self._drain()
+        return self.wd is not None
+
+    def _drain(self):
+        try:
+            while os.read(self.fd, 65536): pass
+        except (BlockingIOError, OSError): pass
+
+    def poll(self):
+        """(바뀐 이름 집합, 삭제된 이름 집합, 전체 다시 읽기 필요 여부)를 돌려줍니다."""
+        changed, removed, rescan = set(), set(), False
+        if self.wd is None: return changed, removed, rescan
+        while True:
+            try: data = os.read(self.fd, 65536)
+            except (BlockingIOError, OSError): break
+            if not data: break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset); offset += self.EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0')); offset += length
+                if wd != self.wd and not mask & self.IN_Q_OVERFLOW: continue
+                if mask & (self.IN_Q_OVERFLOW | self.IN_DELETE_SELF | self.IN_MOVE_SELF | self.IN_IGNORED): rescan = True
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM): removed.add(name); changed.discard(name)
+                elif name: changed.add(name); removed.discard(name)
+        return changed, removed, rescan
+
+    def close(self):
+        if self.available: os.close(self.fd); self.fd = None; self.wd = None
+
+class ListingCache:
+    """연결 하나의 원격 디렉토리 목록(FileEntry 목록)을 경로별로 보관하는 TTL + LRU 캐시"""
+    def __init__(self, ttl=LISTING_CACHE_TTL, max_entries=LISTING_CACHE_SIZE):
+        self.ttl = ttl; self.max_entries = max_entries; self._entries = OrderedDict(); self._lock = Lock()
+
+    def get(self, path):
+        path = posixpath.normpath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if not entry: return None
+            if time.monotonic() - entry[0] > self.ttl: del self._entries[path]; return None
+            self._entries.move_to_end(path); return entry[1]
+
+    def put(self, path, entries):
+        path = posixpath.normpath(path)
+        with self._lock:
+            self._entries[path] = (time.monotonic(), entries); self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
+
+    def invalidate(self, path=None, recursive=False):
+        """path의 목록을 버립니다. recursive면 하위 경로도 함께 버리고, path가 없으면 전부 비웁니다."""
+        with self._lock:
+            if path is None: self._entries.clear(); return
+            path = posixpath.normpath(path); prefix = path.rstrip('/') + '/'
+            for key in [k for k in self._entries if k == path or (recursive and k.startswith(prefix))]: del self._entries[key]
+
+def iter_remote_listing(sftp, path, batch_size=LISTING_BATCH_SIZE):
+    """listdir_iter로 읽은 항목을 batch_size개씩 FileEntry 목록으로 내보냅니다. 마지막 묶음은 비어 있을 수 있습니다."""
+    host = getattr(sftp, 'host', None) if METRICS.enabled else None; started = time.perf_counter(); waited = 0; batch = []
+    for attr in sftp.listdir_iter(path):
+        batch.append(FileEntry.from_attr(attr))
+        if len(batch) >= batch_size:
+            # 받는 쪽이 묶음을 처리하는 시간은 목록 읽기 시간에서 뺍니다.
+            paused = time.perf_counter(); yield batch; waited += time.perf_counter() - paused; batch = []
+    if host: METRICS.record(host, 'listdir', time.perf_counter() - started - waited)
+    yield batch
+
+class TransferJob:
+    """평탄화된 파일 전송 작업 하나 (전송 계획의 한 줄)"""
+    __slots__ = ('src', 'dst', 'size', 'mtime', 'mode')
+    def __init__(self, src, dst, size, mtime=None, mode=None): self.src = src; self.dst = dst; self.size = size; self.mtime = mtime; self.mode = mode
+
+def local_sha256(path):
+    """파일을 메모리에 매핑해 HASH_CHUNK_SIZE씩 해시합니다. 읽기 복사가 없고, 큰 조각은 hashlib이 GIL을 놓고 계산합니다.
+    프로세스 풀에서 부를 수 있도록 모듈 최상위 함수입니다. 읽을 수 없으면 None입니다."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0: return digest.hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(view), HASH_CHUNK_SIZE): digest.update(view[offset:offset + HASH_CHUNK_SIZE])
+                finally: view.release()
+    except (OSError, ValueError): return None
+    return digest.hexdigest()
+
+def local_sha256_many(paths, workers=None):
+    """로컬 파일들의 sha256을 {경로: 해시}로 돌려줍니다. 합계가 HASH_PROCESS_MIN_BYTES보다 크면 여러 프로세스가 나눠 계산합니다."""
+    paths = [path for path in paths if os.path.isfile(path)]
+    if len(paths) > 1 and sum(os.path.getsize(path) for path in paths) >= HASH_PROCESS_MIN_BYTES:
+        try:
+            # Tk와 paramiko 스레드가 도는 프로세스를 fork하면 자식이 잠금을 쥔 채 멈출 수 있으므로 깨끗한 프로세스에서 시작합니다.
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context(method)) as executor:
+                hashes = list(executor.map(local_sha256, paths, chunksize=max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))))
+            return {path: digest for path, digest in zip(paths, hashes) if digest}
+        except (OSError, BrokenProcessPool): pass   # 프로세스를 만들 수 없는 환경이면 이 프로세스에서 계산
+    return {path: digest for path, digest in ((path, local_sha256(path)) for path in paths) if digest}
+
+def _parse_sha256sum(output):
+    """sha256sum 출력 줄을 {경로: 해시}로 바꿉니다. 이름에 줄바꿈이나 역슬래시가 있으면 GNU sha256sum은 줄 앞에 '\\'를 붙여 이스케이프합니다."""
+    hashes = {}
+    for line in output.split('\n'):
+        escaped = line.startswith('\\'); digest, _, path = line[1 if escaped else 0:].partition('  ')
+        if escaped: path = re.sub(r'\\(.)', lambda m: {'n': '\n', 'r': '\r', '\\': '\\'}.get(m.group(1), m.group(1)), path)
+        if path: hashes[path] = digest
+    return hashes
+
+def remote_sha256(pool, paths, workers=HASH_COMMANDS):
+    """원격 파일들의 sha256을 서버에서 계산합니다. HASH_BATCH_SIZE개씩 묶은 sha256sum 명령을 workers개 채널에서 동시에 실행하고,
+    명령을 쓸 수 없거나 빠진 파일은 SFTP 채널들에서 읽어 계산합니다. {경로: 해시}를 돌려줍니다."""
+    def run_batch(batch):
+        try: return _parse_sha256sum(run_remote_command(pool.ssh_client, "sha256sum -- " + " ".join(shlex.quote(p) for p in batch))[1])
+        except Exception: return {}
+    def read_hash(path):
+        try:
+            digest = hashlib.sha256()
+            with pool.channel() as sftp, sftp.open(path, 'rb') as f:
+                f.prefetch()
+                for block in iter(lambda: f.read(RELAY_CHUNK_SIZE), b""): digest.update(block)
+            return path, digest.hexdigest()
+        except IOError: return path, None
+    hashes = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for result in executor.map(run_batch, [paths[start:start + HASH_BATCH_SIZE] for start in range(0, len(paths), HASH_BATCH_SIZE)]): hashes.update(result)
+        for path, digest in executor.map(read_hash, [path for path in paths if path not in hashes]):
+            if digest: hashes[path] = digest
+    return hashes
+
+def confirm_writes(dst_file):
+    """대상 파일에 보낸 쓰기가 모두 반영되었음을 확인합니다. 파이프라인 SFTP 쓰기는 응답을 기다리지 않으므로 밀린 응답을 모두 받고
+    (쓰기 오류는 여기서 IOError로 올라옵니다), 로컬 파일은 버퍼를 비웁니다."""
+    pending = getattr(dst_file, '_reqs', None)
+    if pending is None: dst_file.flush(); return
+    while pending: dst_file.sftp._read_response(pending.popleft())
+
+def copy_range(src_file, dst_file, offset, length, remote_src, cancel=None, progress=None, checkpoint=None):
+    """원본 파일의 [offset, offset + length) 구간을 대상 파일의 같은 위치에 쓰고, progress(쓴 위치)를 청크마다 호출합니다.
+    checkpoint(위치)는 그 위치까지의 쓰기를 서버가 모두 확인한 뒤에만, JOURNAL_CONFIRM_BYTES마다와 끝에서 부릅니다.
+    미리 크기를 잡아 둔 .part 파일은 크기로 쓰인 범위를 알 수 없으므로, 이어받기 위치는 이렇게 확인된 값만 저널에 남깁니다."""
+    end = offset + length; dst_file.seek(offset); confirmed = offset
+    if not remote_src: src_file.seek(offset)
+    while offset < end:
+        if cancel and cancel.is_set(): raise IOError("다른 구간의 오류로 전송이 취소되었습니다.")
+        size = min(RELAY_CHUNK_SIZE, end - offset)
+        data = b"".join(src_file.readv([(offset, size)])) if remote_src else src_file.read(size)
+        if not data: raise IOError(f"원본 파일이 예상보다 일찍 끝났습니다 (offset {offset})")
+        dst_file.write(data); offset += len(data)
+        if progress: progress(offset)
+        if checkpoint and (offset - confirmed >= JOURNAL_CONFIRM_BYTES or offset >= end): confirm_writes(dst_file); checkpoint(offset); confirmed = offset
+
+def run_remote_command(ssh_client, command):
+    """원격 명령을 실행하고 (종료 코드, 표준 출력, 표준 오류)를 돌려줍니다."""
+    _, stdout, stderr = ssh_client.exec_command(command)
+    out = stdout.read(); err = stderr.read()
+    return stdout.channel.recv_exit_status(), out.decode('utf-8', 'replace'), err.decode('utf-8', 'replace')
+
+def remote_has_command(ssh_client, name):
+    """셸 명령을 실행할 수 있고 name 명령이 있는지 확인합니다. SFTP 전용 계정에서는 False입니다."""
+    try: return run_remote_command(ssh_client, f"command -v {shlex.quote(name)}")[0] == 0
+    except Exception: return False
+
+def _tar_create_command(remote_path, compress):
+    parent, name = posixpath.split(remote_path.rstrip('/'))
+    return f"tar c{'z' if compress else ''}f - -C {shlex.quote(parent or '/')} -- {shlex.quote(name)}"
+
+def _tar_extract_command(remote_parent, compress):
+    return f"tar x{'z' if compress else ''}f - -C {shlex.quote(remote_parent)}"
+
+def _check_exit(channel, stderr, what):
+    status = channel.recv_exit_status()
+    if status != 0: raise IOError(f"{what} 실패 (종료 코드 {status}): {stderr.read().decode('utf-8', 'replace').strip()}")
+
+def tar_stream_download(ssh_client, remote_path, local_parent, compress=False, on_bytes=None):
+    """원격에서 tar cf - 로 만든 스트림을 받아 바로 로컬에 풉니다. 푼 파일 수를 돌려줍니다."""
+    _, stdout, stderr = ssh_client.exec_command(_tar_create_command(remote_path, compress)); count = 0
+    extract = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+    with tarfile.open(fileobj=stdout, mode='r|gz' if compress else 'r|') as tar:
+        for member in tar:
+            tar.extract(member, local_parent, **extract); count += member.isfile()
+            if on_bytes: on_bytes(member.size)
+    _check_exit(stdout.channel, stderr, "원격 tar 생성"); return count
+
+def tar_stream_upload(ssh_client, local_path, remote_parent, compress=False, on_bytes=None):
+    """로컬 폴더를 tar 스트림으로 만들어 원격의 tar xf - 로 바로 풉니다. 보낸 파일 수를 돌려줍니다."""
+    stdin, stdout, stderr = ssh_client.exec_command(_tar_extract_command(remote_parent, compress)); count = [0]
+    def counted(info):
+        count[0] += info.isfile()
+        if on_bytes: on_bytes(info.size)
+        return info
+    with tarfile.open(fileobj=stdin, mode='w|gz' if compress else 'w|') as tar: tar.add(local_path, arcname=os.path.basename(local_path.rstrip(os.sep)), filter=counted)
+    stdin.flush(); stdin.channel.shutdown_write()
+    _check_exit(stdout.channel, stderr, "원격 tar 풀기"); return count[0]
+
+class _ChunkReader:
+    """큐로 받은 바이트 청크를 tarfile이 스트림으로 읽을 수 있는 read(n)으로 내보냅니다. None은 스트림의 끝입니다."""
+    def __init__(self): self.chunks = Queue(); self._buffer = b""; self._position = 0; self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) - self._position < size):
+            chunk = self.chunks.get()
+            if chunk is None: self._done = True
+            else: self._buffer = self._buffer[self._position:] + chunk; self._position = 0
+        end = len(self._buffer) if size < 0 else self._position + size
+        data = self._buffer[self._position:end]; self._position += len(data); return data
+
+def tar_stream_relay(src_client, dst_client, remote_path, dst_parent, compress=False, on_bytes=None):
+    """원본 서버의 tar cf - 출력을 대상 서버의 tar xf - 입력으로 청크 단위로 흘려보냅니다.
+    같은 청크를 별도 스레드의 tarfile 스트림 읽기에도 넘겨 보낸 파일 수를 세어 돌려줍니다."""
+    _, src_out, src_err = src_client.exec_command(_tar_create_command(remote_path, compress))
+    dst_in, dst_out, dst_err = dst_client.exec_command(_tar_extract_command(dst_parent, compress))
+    reader = _ChunkReader(); count = [0]; counting = [True]
+    def count_members():
+        try:
+            with tarfile.open(fileobj=reader, mode='r|gz' if compress else 'r|') as tar:
+                for member in tar: count[0] += member.isfile()
+        except (tarfile.TarError, OSError, EOFError): pass
+        finally: counting[0] = False
+    counter = Thread(target=count_members, daemon=True); counter.start()
+    try:
+        for chunk in iter(lambda: src_out.channel.recv(RELAY_CHUNK_SIZE), b""):
+            dst_in.channel.sendall(chunk)
+            # 세는 쪽이 아카이브 끝을 지났거나 실패했으면 더 넘기지 않습니다(남은 청크가 큐에 쌓이지 않게).
+            if counting[0]: reader.chunks.put(chunk)
+            if on_bytes: on_bytes(len(chunk))
+    finally: reader.chunks.put(None)
+    dst_in.channel.shutdown_write()
+    _check_exit(src_out.channel, src_err, "원본 tar 생성"); _check_exit(dst_out.channel, dst_err, "대상 tar 풀기")
+    counter.join(); return count[0]
+
+class TransferCancelled(Exception):
+    """사용자가 작업을 취소했습니다. 저널에 기록된 위치는 남으므로 나중에 이어받을 수 있습니다."""
+
+class TokenBucket:
+    """초당 rate 바이트까지 허용하는 토큰 버킷. 여러 스레드가 나눠 쓰며, rate가 0이면 제한하지 않습니다.
+    청크가 버킷보다 커도 되도록 토큰을 미리 빌려 쓰고, 빚을 갚는 시간만큼 잠금 밖에서 기다립니다."""
+    def __init__(self, rate=0):
+        self.rate = rate; self._tokens = rate; self._last = time.monotonic(); self._lock = Lock()
+
+    def set_rate(self, rate):
+        with self._lock: self.rate = rate; self._tokens = min(self._tokens, rate)
+
+    def consume(self, count, cancel=None):
+        with self._lock:
+            if not self.rate: return
+            now = time.monotonic(); self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate) - count; self._last = now
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        deadline = time.monotonic() + delay
+        while not (cancel and cancel.is_set()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return
+            time.sleep(min(remaining, 0.2))
+
+class TransferProgress:
+    """전송 스레드는 자기 스레드 전용 슬롯에 바이트/파일 수를 잠금 없이 더하고, Tk 스레드가 주기적으로 합계를 읽어 속도와 남은 시간을 계산합니다."""
+    def __init__(self, label):
+        self.label = label; self.total_bytes = 0; self.total_files = 0; self.cancel = Event(); self.limiter = None
+        self._running = Event(); self._running.set()
+        self._slots = []; self._local = local(); self._rate = 0.0; self._last = (time.monotonic(), 0)
+
+    def begin(self, total_files, total_bytes): self.total_files += total_files; self.total_bytes += total_bytes
+
+    def _slot(self):
+        slot = getattr(self._local, 'slot', None)
+        if slot is None: slot = self._local.slot = [0, 0]; self._slots.append(slot)
+        return slot
+
+    def add_bytes(self, count): self._slot()[0] += count
+    def file_done(self): self._slot()[1] += 1
+
+    def pause(self): self._running.clear()
+    def resume(self): self._running.set()
+    @property
+    def paused(self): return not self._running.is_set()
+
+    def wait_if_paused(self):
+        """일시정지 중이면 재개되거나 취소될 때까지 기다립니다."""
+        while not self._running.wait(0.5):
+            if self.cancel.is_set(): return
+
+    def transferred(self, count):
+        """실제로 보낸 바이트를 더합니다. 전송 스레드는 여기서 일시정지, 대역폭 제한, 취소를 함께 처리합니다."""
+        self.add_bytes(count); self.wait_if_paused()
+        if self.cancel.is_set(): raise TransferCancelled(self.label)
+        if self.limiter: self.limiter.consume(count, self.cancel)
+
+    def tracker(self, start=0):
+        """절대 위치(offset)를 받는 청크 콜백을 바이트 증가량으로 바꿔 더하는 함수를 돌려줍니다."""
+        last = [start]
+        def track(offset): delta = offset - last[0]; last[0] = offset; self.transferred(delta)
+        return track
+
+    def snapshot(self):
+        """(완료 바이트, 완료 파일 수, 초당 바이트, 남은 초 또는 None). Tk 스레드에서만 호출합니다."""
+        slots = list(self._slots); done_bytes = sum(slot[0] for slot in slots); done_files = sum(slot[1] for slot in slots)
+        # 재연결 후 재시도한 파일은 이미 보낸 부분이 다시 더해지므로 전체 크기를 넘지 않게 자릅니다.
+        if self.total_bytes: done_bytes = min(done_bytes, self.total_bytes)
+        now = time.monotonic(); last_time, last_bytes = self._last
+        if now - last_time >= 0.5:
+            instant = (done_bytes - last_bytes) / (now - last_time)
+            self._rate = instant if not self._rate else 0.7 * self._rate + 0.3 * instant; self._last = (now, done_bytes)
+        eta = (self.total_bytes - done_bytes) / self._rate if self._rate > 0 and self.total_bytes > done_bytes else None
+        return done_bytes, done_files, self._rate, eta
+
+    def fraction(self):
+        """진행 비율 (0~1). 바이트를 세지 않는 작업(삭제 등)은 항목 수로 계산합니다."""
+        done_bytes, done_files = self.snapshot()[:2]
+        if self.total_bytes: return done_bytes / self.total_bytes
+        return done_files / self.total_files if self.total_files else 0
+
+    def summary(self):
+        done_bytes, done_files, rate, eta = self.snapshot()
+        if not self.total_bytes: text = f"{done_files}" + (f"/{self.total_files}" if self.total_files else "") + "개 항목"
+        else:
+            text = f"파일 {done_files}/{self.total_files}, {format_size(done_bytes)}/{format_size(self.total_bytes)}, {format_size(rate)}/s"
+            if eta is not None: text += f", 남은 시간 {int(eta) // 60:02d}:{int(eta) % 60:02d}"
+        return text + (" (취소 중)" if self.cancel.is_set() else "")
+
+    def describe(self): return f"{self.label}: {self.summary()}"
+
+class QueuedJob:
+    """대기열의 작업 하나. task(progress)가 실제 작업이며, hosts는 호스트별 동시 작업 제한에 쓰입니다."""
+    __slots__ = ('id', 'label', 'task', 'hosts', 'priority', 'state', 'progress', 'on_done', 'on_error', 'hold')
+    def __init__(self, job_id, label, task, hosts, priority, bandwidth, on_done, on_error):
+        self.id = job_id; self.label = label; self.task = task; self.hosts = tuple(sorted(set(h for h in hosts if h)))
+        self.priority = priority; self.state = TransferQueue.WAITING; self.on_done = on_done; self.on_error = on_error; self.hold = False
+        self.progress = TransferProgress(label); self.progress.limiter = TokenBucket(bandwidth)
+
+class TransferQueue:
+    """작업 대기열과 스케줄러. 우선순위가 높은 작업부터, 같으면 대기열 순서대로 실행하면서 전체 동시 작업 수와 호스트별 동시 작업 수를 지킵니다.
+    상태는 잠금으로 보호하며, 완료·실패 콜백은 dispatch(함수, 인자)를 통해 호출합니다(화면에서는 Tk 스레드로 넘깁니다)."""
+    WAITING, RUNNING, PAUSED, DONE, FAILED, CANCELLED = "대기", "실행 중", "일시정지", "완료", "실패", "취소"
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, max_running=QUEUE_MAX_RUNNING, host_limit=QUEUE_HOST_LIMIT, dispatch=None):
+        self.max_running = max_running; self.host_limit = host_limit; self.dispatch = dispatch or (lambda func, *args: func(*args))
+        self._jobs = []; self._next_id = 1; self._lock = Lock()
+
+    def submit(self, label, task, hosts=(), priority=0, bandwidth=0, on_done=None, on_error=None):
+        with self._lock:
+            job = QueuedJob(self._next_id, label, task, hosts, priority, bandwidth, on_done, on_error); self._next_id += 1; self._jobs.append(job)
+        self.schedule(); return job
+
+    def jobs(self):
+        with self._lock: return list(self._jobs)
+
+    def running(self): return [job for job in self.jobs() if job.state in (self.RUNNING, self.PAUSED) and not job.hold]
+
+    def _find(self, job_id): return next((job for job in self._jobs if job.id == job_id), None)
+
+    def schedule(self):
+        """실행할 수 있는 대기 작업을 골라 스레드를 시작합니다."""
+        with self._lock:
+            active = [job for job in self._jobs if job.state in (self.RUNNING, self.PAUSED) and not job.hold]; started = []
+            per_host = {}
+            for job in active:
+                for host in job.hosts: per_host[host] = per_host.get(host, 0) + 1
+            waiting = sorted((job for job in self._jobs if job.state == self.WAITING), key=lambda job: -job.priority)
+            for job in waiting:
+                if len(active) + len(started) >= self.max_running: break
+                if any(per_host.get(host, 0) >= self.host_limit for host in job.hosts): continue
+                for host in job.hosts: per_host[host] = per_host.get(host, 0) + 1
+                job.state = self.RUNNING; started.append(job)
+        for job in started: Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try: result = job.task(job.progress)
+        except TransferCancelled as e: self._finish(job, self.CANCELLED, job.on_error, e)
+        except Exception as e: self._finish(job, self.FAILED, job.on_error, e)
+        else: self._finish(job, self.CANCELLED if job.progress.cancel.is_set() else self.DONE, job.on_done, result)
+
+    def _finish(self, job, state, callback, value):
+        with self._lock: job.state = state
+        if callback: self.dispatch(callback, value)
+        self.schedule()
+
+    def move(self, job_id, delta):
+        """작업의 대기열 위치를 delta만큼 옮깁니다. 같은 우선순위 안에서는 앞에 있는 작업이 먼저 실행됩니다."""
+        with self._lock:
+            job = self._find(job_id)
+            if not job: return
+            index = self._jobs.index(job); target = max(0, min(len(self._jobs) - 1, index + delta))
+            self._jobs.insert(target, self._jobs.pop(index))
+
+    def set_priority(self, job_id, delta):
+        with self._lock:
+            job = self._find(job_id)
+            if job: job.priority += delta
+        self.schedule()
+
+    def set_bandwidth(self, job_id, rate):
+        with self._lock: job = self._find(job_id)
+        if job: job.progress.limiter.set_rate(rate)
+
+    def pause(self, job_id):
+        """대기 중인 작업은 실행되지 않게 붙잡고, 실행 중인 작업은 다음 청크에서 멈춥니다(자리는 그대로 차지합니다)."""
+        with self._lock:
+            job = self._find(job_id)
+            if not job or job.state in self.FINISHED: return
+            if job.state == self.WAITING: job.hold = True
+            job.state = self.PAUSED; job.progress.pause()
+
+    def resume(self, job_id):
+        with self._lock:
+            job = self._find(job_id)
+            if not job or job.state != self.PAUSED: return
+            job.state = self.WAITING if job.hold else self.RUNNING; job.hold = False; job.progress.resume()
+        self.schedule()
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._find(job_id)
+            if not job or job.state in self.FINISHED: return
+            job.progress.cancel.set(); job.progress.resume()
+            if job.state == self.WAITING or job.hold: job.state = self.CANCELLED; job.hold = False
+
+    def cancel_all(self):
+        for job in self.jobs(): self.cancel(job.id)
+
+    def clear_finished(self):
+        with self._lock: self._jobs = [job for job in self._jobs if job.state not in self.FINISHED]
+
+class TransferJournal:
+    """작업마다 원본, 대상, 크기, 수정 시각과 확인된 오프셋을 디스크에 기록해 중단된 전송을 이어받을 수 있게 하는 저널"""
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path; self._lock = Lock(); self._unsaved = 0; self._unsaved_files = 0; self._saved_at = time.monotonic()
+        try:
+            with open(path, 'r', encoding='utf-8') as f: self.entries = json.load(f)
+        except (OSError, ValueError): self.entries = {}
+
+    @staticmethod
+    def key(kind, src_host, src, dst_host, dst): return f"{kind}|{src_host or 'local'}:{src}|{dst_host or 'local'}:{dst}"
+
+    def begin(self, key, kind, src_host, src, dst_host, dst, size, mtime=None):
+        """기존 기록이 크기와 수정 시각이 같은 파일이면 그대로 돌려주고, 아니면 오프셋 0의 새 기록을 만듭니다.
+        같은 크기로 제자리에서 고쳐진 원본을 이전 앞부분에 이어 붙이거나 완료로 건너뛰지 않기 위해 수정 시각도 비교합니다."""
+        with self._lock:
+            entry = self.entries.get(key)
+            if not entry or entry['size'] != size or not self._same_mtime(entry.get('mtime'), mtime):
+                entry = self.entries[key] = {'kind': kind, 'src_host': src_host, 'src': src, 'dst_host': dst_host, 'dst': dst, 'size': size, 'mtime': mtime,
+                                             'offset': 0, 'done': False}
+            return entry
+
+    @staticmethod
+    def _same_mtime(recorded, current):
+        if recorded is None or current is None: return recorded is current
+        return abs(recorded - current) <= MTIME_TOLERANCE
+
+    def update(self, key, offset, segment=None):
+        with self._lock:
+            entry = self.entries.get(key)
+            if not entry: return
+            previous = entry['offset'] if segment is None else entry.setdefault('segments', {}).get(str(segment), segment)
+            if segment is None: entry['offset'] = offset
+            else: entry['segments'][str(segment)] = offset
+            self._unsaved += max(0, offset - previous); flush = self._should_flush()
+        if flush: self.save()
+
+    def finish(self, key):
+        """완료 기록도 오프셋처럼 모아서 씁니다. 파일마다 저널 전체를 다시 쓰면 작은 파일이 많을 때 O(n²)이 되므로,
+        실행을 마치거나 중단할 때 엔진이 save()로 남은 기록을 씁니다."""
+        with self._lock:
+            if key in self.entries: self.entries[key].update(done=True, offset=self.entries[key]['size']); self.entries[key].pop('segments', None)
+            self._unsaved_files += 1; flush = self._should_flush()
+        if flush: self.save()
+
+    def _should_flush(self):
+        return (self._unsaved >= JOURNAL_FLUSH_BYTES or self._unsaved_files >= JOURNAL_FLUSH_FILES
+                or time.monotonic() - self._saved_at >= JOURNAL_FLUSH_SECONDS)
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys: self.entries.pop(key, None)
+        self.save()
+
+    def pending(self):
+        with self._lock: return [dict(entry, key=key) for key, entry in self.entries.items()]
+
+    def save(self):
+        with self._lock:
+            self._unsaved = 0; self._unsaved_files = 0; self._saved_at = time.monotonic(); data = json.dumps(self.entries, ensure_ascii=False)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True); temp_path = self.path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f: f.write(data)
+                os.replace(temp_path, self.path)
+            except OSError: pass
+
+def remote_join(parent, name): return f"{parent.rstrip('/')}/{name}" if parent != '/' else f"/{name}"
+
+def delete_tree(items, list_dir, remove, rmdir, workers=TRANSFER_WORKERS, cancel=None, progress=None):
+    """items: (경로, 디렉토리 여부) 목록. 디렉토리를 단계별로 병렬 순회해 전체 항목을 모은 뒤, 파일을 여러 작업자가 동시에 지우고
+    디렉토리는 가장 깊은 단계부터 지웁니다. list_dir(경로)는 [(하위 경로, 디렉토리 여부)]를 돌려줍니다.
+    cancel이 설정되면 진행 중인 요청만 마치고 멈춥니다. 지운 항목 수를 돌려줍니다."""
+    cancel = cancel or Event(); files = [path for path, is_dir in items if not is_dir]; levels = [[path for path, is_dir in items if is_dir]]
+    def step(func, path):
+        if progress: progress.wait_if_paused()
+        if cancel.is_set(): return 0
+        func(path)
+        if progress: progress.file_done()
+        return 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while levels[-1] and not cancel.is_set():
+            level = []
+            for children in executor.map(list_dir, levels[-1]):
+                for path, is_dir in children: (level if is_dir else files).append(path)
+            levels.append(level)
+        if progress: progress.begin(len(files) + sum(len(level) for level in levels), 0)
+        count = sum(executor.map(step, [remove] * len(files), files))
+        for level in reversed(levels): count += sum(executor.map(step, [rmdir] * len(level), level))
+    return count
+
+def local_delete_tree(items, workers=TRANSFER_WORKERS, cancel=None, progress=None):
+    """로컬 항목들을 delete_tree로 지웁니다. 디렉토리를 가리키는 심볼릭 링크는 따라가지 않고 링크만 지웁니다."""
+    def list_dir(path):
+        with os.scandir(path) as entries: return [(entry.path, entry.is_dir(follow_symlinks=False)) for entry in entries]
+    return delete_tree(items, list_dir, os.remove, os.rmdir, workers, cancel, progress)
+
+def remote_delete_tree(connection, items, cancel=None, progress=None):
+    """원격 항목들을 지웁니다. 셸을 쓸 수 있으면 rm -rfv 명령 하나로 서버에서 지우고 출력 줄 수로 진행률을 셉니다.
+    SFTP 전용 계정이면 연결의 여러 SFTP 채널에서 삭제 요청을 동시에 보내는 방식으로 지웁니다."""
+    cancel = cancel or Event()
+    if remote_has_command(connection.client, 'rm'):
+        _, stdout, stderr = connection.client.exec_command("rm -rfv -- " + " ".join(shlex.quote(path) for path, _ in items)); count = 0
+        for _ in stdout:
+            count += 1
+            if progress: progress.file_done(); progress.wait_if_paused()
+            # 채널을 닫으면 rm은 다음 출력에서 SIGPIPE로 끝납니다.
+            if cancel.is_set(): stdout.channel.close(); return count
+        _check_exit(stdout.channel, stderr, "rm")
+        return count
+    pool = connection.channels
+    def list_dir(path):
+        with pool.channel() as sftp: return [(remote_join(path, attr.filename), stat.S_ISDIR(attr.st_mode or 0)) for attr in sftp.listdir_attr(path)]
+    def remove(path):
+        with pool.channel() as sftp: sftp.remove(path)
+    def rmdir(path):
+        with pool.channel() as sftp: sftp.rmdir(path)
+    return delete_tree(items, list_dir, remove, rmdir, pool.size, cancel, progress)
+
+@contextmanager
+def _pair_context(first, second):
+    with first as a, second as b: yield a, b
+
+class SearchQuery:
+    """원격 검색 조건. pattern은 이름에 대한 glob(기본, 대소문자 구분)이나 정규식(regex=True, 이름의 일부와 맞으면 됨)입니다.
+    크기(바이트)를 지정하면 파일만, 수정 시각은 epoch 초로 비교합니다. max_depth가 1이면 root 바로 아래만 찾습니다."""
+    def __init__(self, pattern='*', regex=False, min_size=None, max_size=None, newer_than=None, older_than=None, max_depth=None):
+        self.pattern = pattern or '*'; self.regex = regex; self.min_size = min_size; self.max_size = max_size
+        self.newer_than = newer_than; self.older_than = older_than; self.max_depth = max_depth
+        self._match_name = re.compile(self.pattern).search if regex else (lambda name: fnmatch.fnmatchcase(name, self.pattern))
+
+    def matches(self, name, is_dir, size, mtime):
+        if (self.min_size is not None or self.max_size is not None) and is_dir: return False
+        if self.min_size is not None and size < self.min_size: return False
+        if self.max_size is not None and size > self.max_size: return False
+        if self.newer_than is not None and mtime < self.newer_than: return False
+        if self.older_than is not None and mtime > self.older_than: return False
+        return bool(self._match_name(name))
+
+def remote_find_supported(ssh_client):
+    """원격 find가 GNU 확장(-printf)을 지원하는지 확인합니다. 셸이 없는 계정이나 BSD find는 False입니다."""
+    try: code, out, _ = run_remote_command(ssh_client, "find / -maxdepth 0 -printf x")
+    except Exception: return False
+    return code == 0 and out == 'x'
+
+def _find_search(client, root, query, on_results, cancel):
+    """서버의 find가 트리를 훑으며 항목마다 종류, 크기, 수정 시각, 상대 경로를 탭으로 나눈 NUL 종료 레코드를 내보내면 받는 대로 걸러 넘깁니다.
+    glob 이름 조건은 -name으로 서버에서 먼저 거르고, 나머지 조건은 SFTP 방식과 같은 matches로 다시 확인합니다."""
+    command = ['find', shlex.quote(root), '-mindepth', '1']
+    if query.max_depth: command += ['-maxdepth', str(query.max_depth)]
+    if not query.regex and query.pattern != '*': command += ['-name', shlex.quote(query.pattern)]
+    command += ['-printf', shlex.quote('%y\\t%s\\t%T@\\t%P\\0'), '2>/dev/null']
+    channel = client.get_transport().open_session(); channel.settimeout(0.5); channel.exec_command(' '.join(command))
+    pending = b''; count = 0
+    try:
+        while not cancel.is_set():
+            try: data = channel.recv(SEARCH_READ_SIZE)
+            except socket.timeout: continue
+            if not data: break
+            *records, pending = (pending + data).split(b'\0'); hits = []
+            for record in records:
+                kind, size, mtime, path = record.decode('utf-8', 'replace').split('\t', 3)
+                is_dir = kind == 'd'; size = int(size); mtime = int(float(mtime))
+                if query.matches(posixpath.basename(path), is_dir, size, mtime): hits.append(FileEntry(path, is_dir, size, mtime))
+            if hits: count += len(hits); on_results(hits)
+    finally: channel.close()
+    return count
+
+def parallel_walk(root, list_dir, visit, cancel=None, workers=SEARCH_WORKERS, max_depth=None, join=remote_join, skip_errors=True):
+    """root부터 너비 우선으로 여러 디렉토리를 동시에 읽습니다. list_dir(경로)는 FileEntry 목록을 돌려주고,
+    visit(root 기준 상대 경로, FileEntry 목록)은 읽은 디렉토리마다 호출한 스레드에서 불리며, 상위 디렉토리가 항상 하위보다 먼저입니다.
+    root를 읽지 못하면 오류를 올리고, 읽을 수 없는 하위 디렉토리는 find나 du처럼 건너뜁니다(skip_errors=False면 오류를 올림)."""
+    cancel = cancel or Event()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        pending = {executor.submit(list_dir, root): (root, '', 1)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, relative, depth = pending.pop(future)
+                if cancel.is_set(): continue
+                try: entries = future.result()
+                except (IOError, OSError):
+                    if path != root and skip_errors: continue
+                    for other in pending: other.cancel()
+                    raise
+                for entry in entries:
+                    if entry.is_dir and (not max_depth or depth < max_depth):
+                        child = join(path, entry.name); pending[executor.submit(list_dir, child)] = (child, f"{relative}/{entry.name}" if relative else entry.name, depth + 1)
+                visit(relative, entries)
+            if cancel.is_set():
+                for future in pending: future.cancel()
+
+def _remote_lister(connection):
+    def list_dir(path):
+        def read():
+            with connection.channels.channel() as sftp: return [FileEntry.from_attr(attr) for attr in sftp.listdir_attr(path)]
+        return with_reconnect([connection], read)
+    return list_dir
+
+def _local_list_dir(path):
+    """parallel_walk용 로컬 목록. 원격 listdir_attr처럼 심볼릭 링크를 따라가지 않는 lstat 정보를 씁니다."""
+    result = []
+    with os.scandir(path) as entries:
+        for entry in entries: st = entry.stat(follow_symlinks=False); result.append(FileEntry(entry.name, stat.S_ISDIR(st.st_mode), st.st_size, st.st_mtime))
+    return result
+
+def _local_plan_list_dir(path):
+    """전송 계획용 로컬 목록. 파일을 가리키는 심볼릭 링크는 대상 파일의 정보로 바꾸고, _remote_plan_lister처럼 순환을 막기 위해
+    디렉토리를 가리키는 링크와 끊어진 링크는 뺍니다."""
+    result = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try: st = entry.stat()
+            except OSError: continue
+            if entry.is_symlink() and stat.S_ISDIR(st.st_mode): continue
+            result.append(FileEntry(entry.name, stat.S_ISDIR(st.st_mode), st.st_size, st.st_mtime, st.st_mode))
+    return result
+
+def _remote_plan_lister(connection):
+    """전송 계획용 원격 목록. listdir_attr는 lstat 정보라 심볼릭 링크의 크기가 링크 자체의 길이이므로, 링크는 stat으로 가리키는 파일의
+    크기·시각·모드로 바꿉니다. 순환을 막기 위해 디렉토리를 가리키는 링크와 끊어진 링크는 뺍니다."""
+    def list_dir(path):
+        def read():
+            with connection.channels.channel() as sftp:
+                result = []
+                for attr in sftp.listdir_attr(path):
+                    if stat.S_ISLNK(attr.st_mode or 0):
+                        try: target = sftp.stat(remote_join(path, attr.filename))
+                        except IOError: continue
+                        if stat.S_ISDIR(target.st_mode or 0): continue
+                        target.filename = attr.filename; attr = target
+                    result.append(FileEntry.from_attr(attr))
+                return result
+        return with_reconnect([connection], read)
+    return list_dir
+
+def plan_tree(src_root, dst_root, list_dir, src_join=remote_join, dst_join=remote_join, workers=TRANSFER_WORKERS, cancel=None):
+    """원본 폴더 전체를 parallel_walk로 여러 디렉토리씩 동시에 읽어 (만들 대상 디렉토리 목록, 파일 작업 목록)을 돌려줍니다.
+    디렉토리는 상위가 하위보다 먼저 옵니다. list_dir는 심볼릭 링크를 가리키는 대상의 정보로 바꿔 돌려줘야 하며(크기가 곧 복사할 바이트 수),
+    일반 파일이 아닌 항목(FIFO·소켓·장치 파일)은 열면 멈출 수 있어 계획에서 뺍니다.
+    읽지 못한 디렉토리가 있으면 오류를 올리고, 취소되면 TransferCancelled를 올립니다."""
+    dirs, files = [dst_root], []
+    def visit(relative, entries):
+        src_parent, dst_parent = src_root, dst_root
+        for name in relative.split('/') if relative else (): src_parent = src_join(src_parent, name); dst_parent = dst_join(dst_parent, name)
+        for entry in entries:
+            if entry.is_dir: dirs.append(dst_join(dst_parent, entry.name))
+            elif entry.mode is None or stat.S_ISREG(entry.mode):
+                files.append(TransferJob(src_join(src_parent, entry.name), dst_join(dst_parent, entry.name), entry.size, entry.mtime or None, entry.mode))
+    parallel_walk(src_root, list_dir, visit, cancel, workers, join=src_join, skip_errors=False)
+    if cancel and cancel.is_set(): raise TransferCancelled()
+    return dirs, files
+
+def make_remote_dirs(pool, dirs, workers=TRANSFER_WORKERS):
+    """디렉토리를 깊이별로 나눠, 같은 깊이의 디렉토리들을 여러 채널에서 동시에 만듭니다. 이미 있는 디렉토리는 그대로 둡니다."""
+    levels = {}
+    for path in dirs: levels.setdefault(path.rstrip('/').count('/'), []).append(path)
+    def create(paths):
+        with pool.channel() as sftp:
+            for path in paths:
+                try: sftp.mkdir(path)
+                except IOError: pass
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for depth in sorted(levels):
+            paths = levels[depth]; step = -(-len(paths) // max(1, workers))
+            list(executor.map(create, [paths[start:start + step] for start in range(0, len(paths), step)]))
+
+def _walk_search(connection, root, query, on_results, cancel, workers):
+    """find를 쓸 수 없을 때: 여러 SFTP 채널에서 listdir_attr 요청을 동시에 여러 개 보내며 너비 우선으로 훑습니다."""
+    count = [0]
+    def visit(relative, entries):
+        hits = [FileEntry(f"{relative}/{entry.name}" if relative else entry.name, entry.is_dir, entry.size, entry.mtime)
+                for entry in entries if query.matches(entry.name, entry.is_dir, entry.size, entry.mtime)]
+        if hits: count[0] += len(hits); on_results(hits)
+    parallel_walk(root, _remote_lister(connection), visit, cancel, workers, query.max_depth)
+    return count[0]
+
+def remote_search(connection, root, query, on_results, cancel=None, workers=SEARCH_WORKERS):
+    """root 아래에서 query에 맞는 항목을 찾아 묶음마다 on_results(FileEntry 목록)를 작업 스레드에서 호출합니다.
+    FileEntry.name은 root 기준 상대 경로입니다. 서버에서 find를 실행할 수 있으면 그 출력을 받고, 아니면 SFTP로 병렬 순회합니다.
+    (찾은 수, 사용한 방식 'find' 또는 'sftp')를 돌려주며, cancel이 설정되면 그때까지 찾은 결과만 남기고 멈춥니다."""
+    cancel = cancel or Event()
+    def check_root():
+        with connection.channels.channel() as sftp:
+            if not stat.S_ISDIR(sftp.stat(root).st_mode): raise IOError(f"디렉토리가 아닙니다: {root}")
+    with_reconnect([connection], check_root)
+    with METRICS.timer(connection.host, 'search'):
+        if remote_find_supported(connection.client): return _find_search(connection.client, root, query, on_results, cancel), 'find'
+        return _walk_search(connection, root, query, on_results, cancel, workers), 'sftp'
+
+def _run_cancellable(ssh_client, command, cancel):
+    """원격 명령을 실행해 (종료 코드, 표준 출력)을 돌려줍니다. cancel이 설정되면 채널을 닫고 TransferCancelled를 냅니다."""
+    channel = ssh_client.get_transport().open_session(); channel.settimeout(0.5); channel.exec_command(command); chunks = []
+    try:
+        while True:
+            if cancel.is_set(): raise TransferCancelled()
+            try: data = channel.recv(SEARCH_READ_SIZE)
+            except socket.timeout: continue
+            if not data: break
+            chunks.append(data)
+        return channel.recv_exit_status(), b''.join(chunks).decode('utf-8', 'replace')
+    finally: channel.close()
+
+def _du_totals(ssh_client, paths, options, cancel):
+    """du options -- paths의 첫 열을 paths 순서대로 돌려줍니다. du가 없거나 옵션을 모르면(BusyBox 등) None입니다."""
+    try: _, out = _run_cancellable(ssh_client, f"du {options} -- {' '.join(shlex.quote(path) for path in paths)} 2>/dev/null", cancel)
+    except TransferCancelled: raise
+    except Exception: return None
+    lines = [line for line in out.split('\n') if line]
+    # 읽을 수 없는 하위 폴더가 있으면 du는 1로 끝나지만 합계는 출력하므로, 줄 수가 맞으면 받아들입니다.
+    if len(lines) != len(paths): return None
+    try: return [int(line.split('\t', 1)[0]) for line in lines]
+    except ValueError: return None
+
+def _walk_usage(path, list_dir, root_entry, cancel, workers, join):
+    """parallel_walk로 path 아래 크기와 항목 수를 셉니다. du -sb처럼 폴더 자신의 크기와 개수도 포함합니다."""
+    totals = [root_entry.size, 1]
+    if not root_entry.is_dir: return tuple(totals)
+    def visit(relative, entries): totals[0] += sum(entry.size for entry in entries); totals[1] += len(entries)
+    parallel_walk(path, list_dir, visit, cancel, workers, join=join)
+    if cancel.is_set(): raise TransferCancelled()
+    return tuple(totals)
+
+def remote_disk_usage(connection, paths, cancel=None, workers=SEARCH_WORKERS):
+    """paths마다 (바이트, 항목 수)를 {경로: 값}으로 돌려줍니다. 바이트는 du -sb처럼 겉보기 크기의 합이고, 항목 수는 자신을 포함한 파일과 폴더 수입니다.
+    GNU du가 있으면 du -sb와 du -s --inodes로 서버에서 계산하고, 없으면 SFTP 병렬 순회로 셉니다. (결과, 방식 'du' 또는 'sftp')를 돌려줍니다."""
+    cancel = cancel or Event(); paths = list(paths)
+    with METRICS.timer(connection.host, 'usage'):
+        # -l: 하드 링크와 겹치는 인자도 따로 세어(SFTP 순회와 같게) 인자마다 한 줄씩 나오게 합니다.
+        sizes = _du_totals(connection.client, paths, '-sbl', cancel) if paths else None
+        counts = sizes and _du_totals(connection.client, paths, '-sl --inodes', cancel)
+        if sizes and counts: return {path: (size, count) for path, size, count in zip(paths, sizes, counts)}, 'du'
+        def root_entry(path):
+            with connection.channels.channel() as sftp: attr = sftp.lstat(path)
+            return FileEntry(posixpath.basename(path), stat.S_ISDIR(attr.st_mode or 0), attr.st_size, attr.st_mtime)
+        list_dir = _remote_lister(connection)
+        return {path: _walk_usage(path, list_dir, with_reconnect([connection], root_entry, path), cancel, workers, remote_join) for path in paths}, 'sftp'
+
+def local_disk_usage(paths, cancel=None, workers=SEARCH_WORKERS):
+    """로컬 paths마다 (바이트, 항목 수)를 {경로: 값}으로 돌려줍니다. 디렉토리를 여러 스레드가 동시에 읽습니다 (네트워크 드라이브에서 효과가 큼)."""
+    cancel = cancel or Event(); result = {}
+    for path in paths:
+        st = os.lstat(path); entry = FileEntry(os.path.basename(path), stat.S_ISDIR(st.st_mode), st.st_size, st.st_mtime)
+        result[path] = _walk_usage(path, _local_list_dir, entry, cancel, workers, os.path.join)
+    return result
+
+def remote_free_space(ssh_client, path):
+    """path가 있는 원격 파일시스템의 남은 바이트 (df -Pk). 셸을 쓸 수 없거나 알 수 없으면 None입니다.
+    (paramiko SFTP 클라이언트는 statvfs@openssh.com 확장을 지원하지 않으므로 df를 씁니다.)"""
+    try: code, out, _ = run_remote_command(ssh_client, f"df -Pk -- {shlex.quote(path)}")
+    except Exception: return None
+    lines = out.strip().split('\n')
+    if code != 0 or len(lines) < 2: return None
+    try: return int(lines[-1].split()[3]) * 1024
+    except (IndexError, ValueError): return None
+
+def local_free_space(path):
+    """path(없으면 가장 가까운 상위 폴더)가 있는 로컬 파일시스템의 남은 바이트 (statvfs). 알 수 없으면 None입니다."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path: path = os.path.dirname(path)
+    try: return shutil.disk_usage(path).free
+    except OSError: return None
+
+class UsageCache:
+    """(호스트, 경로)별 폴더 크기 (바이트, 항목 수) 메모. 호스트가 None이면 로컬입니다.
+    경로 하나가 바뀌면 그 경로와 하위 경로, 그리고 그 경로를 합계에 포함하는 상위 경로를 함께 버립니다."""
+    def __init__(self, ttl=USAGE_CACHE_TTL): self.ttl = ttl; self._entries = {}; self._lock = Lock()
+
+    @staticmethod
+    def _normalize(host, path): return os.path.normpath(path) if host is None else posixpath.normpath(path)
+
+    def get(self, host, path):
+        key = (host, self._normalize(host, path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry: return None
+            if time.monotonic() - entry[0] > self.ttl: del self._entries[key]; return None
+            return entry[1]
+
+    def put(self, host, path, usage):
+        with self._lock: self._entries[(host, self._normalize(host, path))] = (time.monotonic(), usage)
+
+    def invalidate(self, host, path=None):
+        path = path and self._normalize(host, path); sep = os.sep if host is None else '/'
+        def related(other):
+            if path is None or other == path: return True
+            inner, outer = (other, path) if len(other) > len(path) else (path, other)
+            return inner.startswith(outer.rstrip(sep) + sep)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == host and related(key[1])]: del self._entries[key]
+
+class InsufficientSpace(IOError):
+    """전송을 시작하기 전에 대상의 남은 공간이 부족하다고 확인됨"""
+
+class RelayUnavailable(IOError):
+    """연결은 살아 있지만 서버 간 직접 전송에 필요한 SFTP 채널을 열 수 없음 (서버의 세션 수 제한 등)"""
+
+@contextmanager
+def _relay_channels(pair):
+    """서버 간 직접 전송용 채널 쌍. 채널을 여는 중의 SSH 오류만 RelayUnavailable로 바꾸고, 전송 중의 오류는 그대로 둡니다."""
+    with ExitStack() as stack:
+        try: channels = stack.enter_context(pair)
+        except paramiko.SSHException as e: raise RelayUnavailable(f"서버 간 직접 전송 채널을 열 수 없습니다: {e}") from e
+        yield channels
+
+class TransferEngine:
+    """선택 항목을 평탄화해 디렉토리를 먼저 만든 뒤, 파일 작업들을 여러 SFTP 채널에서 동시에 실행합니다.
+    kind: 'upload'(로컬 → 원격), 'download'(원격 → 로컬), 'relay'(원격 → 원격)"""
+    def __init__(self, kind, src_pool=None, dst_pool=None, workers=TRANSFER_WORKERS, status=None, journal=None, sync=False, strict=False, archive=False, compress=False,
+                 verify=False):
+        self.kind = kind; self.src_pool = src_pool; self.dst_pool = dst_pool; self.journal = journal; self.verify_after = verify
+        self.sync = sync or strict; self.strict = strict; self.archive = archive; self.compress = compress; self.progress = None; self.space_target = None
+        self.workers = max(1, workers); self.status = status or (lambda message: None)
+        for pool in (src_pool, dst_pool):
+            if pool: pool.size = max(pool.size, self.workers, SEGMENT_COUNT)
+
+    def _retry(self, func, *args):
+        """원본이나 대상 연결이 끊겨 실패하면 다시 연결해 재시도합니다. 파일 복사는 저널에 확인된 위치부터 이어받습니다."""
+        return with_reconnect([pool and pool.connection for pool in (self.src_pool, self.dst_pool)], func, *args)
+
+    def plan(self, items):
+        """items: (원본 경로, 대상 경로, 디렉토리 여부) 목록. 폴더는 plan_tree로 여러 디렉토리를 동시에 읽어 미리 평탄화하므로,
+        파일 데이터를 보내기 전에 만들 폴더와 전체 파일 수·크기를 모두 압니다."""
+        dirs, files = [], []; cancel = self.progress and self.progress.cancel
+        src_join, list_dir = (os.path.join, _local_plan_list_dir) if self.kind == 'upload' else (remote_join, _remote_plan_lister(self.src_pool.connection))
+        dst_join = os.path.join if self.kind == 'download' else remote_join
+        for src, dst, is_dir in items:
+            if is_dir: sub_dirs, sub_files = plan_tree(src, dst, list_dir, src_join, dst_join, self.workers, cancel); dirs.extend(sub_dirs); files.extend(sub_files)
+            else: files.append(self._retry(self._plan_file, src, dst))
+        self.status(f"전송 계획: 폴더 {len(dirs)}개, 파일 {len(files)}개, {format_size(sum(job.size or 0 for job in files))}")
+        return dirs, files
+
+    def refresh_sources(self, files):
+        """이어받을 작업들의 원본을 다시 stat해 지금의 크기와 수정 시각으로 바꿉니다. 저널 기록과 다르면 copy가 처음부터 보냅니다.
+        원본이 없어진 작업은 뺍니다."""
+        def refresh(job):
+            try: return self._retry(self._plan_file, job.src, job.dst)
+            except (IOError, OSError): self.status(f"원본이 없어 건너뜀: {job.src}"); return None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor: return [job for job in executor.map(refresh, files) if job]
+
+    def _plan_file(self, src, dst):
+        if self.kind == 'upload': st = os.stat(src)
+        else:
+            with self.src_pool.channel() as sftp: st = sftp.stat(src)
+        return TransferJob(src, dst, st.st_size, st.st_mtime, st.st_mode)
+
+    def _dst_listing(self, sftp, directory):
+        """대상 디렉토리의 {이름: (크기, 수정 시각)} 목록. 디렉토리가 없으면 빈 목록입니다."""
+        try:
+            if sftp: return {attr.filename: (attr.st_size, attr.st_mtime) for attr in sftp.listdir_attr(directory)}
+            listing = {}
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file(): st = entry.stat(); listing[entry.name] = (st.st_size, st.st_mtime)
+            return listing
+        except (IOError, OSError): return {}
+
+    def _hashes(self, pool, paths): return remote_sha256(pool, paths) if pool else local_sha256_many(paths)
+
+    def _hash_pairs(self, jobs):
+        """원본과 대상의 해시를 동시에 계산해 ({원본 경로: 해시}, {대상 경로: 해시})를 돌려줍니다."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            src = executor.submit(self._retry, self._hashes, self.src_pool, [job.src for job in jobs])
+            dst = executor.submit(self._retry, self._hashes, self.dst_pool, [job.dst for job in jobs])
+            return src.result(), dst.result()
+
+    def verify(self, files):
+        """전송한 파일들의 원본과 대상 해시를 비교해 다르거나 계산할 수 없는 작업 목록을 돌려줍니다."""
+        self.status(f"검증 중: {len(files)}개 파일 해시 비교")
+        src_hashes, dst_hashes = self._hash_pairs(files)
+        return [job for job in files if src_hashes.get(job.src) is None or src_hashes.get(job.src) != dst_hashes.get(job.dst)]
+
+    def filter_unchanged(self, files):
+        """동기화 모드: 원본 목록(크기 + 수정 시각)과 대상 디렉토리 목록을 비교해 새 파일이나 바뀐 파일만 남깁니다.
+        엄격 모드에서는 크기가 같은 파일의 내용 해시를 비교합니다."""
+        dst_split = os.path.split if self.kind == 'download' else posixpath.split
+        by_dir, changed, same_size = {}, [], []
+        for job in files: by_dir.setdefault(dst_split(job.dst)[0], []).append(job)
+        with self._channel(self.dst_pool) as sftp:
+            for directory, jobs in by_dir.items():
+                listing = self._dst_listing(sftp, directory)
+                for job in jobs:
+                    existing = listing.get(dst_split(job.dst)[1])
+                    if not existing or existing[0] != job.size: changed.append(job)
+                    elif self.strict: same_size.append(job)
+                    elif job.mtime is None or abs(existing[1] - job.mtime) > MTIME_TOLERANCE: changed.append(job)
+        if same_size:
+            self.status(f"해시 비교 중: {len(same_size)}개 파일")
+            src_hashes, dst_hashes = self._hash_pairs(same_size)
+            for job in same_size:
+                if src_hashes.get(job.src) is None or src_hashes.get(job.src) != dst_hashes.get(job.dst): changed.append(job)
+                else: self._set_mtime(job)
+        return changed
+
+    def _set_mtime(self, job):
+        """대상 파일의 수정 시각을 원본과 맞춰 다음 동기화가 크기와 시각만으로 판단할 수 있게 합니다."""
+        if job.mtime is None: return
+        with self._channel(self.dst_pool) as sftp:
+            try: sftp.utime(job.dst, (job.mtime, job.mtime)) if sftp else os.utime(job.dst, (job.mtime, job.mtime))
+            except (IOError, OSError): pass
+
+    def make_dirs(self, dirs):
+        if self.kind == 'download':
+            for path in dirs: os.makedirs(path, exist_ok=True)
+            return
+        if dirs: self.status(f"폴더 {len(dirs)}개 생성 중"); make_remote_dirs(self.dst_pool, dirs, self.workers)
+
+    def _channel(self, pool): return pool.channel() if pool else nullcontext(None)
+    def _channels(self):
+        """(원본, 대상) 채널. 두 쪽이 같은 연결이면 한꺼번에 두 채널을 빌립니다."""
+        if self.src_pool and self.src_pool is self.dst_pool: pair = self.src_pool.pair()
+        else: pair = _pair_context(self._channel(self.src_pool), self._channel(self.dst_pool))
+        return _relay_channels(pair) if self.kind == 'relay' else pair
+    @staticmethod
+    def _open(sftp, path, mode): return sftp.open(path, mode) if sftp else open(path, mode)
+
+    def _journal_key(self, job):
+        return TransferJournal.key(self.kind, self.src_pool and self.src_pool.host, job.src, self.dst_pool and self.dst_pool.host, job.dst)
+
+    def _journal_begin(self, job):
+        if not self.journal: return None, None
+        key = self._journal_key(job)
+        return key, self.journal.begin(key, self.kind, self.src_pool and self.src_pool.host, job.src, self.dst_pool and self.dst_pool.host, job.dst, job.size, job.mtime)
+
+    @staticmethod
+    def _size(sftp, path):
+        try: return sftp.stat(path).st_size if sftp else os.path.getsize(path)
+        except (IOError, OSError): return None
+
+    def _chunk_callback(self, key, start, segment=None):
+        """청크마다 저널의 오프셋과 진행률을 함께 갱신하는 콜백. 둘 다 없으면 None입니다.
+        key가 None이면 진행률만 갱신합니다(저널은 copy_range의 checkpoint로 확인된 위치만 기록)."""
+        if not key and not self.progress: return None
+        track = self.progress.tracker(start) if self.progress else None
+        def callback(offset):
+            if key: self.journal.update(key, offset, segment=segment)
+            if track: track(offset)
+        return callback
+
+    def _checkpoint(self, key, segment=None):
+        """대상이 그 위치까지의 쓰기를 모두 확인했을 때 부르는 저널 갱신 콜백. 저널이 없으면 None입니다."""
+        if not key: return None
+        return lambda offset: self.journal.update(key, offset, segment=segment)
+
+    def _copy_segment(self, job, part_path, start, length, cancel, key, resume_from):
+        if self.progress: self.progress.add_bytes(resume_from - start)
+        progress = self._chunk_callback(None, resume_from)
+        with self._channels() as (sftp_src, sftp_dst):
+            with self._open(sftp_src, job.src, 'rb') as src_file, self._open(sftp_dst, part_path, 'r+b') as dst_file:
+                if sftp_dst: dst_file.set_pipelined(True)
+                copy_range(src_file, dst_file, resume_from, start + length - resume_from, sftp_src is not None, cancel, progress, self._checkpoint(key, start))
+
+    def copy_segmented(self, job, key=None, entry=None):
+        """큰 파일을 바이트 구간으로 나눠 각 구간을 별도 SFTP 채널에서 같은 오프셋에 쓰고, 크기를 확인한 뒤 제자리로 옮깁니다.
+        저널이 있으면 실패한 .part 파일을 남겨 두고 구간별로 확인된 위치부터 이어받습니다."""
+        name = os.path.basename(job.src); part_path = job.dst + PART_SUFFIX
+        segment = -(-job.size // SEGMENT_COUNT); ranges = [(offset, min(segment, job.size - offset)) for offset in range(0, job.size, segment)]
+        self.status(f"분할 전송 중: {name} ({len(ranges)}개 구간)"); cancel = Event()
+        try:
+            with self._channel(self.dst_pool) as sftp:
+                done = entry.get('segments', {}) if entry and self._size(sftp, part_path) == job.size else {}
+                if not done:
+                    with self._open(sftp, part_path, 'wb') as f: f.truncate(job.size)
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = [executor.submit(self._copy_segment, job, part_path, offset, length, cancel, key, done.get(str(offset), offset)) for offset, length in ranges]
+                try:
+                    for future in as_completed(futures): future.result()
+                except Exception: cancel.set(); raise
+            with self._channel(self.dst_pool) as sftp:
+                size = self._size(sftp, part_path)
+                if size != job.size: raise IOError(f"{name} 크기 불일치 (예상 {job.size}, 실제 {size})")
+                if not sftp: os.replace(part_path, job.dst); return
+                try: sftp.posix_rename(part_path, job.dst)
+                except IOError:
+                    try: sftp.remove(job.dst)
+                    except IOError: pass
+                    sftp.rename(part_path, job.dst)
+        except Exception:
+            if not key:
+                with self._channel(self.dst_pool) as sftp:
+                    try: sftp.remove(part_path) if sftp else os.remove(part_path)
+                    except (IOError, OSError): pass
+            raise
+
+    def copy_stream(self, job, key=None, entry=None):
+        """파일 하나를 순서대로 복사합니다. 저널 기록이 있으면 확인된 오프셋부터 seek 해서 이어 씁니다."""
+        with self._channels() as (sftp_src, sftp_dst):
+            offset = entry['offset'] if entry else 0
+            # 파이프라인 쓰기는 응답 전에 끊길 수 있으므로, 실제로 대상에 쓰인 크기를 넘지 않는 위치부터 이어받습니다.
+            if offset: offset = min(offset, self._size(sftp_dst, job.dst) or 0)
+            if self.progress: self.progress.add_bytes(offset)
+            if self.kind == 'relay': relay_file(sftp_src, sftp_dst, job.src, job.dst, offset, self._chunk_callback(key, offset)); return
+            progress = self._chunk_callback(None, offset)
+            with self._open(sftp_src, job.src, 'rb') as src_file, self._open(sftp_dst, job.dst, 'r+b' if offset else 'wb') as dst_file:
+                if sftp_dst: dst_file.set_pipelined(True)
+                # 다운로드는 prefetch로 읽기 요청을 미리 파이프라인에 넣어 둡니다.
+                if sftp_src: src_file.seek(offset); src_file.prefetch(job.size)
+                copy_range(src_file, dst_file, offset, job.size - offset, False, None, progress, self._checkpoint(key))
+
+    def copy(self, job):
+        name = os.path.basename(job.src); key, entry = self._journal_begin(job)
+        if entry and entry['done'] and self._size_at_destination(job) == job.size:
+            self.status(f"이미 완료됨, 건너뜀: {name}")
+            if self.progress: self.progress.add_bytes(job.size); self.progress.file_done()
+            return
+        with host_slots(self.src_pool and self.src_pool.host, self.dst_pool and self.dst_pool.host):
+            # 파일 하나를 보내는 전체 시간(열기, 복사, 닫기)을 put/get/relay로 기록합니다. 서버 간 전송은 대상 호스트 쪽에 남깁니다.
+            op, host = {'upload': ('put', self.dst_pool), 'download': ('get', self.src_pool), 'relay': ('relay', self.dst_pool)}[self.kind]
+            with METRICS.timer(host.host, op, job.size):
+                if job.size and job.size >= SEGMENT_THRESHOLD: self.copy_segmented(job, key, entry)
+                else:
+                    label = {'upload': "업로드 중", 'download': "다운로드 중", 'relay': "직접 전송 중"}[self.kind]
+                    self.status(f"{label}: {name}" + (f" ({entry['offset']} 바이트부터 이어받기)" if entry and entry['offset'] else ""))
+                    self.copy_stream(job, key, entry)
+        self._set_mtime(job)
+        if key: self.journal.finish(key)
+        if self.progress: self.progress.file_done()
+
+    def _size_at_destination(self, job):
+        with self._channel(self.dst_pool) as sftp: return self._size(sftp, job.dst)
+
+    def check_free_space(self, target, needed):
+        """대상 target이 있는 파일시스템의 남은 공간이 needed 바이트보다 작으면 InsufficientSpace를 냅니다. 알 수 없으면 넘어갑니다."""
+        free = remote_free_space(self.dst_pool.ssh_client, target) if self.dst_pool else local_free_space(target)
+        if free is not None and needed > free:
+            raise InsufficientSpace(f"대상에 남은 공간이 부족합니다: 필요 {format_size(needed)}, 남음 {format_size(free)} ({target})")
+
+    def run(self, items, progress=None):
+        # 선택 항목의 대상 폴더에서 남은 공간을 확인합니다(이어받기처럼 execute만 부르는 경우는 확인하지 않음).
+        count = 0; self.progress = progress; self.space_target = items and (posixpath if self.dst_pool else os.path).dirname(items[0][1])
+        # 동기화 모드는 바뀐 파일만 보내야 하므로 폴더 전체를 묶어 보내는 tar 스트림을 쓰지 않습니다.
+        if self.archive and not self.sync: count, items = self.stream_archives(items)
+        dirs, files = self.plan(items); return count + self.execute(dirs, files)
+
+    def stream_archives(self, items):
+        """폴더 항목을 tar 스트림으로 보냅니다. 필요한 쪽에 tar가 없으면 그 항목들은 SFTP 순회 방식으로 넘깁니다.
+        (보낸 파일 수, 남은 항목 목록)을 돌려줍니다."""
+        folders = [item for item in items if item[2]]
+        if not folders: return 0, items
+        on_bytes = self.progress.transferred if self.progress else None
+        clients = [pool.ssh_client for pool in (self.src_pool, self.dst_pool) if pool]
+        if not all(remote_has_command(client, 'tar') for client in clients):
+            self.status("원격 서버에 tar가 없어 SFTP 방식으로 전송합니다."); return 0, items
+        # tar 스트림으로 보낼 폴더는 execute의 확인을 거치지 않으므로 여기서 크기를 구해 남은 공간을 먼저 확인합니다.
+        if self.space_target: self.check_free_space(self.space_target, self._folder_bytes([src for src, _, _ in folders]))
+        count = 0
+        for src, dst, _ in folders:
+            name = os.path.basename(src.rstrip('/')); self.status(f"tar 스트림 전송 중: {name}")
+            with host_slots(self.src_pool and self.src_pool.host, self.dst_pool and self.dst_pool.host): count += self._retry(self._stream_archive, src, dst, on_bytes)
+        return count, [item for item in items if not item[2]]
+
+    def _folder_bytes(self, paths):
+        cancel = self.progress and self.progress.cancel
+        if self.kind == 'upload': usages = local_disk_usage(paths, cancel)
+        else: usages = self._retry(lambda: remote_disk_usage(self.src_pool.connection, paths, cancel)[0])
+        if cancel and cancel.is_set(): raise TransferCancelled()
+        return sum(size for size, _ in usages.values())
+
+    def _stream_archive(self, src, dst, on_bytes):
+        if self.kind == 'upload': return tar_stream_upload(self.dst_pool.ssh_client, src, posixpath.dirname(dst), self.compress, on_bytes)
+        if self.kind == 'download': return tar_stream_download(self.src_pool.ssh_client, src, os.path.dirname(dst), self.compress, on_bytes)
+        return tar_stream_relay(self.src_pool.ssh_client, self.dst_pool.ssh_client, src, posixpath.dirname(dst), self.compress, on_bytes)
+
+    def execute(self, dirs, files, progress=None):
+        if progress: self.progress = progress
+        self._retry(self.make_dirs, dirs)
+        if self.sync:
+            total = len(files); files = self._retry(self.filter_unchanged, files)
+            self.status(f"동기화: {total}개 중 {len(files)}개 파일이 새롭거나 변경됨")
+        if self.space_target: self.check_free_space(self.space_target, sum(job.size or 0 for job in files))
+        if self.progress: self.progress.begin(len(files), sum(job.size or 0 for job in files))
+        self._copy_all(files)
+        if self.verify_after: self._verify_and_resend(files)
+        # 모두 성공한 작업의 기록은 더 이상 필요 없으므로 저널에서 지웁니다.
+        if self.journal: self.journal.discard([self._journal_key(job) for job in files])
+        return len(files)
+
+    def _copy_all(self, files):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self._retry, self.copy, job) for job in files]
+                try:
+                    for future in as_completed(futures): future.result()
+                except Exception:
+                    for future in futures: future.cancel()
+                    raise
+        finally:
+            # 성공, 취소, 실패 어느 경우든 이어받을 수 있도록 실행 중이던 작업이 끝난 뒤 남은 오프셋과 완료 기록을 저장합니다.
+            if self.journal: self.journal.save()
+
+    def _verify_and_resend(self, files):
+        """해시가 다른 파일을 처음부터 다시 보내고 다시 검증합니다. VERIFY_RETRY_LIMIT번 뒤에도 다르면 오류를 냅니다."""
+        mismatched = self.verify(files)
+        for attempt in range(VERIFY_RETRY_LIMIT):
+            if not mismatched: return
+            self.status(f"검증 실패 {len(mismatched)}개 파일 다시 전송 ({attempt + 1}/{VERIFY_RETRY_LIMIT})")
+            # 저널에 완료로 남은 기록이 있으면 copy가 건너뛰므로 먼저 지웁니다.
+            if self.journal: self.journal.discard([self._journal_key(job) for job in mismatched])
+            if self.progress: self.progress.begin(len(mismatched), sum(job.size or 0 for job in mismatched))
+            self._copy_all(mismatched); mismatched = self.verify(mismatched)
+        if mismatched:
+            names = ", ".join(os.path.basename(job.src) for job in mismatched[:5]) + (f" 외 {len(mismatched) - 5}개" if len(mismatched) > 5 else "")
+            raise IOError(f"전송 후 검증 실패 ({len(mismatched)}개 파일의 해시가 다름): {names}")
+
+class FanoutTransfer:
+    """원본 서버의 항목을 여러 대상 서버에 배포합니다. 파일마다 원본을 한 번만 읽어 모든 대상에 동시에 씁니다(fanout_file).
+    destinations: {이름: SshConnection}. 한 대상의 실패는 그 대상의 결과에만 남고, 연결이 끊겨 다시 연결할 수 없는 대상은
+    남은 파일에서 빠집니다. 이어받기 저널과 tar 스트림은 쓰지 않습니다."""
+    def __init__(self, source, destinations, workers=TRANSFER_WORKERS, status=None):
+        self.source = source; self.destinations = dict(destinations); self.workers = max(1, workers); self.status = status or (lambda message: None)
+        self.sent = dict.fromkeys(self.destinations, 0); self.failures = {name: [] for name in self.destinations}; self.dropped = {}; self._lock = Lock()
+        for connection in [source, *self.destinations.values()]: connection.channels.size = max(connection.channels.size, self.workers)
+
+    def _live(self): return {name: connection for name, connection in self.destinations.items() if name not in self.dropped}
+
+    def _drop(self, name, error):
+        with self._lock: self.dropped.setdefault(name, error)
+        self.status(f"{name}: 대상에서 제외됨 ({error})")
+
+    def _failed(self, name, job, error):
+        """파일 하나의 실패를 기록합니다. 연결이 끊긴 경우 다시 연결해 보고, 안 되면 그 대상을 뺍니다."""
+        connection = self.destinations[name]
+        with self._lock: self.failures[name].append((job.dst, error))
+        if connection.is_alive(): return
+        try: connection.reconnect(connection.generation)
+        except Exception as e: self._drop(name, e)
+
+    def plan(self, items, cancel=None):
+        dirs, files = [], []; list_dir = _remote_plan_lister(self.source)
+        def stat_file(src, dst):
+            with self.source.channels.channel() as sftp: st = sftp.stat(src)
+            return TransferJob(src, dst, st.st_size, st.st_mtime, st.st_mode)
+        for src, dst, is_dir in items:
+            if is_dir: sub_dirs, sub_files = plan_tree(src, dst, list_dir, workers=self.workers, cancel=cancel); dirs.extend(sub_dirs); files.extend(sub_files)
+            else: files.append(with_reconnect([self.source], stat_file, src, dst))
+        return dirs, files
+
+    def make_dirs(self, dirs):
+        with ThreadPoolExecutor(max_workers=max(1, len(self.destinations))) as executor:
+            futures = {name: executor.submit(with_reconnect, [connection], make_remote_dirs, connection.channels, dirs, self.workers)
+                       for name, connection in self._live().items()}
+            for name, future in futures.items():
+                try: future.result()
+                except Exception as e: self._drop(name, e)
+
+    def copy(self, job, progress=None):
+        live = self._live()
+        if not live: return
+        with host_slots(self.source.host, *(connection.host for connection in live.values())), ExitStack() as stack:
+            src = stack.enter_context(self.source.channels.channel()); sessions = {}
+            for name, connection in live.items():
+                try: sessions[name] = stack.enter_context(connection.channels.channel())
+                except Exception as e: self._failed(name, job, e)
+            errors = fanout_file(src, sessions, job.src, job.dst, progress.transferred if progress else None)
+            for name, error in errors.items():
+                if error: self._failed(name, job, error); continue
+                with self._lock: self.sent[name] += 1
+                if job.mtime is not None:
+                    try: sessions[name].utime(job.dst, (job.mtime, job.mtime))
+                    except IOError: pass
+        if progress: progress.file_done()
+
+    def run(self, items, progress=None):
+        """(원본 경로, 대상 경로, 디렉토리 여부) 항목을 모든 대상에 보내고 results()를 돌려줍니다. 취소하면 TransferCancelled를 올립니다."""
+        dirs, files = self.plan(items, progress and progress.cancel)
+        if progress: progress.begin(len(files), sum(job.size or 0 for job in files))
+        self.status(f"{len(self.destinations)}개 서버에 배포: 폴더 {len(dirs)}개, 파일 {len(files)}개"); self.make_dirs(dirs)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # 원본 연결이 끊기면 그 파일을 모든 대상에 처음부터 다시 보냅니다.
+            futures = [executor.submit(with_reconnect, [self.source], self.copy, job, progress) for job in files]
+            try:
+                for future in as_completed(futures): future.result()
+            except Exception:
+                for future in futures: future.cancel()
+                raise
+        return self.results()
+
+    def results(self):
+        """{이름: {'sent': 보낸 파일 수, 'failed': [(대상 경로, 오류)], 'dropped': 제외된 이유 또는 None}}"""
+        with self._lock:
+            return {name: {'sent': self.sent[name], 'failed': list(self.failures[name]), 'dropped': self.dropped.get(name)} for name in self.destinations}
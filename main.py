@@ -1,17 +1,166 @@
+import time
+STARTED_AT = time.perf_counter()    # 시작 시간 측정 기준 (다른 모듈을 불러오기 전)
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, font as tkfont
 from ttkthemes import ThemedTk
-import paramiko
 import os
-import stat
 import shutil
-from threading import Thread
+from threading import Thread, Event, current_thread, main_thread
 from datetime import datetime
-import json
 import tempfile
+import posixpath
+import re
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
+from core import (METRICS_LOG_PATH, TRANSFER_WORKERS, TRANSPORT_DEFAULTS, BENCHMARK_BYTES, BENCHMARK_CANDIDATES, LISTING_PREFETCH_LIMIT, QUEUE_HOST_LIMIT,
+                  METRICS, FanoutTransfer, FileEntry, InsufficientSpace, ListingCache, LocalDirWatcher, ProfileIndex, RelayUnavailable, SearchQuery, SshConnectionPool, TransferCancelled, TransferEngine, TransferJob, TransferJournal, TransferQueue, UsageCache,
+                  benchmark_link, format_size, iter_remote_listing, local_delete_tree, local_disk_usage, local_free_space, profile_path, remote_delete_tree, remote_disk_usage, remote_free_space, remote_join, remote_search, scan_local_dir, transport_settings, with_reconnect)
 
-# --- 설정 파일 경로 정의 ---
-CONFIG_DIR = os.path.join(os.path.expanduser('~'), '.SshFileExplorer', 'config')
+UI_POLL_MS = 50                 # Tk 스레드가 백그라운드 작업 결과를 확인하는 주기 (밀리초)
+LOCAL_WATCH_POLL_MS = 300       # 로컬 디렉토리 변경(inotify) 이벤트를 반영하는 주기 (밀리초)
+PROGRESS_TICK_MS = 250          # 상태 표시줄과 진행률을 다시 그리는 주기 (밀리초)
+STARTUP_BUDGET_MS = 500         # 프로세스 시작부터 창이 처음 그려질 때까지의 목표 시간 (넘으면 상태 표시줄에 경고)
+STATS_REFRESH_MS = 1000         # 통계 창을 다시 그리는 주기 (밀리초)
+
+class VirtualFileList(ttk.Frame):
+    """FileEntry 목록(모델)을 들고 화면에 보이는 행만 Listbox에 그리는 가상화된 파일 목록.
+    선택과 정렬은 포맷된 문자열이 아닌 모델 인덱스와 레코드 키로 처리합니다."""
+    NAME_WIDTH = 40
+    SORT_LABELS = {'name': "이름", 'size': "크기", 'mtime': "수정 시각"}
+
+    def __init__(self, parent, font, on_activate=None, dir_usage=None):
+        super().__init__(parent)
+        self.font = font; self.on_activate = on_activate; self.dir_usage = dir_usage
+        self.entries = []; self.selected = set(); self.anchor = None; self.top = 0; self.rows = 25
+        self.sort_spec = [('name', False)]; self.sort_buttons = {}
+        header = ttk.Frame(self); header.pack(fill="x")
+        for key, label in self.SORT_LABELS.items():
+            button = ttk.Button(header, text=label, command=lambda k=key: self.sort_by(k)); button.pack(side="left", expand=(key == 'name'), fill="x")
+            # Shift+클릭은 보조 정렬 키를 추가합니다.
+            button.bind("<Shift-Button-1>", lambda event, k=key: (self.sort_by(k, add=True), "break")[1])
+            self.sort_buttons[key] = button
+        body = ttk.Frame(self); body.pack(fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(body, command=self.yview); self.scrollbar.pack(side="right", fill="y")
+        self.listbox = tk.Listbox(body, font=font, height=25, activestyle="none", exportselection=False); self.listbox.pack(side="left", fill="both", expand=True)
+        for sequence, handler in (("<Button-1>", self._on_click), ("<Shift-Button-1>", self._on_shift_click), ("<Control-Button-1>", self._on_ctrl_click),
+                                  ("<Double-1>", self._on_double_click), ("<B1-Motion>", lambda event: "break"), ("<Configure>", self._on_configure),
+                                  ("<MouseWheel>", self._on_wheel), ("<Button-4>", self._on_wheel), ("<Button-5>", self._on_wheel),
+                                  ("<Up>", lambda event: self._move(-1)), ("<Down>", lambda event: self._move(1)),
+                                  ("<Prior>", lambda event: self._move(-self.rows)), ("<Next>", lambda event: self._move(self.rows)),
+                                  ("<Control-a>", self._select_all), ("<Return>", self._on_double_click)):
+            self.listbox.bind(sequence, handler)
+        self._update_headers()
+
+    # --- 모델 ---
+    def set_entries(self, entries):
+        self.entries = list(entries); self.selected.clear(); self.anchor = None; self.top = 0; self._sort(); self.redraw()
+
+    def append_entries(self, entries):
+        """백그라운드 목록 읽기의 부분 결과를 정렬 없이 뒤에 붙입니다. 완료 후 set_entries로 정렬합니다."""
+        self.entries.extend(entries); self.redraw()
+
+    def clear(self): self.set_entries([])
+
+    def apply_changes(self, upserted, removed_names):
+        """전체를 다시 만들지 않고 항목 추가/변경/삭제만 반영합니다. 선택과 스크롤 위치는 유지합니다."""
+        chosen = {entry.name for entry in self.selected_entries()}
+        by_name = {entry.name: entry for entry in self.entries}
+        for name in removed_names: by_name.pop(name, None)
+        for entry in upserted: by_name[entry.name] = entry
+        self.entries = list(by_name.values()); self._sort()
+        self.selected = {index for index, entry in enumerate(self.entries) if entry.name in chosen}; self.redraw()
+
+    def selected_entries(self): return [self.entries[i] for i in sorted(self.selected) if i < len(self.entries)]
+
+    def sort_by(self, key, add=False):
+        """같은 키를 다시 누르면 방향을 바꾸고, add면 기존 정렬 뒤에 보조 키로 추가합니다."""
+        current = dict(self.sort_spec)
+        if key in current and (add or self.sort_spec[0][0] == key):
+            self.sort_spec = [(k, not r if k == key else r) for k, r in self.sort_spec]
+        elif add: self.sort_spec.append((key, False))
+        else: self.sort_spec = [(key, False)]
+        chosen = self.selected_entries(); self._sort()
+        positions = {id(entry): index for index, entry in enumerate(self.entries)}
+        self.selected = {positions[id(entry)] for entry in chosen}; self._update_headers(); self.redraw()
+
+    def _sort(self):
+        # 안정 정렬을 보조 키부터 차례로 적용하고, 마지막에 디렉토리를 앞으로 모읍니다.
+        for key, reverse in reversed(self.sort_spec): self.entries.sort(key=FileEntry.SORT_KEYS[key], reverse=reverse)
+        self.entries.sort(key=lambda entry: not entry.is_dir)
+
+    def _update_headers(self):
+        spec = dict(self.sort_spec)
+        for key, button in self.sort_buttons.items():
+            mark = "" if key not in spec else (" ▼" if spec[key] else " ▲")
+            button.config(text=self.SORT_LABELS[key] + mark)
+
+    # --- 그리기 ---
+    def _format(self, entry):
+        name = entry.name if len(entry.name) <= self.NAME_WIDTH else entry.name[:self.NAME_WIDTH - 1] + "…"
+        # 폴더는 크기를 계산해 둔 경우에만 하위 트리 합계를 보여 줍니다.
+        usage = self.dir_usage(entry) if entry.is_dir and self.dir_usage else None
+        size = format_size(usage[0]) if usage else "" if entry.is_dir else format_size(entry.size)
+        mtime = datetime.fromtimestamp(entry.mtime).strftime('%Y-%m-%d %H:%M') if entry.mtime else ""
+        return f" {'[D]' if entry.is_dir else '[F]'} {name:<{self.NAME_WIDTH}} {size:>9}  {mtime}"
+
+    def redraw(self):
+        total = len(self.entries); self.top = max(0, min(self.top, total - self.rows))
+        visible = self.entries[self.top:self.top + self.rows + 1]
+        self.listbox.delete(0, tk.END)
+        if visible: self.listbox.insert(tk.END, *(self._format(entry) for entry in visible))
+        for row in range(len(visible)):
+            if self.top + row in self.selected: self.listbox.selection_set(row)
+        self.scrollbar.set(*((self.top / total, min(1.0, (self.top + self.rows) / total)) if total else (0.0, 1.0)))
+
+    def yview(self, *args):
+        if args[0] == 'moveto': self.top = int(float(args[1]) * len(self.entries))
+        elif args[0] == 'scroll': self.top += int(args[1]) * (self.rows if args[2] == 'pages' else 1)
+        self.redraw()
+
+    def see(self, index):
+        if index < self.top: self.top = index
+        elif index >= self.top + self.rows: self.top = index - self.rows + 1
+        self.redraw()
+
+    # --- 이벤트 ---
+    def _index_at(self, event):
+        if not self.entries: return None
+        index = self.top + self.listbox.nearest(event.y)
+        return index if index < len(self.entries) else None
+
+    def _on_configure(self, event):
+        self.rows = max(1, event.height // max(1, self.font.metrics('linespace') + 1)); self.redraw()
+
+    def _on_wheel(self, event):
+        step = -1 if getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0 else 1
+        self.top += step * 3; self.redraw(); return "break"
+
+    def _on_click(self, event):
+        self.listbox.focus_set(); index = self._index_at(event)
+        self.selected = {index} if index is not None else set(); self.anchor = index; self.redraw(); return "break"
+
+    def _on_shift_click(self, event):
+        index = self._index_at(event)
+        if index is None: return "break"
+        anchor = self.anchor if self.anchor is not None else index
+        self.selected = set(range(min(anchor, index), max(anchor, index) + 1)); self.redraw(); return "break"
+
+    def _on_ctrl_click(self, event):
+        index = self._index_at(event)
+        if index is not None: self.selected ^= {index}; self.anchor = index
+        self.redraw(); return "break"
+
+    def _on_double_click(self, event):
+        index = self._index_at(event) if event.type == tk.EventType.ButtonPress else self.anchor
+        if index is not None and self.on_activate: self.on_activate(self.entries[index])
+        return "break"
+
+    def _move(self, step):
+        if not self.entries: return "break"
+        index = min(len(self.entries) - 1, max(0, (self.anchor if self.anchor is not None else -1) + step))
+        self.selected = {index}; self.anchor = index; self.see(index); return "break"
+
+    def _select_all(self, event): self.selected = set(range(len(self.entries))); self.redraw(); return "break"
 
 class ProfileEditDialog(tk.Toplevel):
     """프로필을 새로 추가하는 대화상자 클래스"""
@@ -19,44 +168,186 @@ class ProfileEditDialog(tk.Toplevel):
         super().__init__(parent_window)
         self.transient(parent_window); self.grab_set(); self.server_frame = server_frame_ref
         self.title("새 프로필 추가" if not initial_data else "프로필 편집")
-        self.geometry("350x230")
+        self.geometry("350x340")
         self.ip_var = tk.StringVar(); self.port_var = tk.StringVar(value='22'); self.user_var = tk.StringVar()
         self.pwd_var = tk.StringVar(); self.root_dir_var = tk.StringVar(value='/home')
+        self.compress_var = tk.BooleanVar(value=False); self.ciphers_var = tk.StringVar(); self.window_var = tk.StringVar(); self.packet_var = tk.StringVar()
         frame = ttk.Frame(self, padding=15); frame.pack(fill="both", expand=True)
         ttk.Label(frame, text="서버 IP:").grid(row=0, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.ip_var, width=30).grid(row=0, column=1, sticky="ew")
         ttk.Label(frame, text="포트:").grid(row=1, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.port_var, width=30).grid(row=1, column=1, sticky="ew")
         ttk.Label(frame, text="사용자 이름:").grid(row=2, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.user_var, width=30).grid(row=2, column=1, sticky="ew")
         ttk.Label(frame, text="비밀번호:").grid(row=3, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.pwd_var, show="*", width=30).grid(row=3, column=1, sticky="ew")
         ttk.Label(frame, text="시작 디렉토리:").grid(row=4, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.root_dir_var, width=30).grid(row=4, column=1, sticky="ew")
+        # 비워 두면 paramiko 기본값을 씁니다. 서버에 연결한 뒤 "링크 측정"으로 자동으로 채울 수도 있습니다.
+        ttk.Label(frame, text="암호 방식(쉼표):").grid(row=5, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.ciphers_var, width=30).grid(row=5, column=1, sticky="ew")
+        ttk.Label(frame, text="윈도 크기(바이트):").grid(row=6, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.window_var, width=30).grid(row=6, column=1, sticky="ew")
+        ttk.Label(frame, text="최대 패킷(바이트):").grid(row=7, column=0, sticky="w", pady=4); ttk.Entry(frame, textvariable=self.packet_var, width=30).grid(row=7, column=1, sticky="ew")
+        ttk.Checkbutton(frame, text="SSH 압축 사용", variable=self.compress_var).grid(row=8, column=1, sticky="w", pady=4)
         btn_frame = ttk.Frame(self, padding=(0, 10, 0, 0)); btn_frame.pack(fill="x")
         ttk.Button(btn_frame, text="저장", command=self.save).pack(side="right", padx=15); ttk.Button(btn_frame, text="취소", command=self.destroy).pack(side="right")
         if initial_data:
             self.ip_var.set(initial_data.get('ip', '')); self.port_var.set(initial_data.get('port', '22'))
             self.user_var.set(initial_data.get('user', '')); self.pwd_var.set(initial_data.get('pwd', ''))
             self.root_dir_var.set(initial_data.get('root_dir', '/home'))
+            tuning = transport_settings(initial_data); self.compress_var.set(tuning['compress']); self.ciphers_var.set(", ".join(tuning['ciphers']))
+            self.window_var.set(tuning['window_size'] or ''); self.packet_var.set(tuning['max_packet_size'] or '')
 
     def save(self):
         ip = self.ip_var.get().strip(); user = self.user_var.get().strip(); port = self.port_var.get().strip()
         if not (ip and user and port): messagebox.showerror("입력 오류", "IP, 포트, 사용자 이름은 필수입니다.", parent=self); return
-        config_data = {'ip': ip, 'port': port, 'user': user, 'pwd': self.pwd_var.get(), 'root_dir': self.root_dir_var.get()}
-        filename = f"{user}@{ip}_{port}.json"; filepath = os.path.join(CONFIG_DIR, filename)
-        try:
-            os.makedirs(CONFIG_DIR, exist_ok=True)
-            with open(filepath, 'w', encoding='utf-8') as f: json.dump(config_data, f, indent=4)
-            self.server_frame.load_profiles_to_listbox(); self.destroy()
+        try: window_size, max_packet_size = (int(var.get()) if var.get().strip() else None for var in (self.window_var, self.packet_var))
+        except ValueError: messagebox.showerror("입력 오류", "윈도 크기와 최대 패킷은 바이트 단위 숫자여야 합니다.", parent=self); return
+        tuning = {'compress': self.compress_var.get(), 'ciphers': [c.strip() for c in self.ciphers_var.get().split(',') if c.strip()], 'window_size': window_size, 'max_packet_size': max_packet_size}
+        config_data = {'ip': ip, 'port': port, 'user': user, 'pwd': self.pwd_var.get(), 'root_dir': self.root_dir_var.get(), 'transport': tuning}
+        try: self.server_frame.main_app.profiles.save(config_data); self.server_frame.main_app.refresh_profile_lists(); self.destroy()
         except Exception as e: messagebox.showerror("저장 실패", f"프로필 저장 중 오류 발생:\n{e}", parent=self)
 
+class StatsWindow(tk.Toplevel):
+    """호스트별 작업 시간, 바이트 수, SFTP 요청 수, 왕복 시간을 보여 주는 창. 열려 있는 동안 STATS_REFRESH_MS마다 다시 그립니다.
+    계측과 JSON 로그(METRICS_LOG_PATH)는 여기서 켜고 끕니다."""
+    def __init__(self, parent_window):
+        super().__init__(parent_window); self.title("전송 통계"); self.geometry("900x420")
+        self.enabled_var = tk.BooleanVar(value=METRICS.enabled); self.log_var = tk.BooleanVar(value=METRICS.log_path is not None)
+        top = ttk.Frame(self, padding=(10, 10, 10, 5)); top.pack(fill="x")
+        ttk.Checkbutton(top, text="계측 켜기", variable=self.enabled_var, command=self._configure).pack(side="left")
+        ttk.Checkbutton(top, text=f"JSON 로그 기록 ({METRICS_LOG_PATH})", variable=self.log_var, command=self._configure).pack(side="left", padx=10)
+        ttk.Button(top, text="초기화", command=lambda: (METRICS.reset(), self._refresh(reschedule=False))).pack(side="right")
+        columns = (('op', "작업", 120), ('count', "횟수", 70), ('errors', "오류", 60), ('avg', "평균(ms)", 90), ('max', "최대(ms)", 90), ('bytes', "바이트", 110))
+        self.tree = ttk.Treeview(self, columns=[key for key, _, _ in columns], show="tree headings")
+        self.tree.heading('#0', text="호스트"); self.tree.column('#0', width=260)
+        for key, label, width in columns: self.tree.heading(key, text=label); self.tree.column(key, width=width, anchor="w" if key == 'op' else "e")
+        self.tree.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self._refresh()
+
+    def _configure(self):
+        METRICS.configure(self.enabled_var.get(), METRICS_LOG_PATH if self.log_var.get() else None)
+
+    def _refresh(self, reschedule=True):
+        if not self.winfo_exists(): return
+        opened = {iid for iid in self.tree.get_children() if self.tree.item(iid, 'open')}; self.tree.delete(*self.tree.get_children())
+        for host, stats in sorted(METRICS.snapshot().items()):
+            # 호스트 행: SFTP 요청 수, 왕복 시간(최근 표본의 평균/최대), 보낸/받은 바이트
+            rtt = stats['rtt']; traffic = f"↑{format_size(stats['bytes_sent'])} ↓{format_size(stats['bytes_received'])}"
+            self.tree.insert("", "end", iid=host, text=host, open=host in opened or not opened,
+                             values=("요청/RTT", sum(stats['requests'].values()), "", f"{rtt['avg'] * 1000:.1f}", f"{rtt['max'] * 1000:.1f}", traffic))
+            for op, values in sorted(stats['ops'].items()):
+                self.tree.insert(host, "end", text="", values=(op, values['count'], values['errors'], f"{values['seconds'] / values['count'] * 1000:.1f}",
+                                                               f"{values['max'] * 1000:.1f}", format_size(values['bytes']) if values['bytes'] else ""))
+        if reschedule: self.after(STATS_REFRESH_MS, self._refresh)
+
+class SearchWindow(tk.Toplevel):
+    """서버 창 하나의 원격 검색 창. 결과는 찾는 대로 목록에 붙고, 두 번 클릭하면 서버 창이 그 위치로 이동합니다."""
+    def __init__(self, server_frame):
+        super().__init__(server_frame); self.server_frame = server_frame; self.title(f"{server_frame.title} 검색"); self.geometry("760x520")
+        self.cancel = None; self._generation = 0; self.root_path = None
+        self.root_var = tk.StringVar(value=server_frame.path_var.get()); self.pattern_var = tk.StringVar(value="*"); self.regex_var = tk.BooleanVar(value=False)
+        self.min_size_var = tk.StringVar(); self.max_size_var = tk.StringVar(); self.days_var = tk.StringVar(); self.depth_var = tk.StringVar()
+        form = ttk.Frame(self, padding=10); form.pack(fill="x"); form.columnconfigure(1, weight=1); form.columnconfigure(3, weight=1)
+        ttk.Label(form, text="시작 경로:").grid(row=0, column=0, sticky="w", pady=2); ttk.Entry(form, textvariable=self.root_var).grid(row=0, column=1, columnspan=3, sticky="ew", padx=5)
+        ttk.Label(form, text="이름:").grid(row=1, column=0, sticky="w", pady=2)
+        pattern_entry = ttk.Entry(form, textvariable=self.pattern_var); pattern_entry.grid(row=1, column=1, sticky="ew", padx=5); pattern_entry.bind("<Return>", lambda event: self.start())
+        ttk.Checkbutton(form, text="정규식", variable=self.regex_var).grid(row=1, column=2, columnspan=2, sticky="w")
+        ttk.Label(form, text="최소 크기(KB):").grid(row=2, column=0, sticky="w", pady=2); ttk.Entry(form, textvariable=self.min_size_var, width=10).grid(row=2, column=1, sticky="w", padx=5)
+        ttk.Label(form, text="최대 크기(KB):").grid(row=2, column=2, sticky="w"); ttk.Entry(form, textvariable=self.max_size_var, width=10).grid(row=2, column=3, sticky="w", padx=5)
+        ttk.Label(form, text="최근 수정(일):").grid(row=3, column=0, sticky="w", pady=2); ttk.Entry(form, textvariable=self.days_var, width=10).grid(row=3, column=1, sticky="w", padx=5)
+        ttk.Label(form, text="최대 깊이:").grid(row=3, column=2, sticky="w"); ttk.Entry(form, textvariable=self.depth_var, width=10).grid(row=3, column=3, sticky="w", padx=5)
+        buttons = ttk.Frame(form); buttons.grid(row=4, column=0, columnspan=4, sticky="ew", pady=(5, 0))
+        ttk.Button(buttons, text="검색", command=self.start).pack(side="left"); ttk.Button(buttons, text="중지", command=self.stop).pack(side="left", padx=5)
+        self.status_var = tk.StringVar(); ttk.Label(buttons, textvariable=self.status_var, anchor="w").pack(side="left", fill="x", expand=True, padx=5)
+        self.results = VirtualFileList(self, server_frame.main_app.listbox_font, on_activate=self.on_activate); self.results.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        self.results.NAME_WIDTH = 60    # 이름 대신 시작 경로 기준 상대 경로를 보여 주므로 넓게
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+    def _query(self):
+        """입력값으로 SearchQuery를 만듭니다. 빈 칸은 조건 없음입니다."""
+        def number(var, scale=1):
+            text = var.get().strip(); return None if not text else float(text) * scale
+        days = number(self.days_var, 86400); depth = number(self.depth_var)
+        return SearchQuery(self.pattern_var.get().strip() or '*', self.regex_var.get(), number(self.min_size_var, 1024), number(self.max_size_var, 1024),
+                           time.time() - days if days is not None else None, None, int(depth) if depth else None)
+
+    def start(self):
+        connection = self.server_frame.connection
+        if not connection: messagebox.showerror("오류", f"{self.server_frame.title}에 연결되지 않았습니다.", parent=self); return
+        try: query = self._query()
+        except (ValueError, re.error) as e: messagebox.showerror("입력 오류", f"검색 조건이 올바르지 않습니다:\n{e}", parent=self); return
+        self.stop(); self._generation += 1; generation = self._generation; self.cancel = cancel = Event()
+        self.root_path = root = self.root_var.get().strip().replace("\\", "/") or '/'; batches = Queue(); self.results.clear()
+        def worker():
+            try: batches.put(remote_search(connection, root, query, batches.put, cancel))
+            except Exception as e: batches.put(e)
+        Thread(target=worker, daemon=True).start(); self.status_var.set("검색 중..."); self._drain(generation, batches, 0)
+
+    def _drain(self, generation, batches, found):
+        if generation != self._generation or not self.winfo_exists(): return
+        try:
+            while True:
+                batch = batches.get_nowait()
+                if isinstance(batch, Exception): self.status_var.set(f"오류: {batch}"); return
+                if isinstance(batch, tuple):
+                    count, method = batch; self.results.set_entries(self.results.entries)
+                    self.status_var.set(f"{'중지됨' if self.cancel.is_set() else '완료'}: {count}개 ({'서버 find' if method == 'find' else 'SFTP 병렬 순회'})"); return
+                found += len(batch); self.results.append_entries(batch)
+        except Empty: pass
+        self.status_var.set(f"검색 중... {found}개"); self.after(UI_POLL_MS, self._drain, generation, batches, found)
+
+    def stop(self):
+        if self.cancel: self.cancel.set()
+
+    def close(self): self.stop(); self.destroy()
+
+    def on_activate(self, entry):
+        """디렉토리는 그 안으로, 파일은 들어 있는 디렉토리로 서버 창을 옮깁니다."""
+        path = remote_join(self.root_path, entry.name)
+        self.server_frame.update_listbox(path if entry.is_dir else posixpath.dirname(path) or '/')
+
+class FanoutDialog(tk.Toplevel):
+    """여러 서버로 배포할 대상 프로필(여러 개 선택)과 대상 경로를 고르는 대화상자. 원본 서버의 프로필은 목록에서 뺍니다."""
+    def __init__(self, main_app, source):
+        super().__init__(main_app.root)
+        self.transient(main_app.root); self.grab_set(); self.main_app = main_app; self.title("여러 서버로 배포"); self.geometry("420x420")
+        self.profiles = [config for _, _, config in main_app.profiles.profiles()
+                         if SshConnectionPool.key(config.get('user'), config.get('ip'), config.get('port')) != source.key]
+        frame = ttk.Frame(self, padding=15); frame.pack(fill="both", expand=True)
+        ttk.Label(frame, text="대상 서버 (Ctrl/Shift+클릭으로 여러 개 선택):").pack(anchor="w")
+        self.listbox = tk.Listbox(frame, selectmode="extended", exportselection=False); self.listbox.pack(fill="both", expand=True, pady=5)
+        if self.profiles: self.listbox.insert(tk.END, *(ProfileIndex.display_name(config) for config in self.profiles))
+        ttk.Label(frame, text="대상 경로:").pack(anchor="w")
+        self.path_var = tk.StringVar(value=main_app.dest_server_frame.path_var.get()); ttk.Entry(frame, textvariable=self.path_var).pack(fill="x", pady=(0, 5))
+        buttons = ttk.Frame(frame); buttons.pack(fill="x")
+        ttk.Button(buttons, text="배포", command=self.submit).pack(side="right"); ttk.Button(buttons, text="취소", command=self.destroy).pack(side="right", padx=5)
+
+    def submit(self):
+        configs = [self.profiles[index] for index in self.listbox.curselection()]; path = self.path_var.get().strip().replace("\\", "/")
+        if not configs: messagebox.showinfo("정보", "대상 서버를 하나 이상 선택하세요.", parent=self); return
+        if not path.startswith('/'): messagebox.showerror("입력 오류", "대상 경로는 /로 시작하는 절대 경로여야 합니다.", parent=self); return
+        self.destroy(); self.main_app.fanout_to_servers(configs, path)
+
+def _items_label(items):
+    """대기열에 보일 작업 이름: 첫 항목 이름과 나머지 개수"""
+    name = os.path.basename(items[0][0].rstrip('/\\')) or items[0][0]
+    return name + (f" 외 {len(items) - 1}개" if len(items) > 1 else "")
+
 class ServerFrame(ttk.Frame):
     def __init__(self, parent, title, main_app):
         super().__init__(parent)
         self.main_app = main_app; self.title = title
-        self.ssh_client = None; self.sftp_client = None; self.profile_map = {}
+        self.connection = None; self.profile_files = []
+        self.listing_cache = ListingCache(); self._prefetch_generation = 0; self._listing_generation = 0
         self.ip_var = tk.StringVar(); self.port_var = tk.StringVar(value='22'); self.user_var = tk.StringVar()
         self.pwd_var = tk.StringVar(); self.root_dir_var = tk.StringVar(value='/home'); self.path_var = tk.StringVar(value='/')
         self.create_widgets()
         # --- [버그 수정] 생성 시 프로필을 즉시 불러옵니다. ---
         self.load_profiles_to_listbox()
 
+    # 연결 풀의 연결을 통해 접근하므로, 다시 연결된 뒤에도 항상 현재 클라이언트를 가리킵니다.
+    @property
+    def ssh_client(self): return self.connection.client if self.connection else None
+    @property
+    def sftp_client(self): return self.connection.sftp if self.connection else None
+    @property
+    def channel_pool(self): return self.connection.channels if self.connection else None
+
     def create_widgets(self):
         frame = ttk.LabelFrame(self, text=self.title, padding=10); frame.pack(fill="both", expand=True)
         conn_frame = ttk.Frame(frame, padding=(0,0,0,10)); conn_frame.pack(fill="x", expand=True)
@@ -81,35 +372,31 @@ class ServerFrame(ttk.Frame):
         path_frame.columnconfigure(0, weight=1)
         path_entry = ttk.Entry(path_frame, textvariable=self.path_var); path_entry.grid(row=0, column=0, sticky="ew"); path_entry.bind("<Return>", self.on_path_enter)
         ttk.Button(path_frame, text="..", width=4, command=self.go_up_dir).grid(row=0, column=1, sticky="e", padx=(5,0))
-        list_frame = ttk.Frame(frame); list_frame.pack(fill="both", expand=True)
-        list_scrollbar = ttk.Scrollbar(list_frame)
-        self.listbox = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, selectmode="extended", font=self.main_app.listbox_font, height=25)
-        list_scrollbar.config(command=self.listbox.yview); self.listbox.pack(side="left", fill="both", expand=True); list_scrollbar.pack(side="right", fill="y")
-        self.listbox.bind("<Double-1>", self.on_double_click)
+        self.file_list = VirtualFileList(frame, self.main_app.listbox_font, on_activate=self.on_activate, dir_usage=self._dir_usage); self.file_list.pack(fill="both", expand=True)
         action_frame = ttk.Frame(frame); action_frame.pack(fill="x", pady=(5,0))
-        ttk.Button(action_frame, text="삭제", command=self.delete_remote_items).pack(fill="x")
+        ttk.Button(action_frame, text="삭제", command=self.delete_remote_items).pack(side="left", expand=True, fill="x")
+        ttk.Button(action_frame, text="크기 계산", command=self.calculate_usage).pack(side="left", expand=True, fill="x", padx=(5, 0))
+        ttk.Button(action_frame, text="검색", command=self.open_search).pack(side="left", expand=True, fill="x", padx=(5, 0))
+        ttk.Button(action_frame, text="링크 측정", command=self.benchmark_link).pack(side="left", expand=True, fill="x", padx=(5, 0))
 
     def load_profiles_to_listbox(self):
-        self.profile_listbox.delete(0, tk.END); self.profile_map.clear(); os.makedirs(CONFIG_DIR, exist_ok=True)
-        try:
-            for filename in sorted(os.listdir(CONFIG_DIR)):
-                if filename.endswith('.json'):
-                    filepath = os.path.join(CONFIG_DIR, filename)
-                    with open(filepath, 'r', encoding='utf-8') as f: config = json.load(f)
-                    display_text = f"{config.get('user')}@{config.get('ip')}:{config.get('port')}"
-                    self.profile_listbox.insert(tk.END, display_text); self.profile_map[display_text] = filename
-        except Exception as e: messagebox.showwarning("오류", f"프로필 목록 로드 실패:\n{e}", parent=self)
-            
+        """공유 프로필 색인에서 목록을 채웁니다. 바뀐 파일만 다시 읽습니다."""
+        self.profile_listbox.delete(0, tk.END)
+        try: profiles = self.main_app.profiles.profiles()
+        except Exception as e: messagebox.showwarning("오류", f"프로필 목록 로드 실패:\n{e}", parent=self); return
+        self.profile_files = [filename for _, filename, _ in profiles]
+        if profiles: self.profile_listbox.insert(tk.END, *[display_text for display_text, _, _ in profiles])
+
+    def _selected_profile_file(self):
+        indices = self.profile_listbox.curselection()
+        return self.profile_files[indices[0]] if indices and indices[0] < len(self.profile_files) else None
+
     def on_profile_selected(self, event=None):
-        indices = self.profile_listbox.curselection();
-        if not indices: return
-        display_text = self.profile_listbox.get(indices[0]); filename = self.profile_map.get(display_text)
-        if filename:
-            filepath = os.path.join(CONFIG_DIR, filename)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f: config = json.load(f)
-                self.load_connection_profile(config)
-            except Exception as e: messagebox.showerror("오류", f"프로필 로드 실패:\n{e}", parent=self)
+        filename = self._selected_profile_file()
+        if not filename: return
+        config = self.main_app.profiles.get(filename)
+        if config is None: messagebox.showerror("오류", f"프로필 로드 실패:\n{filename}", parent=self); self.main_app.refresh_profile_lists(); return
+        self.load_connection_profile(config)
 
     def load_connection_profile(self, config):
         self.ip_var.set(config.get('ip', '')); self.port_var.set(config.get('port', '22'))
@@ -118,110 +405,189 @@ class ServerFrame(ttk.Frame):
         
     def _add_new_profile(self): ProfileEditDialog(self, self)
     def _delete_selected_profile(self):
-        indices = self.profile_listbox.curselection();
-        if not indices: messagebox.showinfo("정보", "삭제할 프로필을 선택하세요.", parent=self); return
-        display_text = self.profile_listbox.get(indices[0])
+        filename = self._selected_profile_file()
+        if not filename: messagebox.showinfo("정보", "삭제할 프로필을 선택하세요.", parent=self); return
+        display_text = self.profile_listbox.get(self.profile_listbox.curselection()[0])
         if not messagebox.askyesno("삭제 확인", f"'{display_text}' 프로필을 삭제하시겠습니까?", parent=self): return
-        filename = self.profile_map.get(display_text)
-        if filename:
-            filepath = os.path.join(CONFIG_DIR, filename)
-            try: os.remove(filepath); self.load_profiles_to_listbox()
-            except Exception as e: messagebox.showerror("삭제 실패", f"프로필 삭제 실패:\n{e}", parent=self)
+        try: self.main_app.profiles.delete(filename); self.main_app.refresh_profile_lists()
+        except Exception as e: messagebox.showerror("삭제 실패", f"프로필 삭제 실패:\n{e}", parent=self)
 
     def _prompt_and_save_profile(self):
         ip=self.ip_var.get().strip(); user=self.user_var.get().strip(); port=self.port_var.get().strip()
         if not(ip and user and port): return
-        filename = f"{user}@{ip}_{port}.json"; filepath = os.path.join(CONFIG_DIR, filename)
+        filepath = profile_path(user, ip, port)
         if not os.path.exists(filepath):
             if messagebox.askyesno("프로필 저장", f"{self.title}: 이 연결 정보를 프로필에 저장하시겠습니까?", parent=self):
                 config_data = {'ip':ip, 'port':port, 'user':user, 'pwd':self.pwd_var.get(), 'root_dir':self.root_dir_var.get()}
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f: json.dump(config_data, f, indent=4)
-                    self.load_profiles_to_listbox()
+                try: self.main_app.profiles.save(config_data); self.main_app.refresh_profile_lists()
                 except Exception as e: messagebox.showerror("저장 실패", f"프로필 저장 실패:\n{e}", parent=self)
 
     def connect_ssh(self):
-        self.main_app.update_status(f"{self.title}: 연결 중...", "blue")
-        try:
-            self.ssh_client = paramiko.SSHClient(); self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self.ssh_client.connect(hostname=self.ip_var.get(), port=int(self.port_var.get()), username=self.user_var.get(), password=self.pwd_var.get(), timeout=5)
-            self.sftp_client = self.ssh_client.open_sftp(); self.connect_btn.config(text="연결 끊기")
-            self.path_var.set(self.root_dir_var.get()); self.update_listbox()
-            self.main_app.update_status(f"{self.title}: {self.ip_var.get()}에 연결됨", "green")
-        except Exception as e: self.disconnect_ssh(); messagebox.showerror("연결 실패", f"{self.title} 연결 실패:\n{e}", parent=self)
-            
+        """연결은 백그라운드 스레드에서 하고, Tk 스레드는 결과만 주기적으로 확인해 창이 멈추지 않게 합니다.
+        같은 프로필(user@ip:port)의 연결이 풀에 살아 있으면 핸드셰이크 없이 그대로 씁니다."""
+        self.main_app.update_status(f"{self.title}: 연결 중...", "blue"); self.connect_btn.config(state="disabled")
+        host, port, user, pwd = self.ip_var.get(), self.port_var.get(), self.user_var.get(), self.pwd_var.get(); result = Queue()
+        def worker():
+            tuning = (self.main_app.profiles.get(os.path.basename(profile_path(user, host, port))) or {}).get('transport') or {}
+            try: result.put((*self.main_app.connections.acquire(host, int(port), user, pwd, tuning), None))
+            except Exception as e: result.put((None, False, e))
+        Thread(target=worker, daemon=True).start(); self._wait_for_connection(result)
+
+    def _wait_for_connection(self, result):
+        try: connection, reused, error = result.get_nowait()
+        except Empty: self.after(UI_POLL_MS, self._wait_for_connection, result); return
+        self.connect_btn.config(state="normal")
+        if error: self.disconnect_ssh(); messagebox.showerror("연결 실패", f"{self.title} 연결 실패:\n{error}", parent=self); return
+        self.connection = connection; self.connect_btn.config(text="연결 끊기")
+        self.path_var.set(self.root_dir_var.get()); self.update_listbox()
+        self.main_app.update_status(f"{self.title}: {connection.hostname}에 연결됨" + (" (기존 연결 재사용)" if reused else ""), "green")
+
     def disconnect_ssh(self):
-        if self.sftp_client: self.sftp_client.close()
-        if self.ssh_client: self.ssh_client.close()
-        self.ssh_client, self.sftp_client = None, None
-        self.connect_btn.config(text="연결"); self.listbox.delete(0, tk.END); self.path_var.set("/")
+        """이 창에서만 연결을 놓습니다. 실제 연결은 다른 창이 쓰고 있거나 다시 선택될 수 있으므로 풀이 닫을 시점을 정합니다."""
+        if self.connection: self.main_app.connections.release(self.connection)
+        self.connection = None; self.listing_cache.invalidate()
+        self.connect_btn.config(text="연결"); self.file_list.clear(); self.path_var.set("/")
         self.main_app.update_status(f"{self.title}: 연결 끊김", "red")
 
     def toggle_connection(self):
-        if self.ssh_client:
+        if self.connection:
             self.disconnect_ssh()
         else:
             self._prompt_and_save_profile()
             self.connect_ssh()
 
+    def invalidate_listing(self, path=None, recursive=True): self.listing_cache.invalidate(path, recursive)
+
+    def _prefetch_subdirs(self, path, entries):
+        """현재 디렉토리의 하위 디렉토리 목록을 백그라운드에서 미리 읽어 캐시에 채웁니다."""
+        self._prefetch_generation += 1; generation = self._prefetch_generation; pool = self.channel_pool
+        subdirs = [remote_join(path, entry.name) for entry in entries if entry.is_dir][:LISTING_PREFETCH_LIMIT]
+        if not pool or not subdirs: return
+        def worker():
+            with pool.channel() as sftp:
+                for subdir in subdirs:
+                    # 사용자가 다른 디렉토리로 이동했으면 이전 디렉토리의 미리 읽기를 멈춥니다.
+                    if generation != self._prefetch_generation: return
+                    if self.listing_cache.get(subdir) is not None: continue
+                    try: self.listing_cache.put(subdir, [FileEntry.from_attr(attr) for attr in sftp.listdir_attr(subdir)])
+                    except Exception: continue
+        Thread(target=worker, daemon=True).start()
+
     def update_listbox(self, path=None):
+        """캐시된 목록은 바로 그리고, 없으면 백그라운드 스레드가 listdir_iter로 읽은 항목을 묶음 단위로 받아 부분 목록부터 보여줍니다.
+        다른 디렉토리로 이동하면 이전 읽기는 세대 번호가 바뀌어 취소됩니다."""
         if not self.sftp_client: return
         current_path = path if path is not None else self.path_var.get()
-        original_path = self.path_var.get(); self.path_var.set(current_path); self.listbox.delete(0, tk.END)
+        original_path = self.path_var.get(); self.path_var.set(current_path); self.file_list.clear()
+        self._listing_generation += 1; generation = self._listing_generation
+        cached = self.listing_cache.get(current_path)
+        if cached is not None: self.file_list.set_entries(cached); self._prefetch_subdirs(current_path, cached); return
+        batches = Queue(); pool = self.channel_pool
+        def read():
+            entries = []
+            # 재연결 후 다시 읽는 경우 이미 보낸 부분 목록을 지우도록 알립니다.
+            batches.put(False)
+            with pool.channel() as sftp:
+                for batch in iter_remote_listing(sftp, current_path):
+                    if generation != self._listing_generation: return
+                    entries.extend(batch); batches.put(batch)
+            self.listing_cache.put(current_path, entries); batches.put(None)
+        def worker():
+            try: with_reconnect([pool.connection], read)
+            except Exception as e: batches.put(e)
+        Thread(target=worker, daemon=True).start()
+        self._drain_listing(generation, batches, current_path, original_path, [])
+
+    def _drain_listing(self, generation, batches, path, original_path, received):
+        if generation != self._listing_generation: return
         try:
-            dir_list, file_list = [], []
-            for attr in self.sftp_client.listdir_attr(current_path):
-                mtime = datetime.fromtimestamp(attr.st_mtime).strftime('%Y-%m-%d %H:%M')
-                display_name = f" [D] {attr.filename}" if stat.S_ISDIR(attr.st_mode) else f" [F] {attr.filename}"
-                formatted_item = f"{display_name:<50}{mtime}"
-                if stat.S_ISDIR(attr.st_mode): dir_list.append(formatted_item)
-                else: file_list.append(formatted_item)
-            for item in sorted(dir_list) + sorted(file_list): self.listbox.insert(tk.END, item)
-        except Exception as e: self.path_var.set(original_path); messagebox.showwarning("오류", f"{self.title} 디렉토리 접근 오류:\n{e}", parent=self)
-    
+            while True:
+                batch = batches.get_nowait()
+                if batch is None:
+                    self.file_list.set_entries(received); self._prefetch_subdirs(path, received)
+                    self.main_app.update_status(f"{self.title}: {path} ({len(received)}개 항목)", "black"); return
+                if batch is False: received.clear(); self.file_list.clear(); continue
+                if isinstance(batch, Exception):
+                    self.path_var.set(original_path); messagebox.showwarning("오류", f"{self.title} 디렉토리 접근 오류:\n{batch}", parent=self); return
+                received.extend(batch); self.file_list.append_entries(batch)
+        except Empty: pass
+        self.main_app.update_status(f"{self.title}: 목록 읽는 중... ({len(received)}개)", "blue")
+        self.after(UI_POLL_MS, self._drain_listing, generation, batches, path, original_path, received)
+
     def on_path_enter(self, event): self.update_listbox(self.path_var.get().replace("\\", "/"))
-    def on_double_click(self, event):
-        indices = self.listbox.curselection();
-        if not indices: return
-        selected_item = self.listbox.get(indices[0])
-        if selected_item.strip().startswith('[D]'):
-            dir_name = self.main_app._parse_item_name(selected_item)
-            if dir_name:
-                new_path = os.path.join(self.path_var.get(), dir_name).replace("\\", "/")
-                self.update_listbox(new_path)
+    def on_activate(self, entry):
+        if entry.is_dir: self.update_listbox(remote_join(self.path_var.get(), entry.name))
     def go_up_dir(self):
         if self.path_var.get() != '/': self.update_listbox(os.path.dirname(self.path_var.get()).replace("\\", "/"))
 
+    def _dir_usage(self, entry):
+        return self.main_app.usage_cache.get(self.connection.host, remote_join(self.path_var.get(), entry.name)) if self.connection else None
+
+    def calculate_usage(self):
+        """선택 항목(없으면 현재 디렉토리)의 크기를 계산합니다. 서버에 du가 있으면 서버에서, 없으면 SFTP 병렬 순회로 셉니다."""
+        connection = self.connection
+        if not connection: messagebox.showerror("오류", f"{self.title}에 연결되지 않았습니다.", parent=self); return
+        base = self.path_var.get(); paths = [remote_join(base, entry.name) for entry in self.file_list.selected_entries()] or [base]
+        self.main_app.calculate_usage(self.title, connection.host, paths, lambda missing, cancel: remote_disk_usage(connection, missing, cancel),
+                                      lambda: remote_free_space(connection.client, base), self.file_list, connection)
+
+    def open_search(self):
+        if not self.connection: messagebox.showerror("오류", f"{self.title}에 연결되지 않았습니다.", parent=self); return
+        SearchWindow(self)
+
+    def benchmark_link(self):
+        """연결된 서버에 후보 전송 설정들을 차례로 시험해 가장 빠른 설정을 이 프로필에 저장합니다. 새 설정은 다음 연결부터 적용됩니다."""
+        connection = self.connection
+        if not connection: messagebox.showerror("오류", f"{self.title}에 연결되지 않았습니다.", parent=self); return
+        if not messagebox.askyesno("링크 측정", f"후보 설정 {len(BENCHMARK_CANDIDATES)}개마다 {format_size(BENCHMARK_BYTES)}를 올리고 내려받아 속도를 잽니다.\n계속하시겠습니까?", parent=self): return
+        def task(progress):
+            progress.begin(0, 2 * BENCHMARK_BYTES * len(BENCHMARK_CANDIDATES))
+            return benchmark_link(connection.hostname, connection.port, connection.user, connection.password, on_bytes=progress.add_bytes)
+        def done(results):
+            label, tuning, rate = results[0]
+            if not rate: messagebox.showerror("링크 측정 실패", "모든 후보 설정에서 측정에 실패했습니다.", parent=self); return
+            config = dict(self.main_app.profiles.get(os.path.basename(profile_path(connection.user, connection.hostname, connection.port))) or {'ip': connection.hostname, 'port': str(connection.port), 'user': connection.user, 'pwd': connection.password, 'root_dir': self.root_dir_var.get()})
+            config['transport'] = {**TRANSPORT_DEFAULTS, **tuning}
+            try: self.main_app.profiles.save(config); self.main_app.refresh_profile_lists()
+            except Exception as e: messagebox.showerror("저장 실패", f"프로필 저장 실패:\n{e}", parent=self); return
+            lines = "\n".join(f"{name}: {format_size(speed)}/s" if speed else f"{name}: 실패" for name, _, speed in results)
+            self.main_app.update_status(f"{self.title}: 링크 측정 완료, '{label}' 설정 저장", "green")
+            messagebox.showinfo("링크 측정 결과", f"{lines}\n\n'{label}' 설정을 프로필에 저장했습니다. 다음 연결부터 적용됩니다.", parent=self)
+        self.main_app.run_task(f"{self.title} 링크 측정", task, done, hosts=(connection.host,))
+
     def delete_remote_items(self):
-        if not self.sftp_client: messagebox.showerror("오류", f"{self.title}에 연결되지 않았습니다.", parent=self); return
-        indices = self.listbox.curselection();
-        if not indices: messagebox.showinfo("정보", "삭제할 항목을 선택하세요.", parent=self); return
-        if not messagebox.askyesno("삭제 확인", f"{self.title}에서 선택한 {len(indices)}개 항목을 정말 삭제하시겠습니까?\n(폴더는 내용과 함께 삭제됩니다)", parent=self): return
-        
-        for index in reversed(sorted(indices)):
-            item_full = self.listbox.get(index); item_name = self.main_app._parse_item_name(item_full)
-            if not item_name: continue
-            item_path = os.path.join(self.path_var.get(), item_name).replace("\\", "/")
-            try:
-                if item_full.strip().startswith('[D]'): self._delete_remote_directory_recursive(item_path)
-                else: self.sftp_client.remove(item_path)
-            except Exception as e: messagebox.showerror("삭제 실패", f"{item_name} 삭제 실패:\n{e}", parent=self); break
-        self.update_listbox()
-
-    def _delete_remote_directory_recursive(self, path):
-        for item in self.sftp_client.listdir_attr(path):
-            item_path = f"{path}/{item.filename}"
-            if stat.S_ISDIR(item.st_mode): self._delete_remote_directory_recursive(item_path)
-            else: self.sftp_client.remove(item_path)
-        self.sftp_client.rmdir(path)
+        """선택 항목을 백그라운드에서 지웁니다. 취소하거나 실패해도 남은 항목이 보이도록 목록을 다시 읽습니다."""
+        connection = self.connection
+        if not connection: messagebox.showerror("오류", f"{self.title}에 연결되지 않았습니다.", parent=self); return
+        entries = self.file_list.selected_entries()
+        if not entries: messagebox.showinfo("정보", "삭제할 항목을 선택하세요.", parent=self); return
+        if not messagebox.askyesno("삭제 확인", f"{self.title}에서 선택한 {len(entries)}개 항목을 정말 삭제하시겠습니까?\n(폴더는 내용과 함께 삭제됩니다)", parent=self): return
+        items = [(remote_join(self.path_var.get(), entry.name), entry.is_dir) for entry in entries]
+        def refresh(): self.main_app.invalidate_remote(connection.host, [path for path, _ in items]); self.update_listbox()
+        def task(progress): return with_reconnect([connection], remote_delete_tree, connection, items, progress.cancel, progress), progress.cancel.is_set()
+        def done(result):
+            count, cancelled = result
+            self.main_app.update_status(f"{self.title}: 삭제 {'취소됨' if cancelled else '완료'} ({count}개 항목)", "red" if cancelled else "green"); refresh()
+        def failed(error): messagebox.showerror("삭제 실패", f"{self.title} 삭제 실패:\n{error}", parent=self); refresh()
+        self.main_app.run_task(f"{self.title} 삭제: {_items_label(items)}", task, done, failed, hosts=(connection.host,), connections=(connection,))
 
 class SshFileExplorer:
     def __init__(self, root):
         self.root = root; self.root.title("SSH File Explorer"); self.root.resizable(True, True)
         self.default_font = tkfont.Font(family="Malgun Gothic", size=10); self.listbox_font = tkfont.Font(family="Consolas", size=10)
         self.root.option_add("*Font", self.default_font)
-        self.status_var = tk.StringVar(value="상태: 대기 중")
+        self.status_var = tk.StringVar(value="상태: 대기 중"); self.progress_var = tk.StringVar()
+        self._ui_calls = Queue(); self._pending_status = None
+        self.queue = TransferQueue(dispatch=self.run_on_ui); self.bandwidth_var = tk.IntVar(value=0); self.host_limit_var = tk.IntVar(value=QUEUE_HOST_LIMIT)
+        self.workers_var = tk.IntVar(value=TRANSFER_WORKERS); self.journal = TransferJournal(); self.connections = SshConnectionPool(); self.profiles = ProfileIndex()
+        self.sync_var = tk.BooleanVar(value=False); self.strict_var = tk.BooleanVar(value=False)
+        self.archive_var = tk.BooleanVar(value=False); self.compress_var = tk.BooleanVar(value=False); self.verify_var = tk.BooleanVar(value=False)
+        self.local_watcher = LocalDirWatcher(); self.stats_window = None; self.usage_cache = UsageCache()
         self.create_widgets(); self.update_local_listbox(); self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        if self.local_watcher.available: self.root.after(LOCAL_WATCH_POLL_MS, self._poll_local_changes)
+        self.root.after(PROGRESS_TICK_MS, self._tick)
+        # 창이 처음 그려진 뒤(대기 중인 그리기 작업이 끝난 뒤) 시작 시간을 잽니다.
+        self.root.after_idle(lambda: self.root.after(0, self._report_startup_time))
 
     def create_widgets(self):
         style = ttk.Style(); style.configure(".", font=self.default_font); style.configure("TButton", padding=5)
@@ -236,13 +602,12 @@ class SshFileExplorer:
         local_path_entry = ttk.Entry(local_path_frame, textvariable=self.local_path_var)
         local_path_entry.grid(row=0, column=0, sticky="ew"); local_path_entry.bind("<Return>", self.on_local_path_enter)
         ttk.Button(local_path_frame, text="..", width=4, command=self.go_up_local_dir).grid(row=0, column=1, sticky="e", padx=(5,0))
-        local_list_frame = ttk.Frame(local_panel); local_list_frame.pack(fill="both", expand=True)
-        local_scrollbar = ttk.Scrollbar(local_list_frame)
-        self.local_listbox = tk.Listbox(local_list_frame, yscrollcommand=local_scrollbar.set, selectmode="extended", font=self.listbox_font, height=25)
-        local_scrollbar.config(command=self.local_listbox.yview); self.local_listbox.pack(side="left", fill="both", expand=True); local_scrollbar.pack(side="right", fill="y")
-        self.local_listbox.bind("<Double-1>", self.on_local_double_click)
+        self.local_file_list = VirtualFileList(local_panel, self.listbox_font, on_activate=self.on_local_activate,
+                                               dir_usage=lambda entry: self.usage_cache.get(None, os.path.join(self.local_path_var.get(), entry.name)))
+        self.local_file_list.pack(fill="both", expand=True)
         local_action_frame = ttk.Frame(local_panel); local_action_frame.pack(fill="x", pady=(5,0))
-        ttk.Button(local_action_frame, text="삭제", command=self.delete_local_items).pack(fill="x")
+        ttk.Button(local_action_frame, text="삭제", command=self.delete_local_items).pack(side="left", expand=True, fill="x")
+        ttk.Button(local_action_frame, text="크기 계산", command=self.calculate_local_usage).pack(side="left", expand=True, fill="x", padx=(5, 0))
 
         self.source_server_frame = ServerFrame(main_panels_frame, "Server", self)
         self.source_server_frame.grid(row=0, column=1, sticky="nsew", padx=(5,5))
@@ -250,134 +615,338 @@ class SshFileExplorer:
         self.dest_server_frame.grid(row=0, column=2, sticky="nsew", padx=(5,0))
 
         transfer_frame = ttk.Frame(self.root, padding=(10, 5, 10, 5)); transfer_frame.pack(fill="x", expand=False)
-        ttk.Button(transfer_frame, text="local → server", command=lambda: self.start_transfer_thread(self.upload_to_source)).pack(side="left", expand=True, fill="x", padx=2)
-        ttk.Button(transfer_frame, text="server → local", command=lambda: self.start_transfer_thread(self.download_from_source)).pack(side="left", expand=True, fill="x", padx=2)
-        ttk.Button(transfer_frame, text="server → destination", command=lambda: self.start_transfer_thread(self.transfer_server_to_server)).pack(side="left", expand=True, fill="x", padx=2)
+        ttk.Button(transfer_frame, text="local → server", command=self.upload_to_source).pack(side="left", expand=True, fill="x", padx=2)
+        ttk.Button(transfer_frame, text="server → local", command=self.download_from_source).pack(side="left", expand=True, fill="x", padx=2)
+        ttk.Button(transfer_frame, text="server → destination", command=self.transfer_server_to_server).pack(side="left", expand=True, fill="x", padx=2)
+        ttk.Button(transfer_frame, text="server → 여러 서버", command=self.open_fanout).pack(side="left", expand=True, fill="x", padx=2)
+        ttk.Button(transfer_frame, text="이어받기", command=self.resume_transfers).pack(side="left", padx=2)
+        ttk.Checkbutton(transfer_frame, text="동기화(변경분만)", variable=self.sync_var).pack(side="left", padx=(10, 2))
+        ttk.Checkbutton(transfer_frame, text="해시 비교", variable=self.strict_var).pack(side="left", padx=2)
+        ttk.Checkbutton(transfer_frame, text="tar 스트림", variable=self.archive_var).pack(side="left", padx=(10, 2))
+        ttk.Checkbutton(transfer_frame, text="gzip 압축", variable=self.compress_var).pack(side="left", padx=2)
+        ttk.Checkbutton(transfer_frame, text="전송 후 검증", variable=self.verify_var).pack(side="left", padx=(10, 2))
+        ttk.Label(transfer_frame, text="동시 전송:").pack(side="left", padx=(10, 2))
+        ttk.Spinbox(transfer_frame, from_=1, to=32, width=4, textvariable=self.workers_var).pack(side="left", padx=2)
+        ttk.Label(transfer_frame, text="대역폭 제한(KB/s, 0=무제한):").pack(side="left", padx=(10, 2))
+        ttk.Spinbox(transfer_frame, from_=0, to=10 ** 7, increment=1024, width=8, textvariable=self.bandwidth_var).pack(side="left", padx=2)
+
+        queue_frame = ttk.LabelFrame(self.root, text="전송 대기열", padding=(10, 5, 10, 5)); queue_frame.pack(fill="x", padx=10)
+        columns = (('label', "작업", 260), ('state', "상태", 70), ('priority', "우선순위", 70), ('progress', "진행", 420), ('limit', "대역폭 제한", 100))
+        self.queue_tree = ttk.Treeview(queue_frame, columns=[key for key, _, _ in columns], show="headings", height=5)
+        for key, label, width in columns: self.queue_tree.heading(key, text=label); self.queue_tree.column(key, width=width, stretch=(key == 'progress'))
+        self.queue_tree.pack(side="left", fill="x", expand=True)
+        queue_buttons = ttk.Frame(queue_frame); queue_buttons.pack(side="left", fill="y", padx=(5, 0))
+        for row, (text, command) in enumerate((("▲", lambda: self._queue_action(self.queue.move, -1)), ("▼", lambda: self._queue_action(self.queue.move, 1)),
+                                               ("우선순위 +", lambda: self._queue_action(self.queue.set_priority, 1)), ("우선순위 -", lambda: self._queue_action(self.queue.set_priority, -1)),
+                                               ("일시정지", lambda: self._queue_action(self.queue.pause)), ("재개", lambda: self._queue_action(self.queue.resume)),
+                                               ("취소", lambda: self._queue_action(self.queue.cancel)), ("제한 변경", self._change_bandwidth), ("정리", self.queue.clear_finished))):
+            ttk.Button(queue_buttons, text=text, width=9, command=command).grid(row=row // 3, column=row % 3, sticky="ew")
+        host_limit_frame = ttk.Frame(queue_buttons); host_limit_frame.grid(row=3, column=0, columnspan=3, sticky="w", pady=(3, 0))
+        ttk.Label(host_limit_frame, text="호스트당 동시 작업:").pack(side="left")
+        ttk.Spinbox(host_limit_frame, from_=1, to=16, width=4, textvariable=self.host_limit_var).pack(side="left", padx=2)
+        self.host_limit_var.trace_add("write", self._on_host_limit_changed)
         
         status_frame = ttk.Frame(self.root, padding=(10, 5, 10, 5)); status_frame.pack(side="bottom", fill="x", expand=False)
         self.status_label = ttk.Label(status_frame, textvariable=self.status_var, anchor="w"); self.status_label.pack(fill="x")
+        progress_frame = ttk.Frame(status_frame); progress_frame.pack(fill="x")
+        self.progress_bar = ttk.Progressbar(progress_frame, maximum=100, length=200); self.progress_bar.pack(side="left", padx=(0, 5))
+        ttk.Button(progress_frame, text="모두 취소", width=9, command=self.cancel_tasks).pack(side="right")
+        ttk.Button(progress_frame, text="통계", width=6, command=self.show_stats).pack(side="right", padx=(0, 5))
+        ttk.Label(progress_frame, textvariable=self.progress_var, anchor="w").pack(side="left", fill="x", expand=True)
 
-    def start_transfer_thread(self, target_func): thread = Thread(target=target_func, daemon=True); thread.start()
-    def _parse_item_name(self, item_string):
-        if not isinstance(item_string, str) or len(item_string) < 4: return None
-        name_part = item_string[4:50].strip(); return name_part if name_part else None
     def on_closing(self):
-        if self.source_server_frame.ssh_client: self.source_server_frame.disconnect_ssh()
-        if self.dest_server_frame.ssh_client: self.dest_server_frame.disconnect_ssh()
-        self.root.destroy()
+        self.local_watcher.close()
+        if self.source_server_frame.connection: self.source_server_frame.disconnect_ssh()
+        if self.dest_server_frame.connection: self.dest_server_frame.disconnect_ssh()
+        self.connections.close_all(); self.root.destroy()
     def on_local_path_enter(self, event): self.update_local_listbox(self.local_path_var.get())
-    def on_local_double_click(self, event):
-        indices = self.local_listbox.curselection();
-        if not indices: return
-        selected_item = self.local_listbox.get(indices[0])
-        if selected_item.strip().startswith('[D]'):
-            dir_name = self._parse_item_name(selected_item)
-            if dir_name: self.update_local_listbox(os.path.join(self.local_path_var.get(), dir_name))
+    def on_local_activate(self, entry):
+        if entry.is_dir: self.update_local_listbox(os.path.join(self.local_path_var.get(), entry.name))
     def go_up_local_dir(self): self.update_local_listbox(os.path.dirname(self.local_path_var.get()))
     
     def delete_local_items(self):
-        indices = self.local_listbox.curselection()
-        if not indices: messagebox.showinfo("정보", "삭제할 항목을 선택하세요."); return
-        if not messagebox.askyesno("삭제 확인", f"로컬 컴퓨터에서 선택한 {len(indices)}개 항목을 정말 삭제하시겠습니까?\n(폴더는 내용과 함께 삭제됩니다)"): return
-        for index in reversed(sorted(indices)):
-            item_full = self.local_listbox.get(index); item_name = self._parse_item_name(item_full)
-            if not item_name: continue
-            item_path = os.path.join(self.local_path_var.get(), item_name)
-            try:
-                if item_full.strip().startswith('[D]'): shutil.rmtree(item_path)
-                else: os.remove(item_path)
-            except Exception as e: messagebox.showerror("삭제 실패", f"{item_name} 삭제 실패:\n{e}"); break
-        self.update_local_listbox()
-    
+        """선택 항목을 백그라운드 작업자들이 지웁니다. 취소하거나 실패해도 남은 항목이 보이도록 목록을 다시 읽습니다."""
+        entries = self.local_file_list.selected_entries()
+        if not entries: messagebox.showinfo("정보", "삭제할 항목을 선택하세요."); return
+        if not messagebox.askyesno("삭제 확인", f"로컬 컴퓨터에서 선택한 {len(entries)}개 항목을 정말 삭제하시겠습니까?\n(폴더는 내용과 함께 삭제됩니다)"): return
+        items = [(os.path.join(self.local_path_var.get(), entry.name), entry.is_dir) for entry in entries]; workers = self._workers()
+        def task(progress): return local_delete_tree(items, workers, progress.cancel, progress), progress.cancel.is_set()
+        def done(result):
+            count, cancelled = result
+            self.update_status(f"로컬 삭제 {'취소됨' if cancelled else '완료'} ({count}개 항목)", "red" if cancelled else "green"); self.refresh_local_listbox()
+        def failed(error): messagebox.showerror("삭제 실패", f"로컬 삭제 실패:\n{error}"); self.refresh_local_listbox()
+        for path, _ in items: self.usage_cache.invalidate(None, path)
+        self.run_task(f"로컬 삭제: {_items_label(items)}", task, done, failed)
+
+    def calculate_local_usage(self):
+        base = self.local_path_var.get(); paths = [os.path.join(base, entry.name) for entry in self.local_file_list.selected_entries()] or [base]
+        workers = self._workers() * 2
+        self.calculate_usage("local", None, paths, lambda missing, cancel: (local_disk_usage(missing, cancel, workers), 'walk'),
+                             lambda: local_free_space(base), self.local_file_list)
+
+    def calculate_usage(self, title, host, paths, compute, free_space, file_list, connection=None):
+        """paths의 (바이트, 항목 수)를 대기열 작업으로 계산합니다. 이미 계산해 둔 경로는 다시 세지 않고,
+        결과는 메모해 목록의 폴더 크기 열과 요약 대화상자(남은 공간 포함)에 보여 줍니다. host가 None이면 로컬입니다."""
+        cached = {path: self.usage_cache.get(host, path) for path in paths}; missing = [path for path, usage in cached.items() if usage is None]
+        def task(progress):
+            computed, method = compute(missing, progress.cancel) if missing else ({}, 'cache')
+            return computed, method, free_space()
+        def done(result):
+            computed, method, free = result
+            for path, usage in computed.items(): self.usage_cache.put(host, path, usage)
+            usages = {path: computed.get(path) or cached[path] for path in paths}; file_list.redraw()
+            lines = [f"{os.path.basename(path.rstrip('/')) or path}: {format_size(size)} ({count}개 항목)" for path, (size, count) in usages.items()]
+            total = sum(size for size, _ in usages.values()); how = {'du': "서버 du", 'sftp': "SFTP 병렬 순회", 'walk': "병렬 순회", 'cache': "저장된 결과"}[method]
+            if len(lines) > 1: lines.append(f"합계: {format_size(total)} ({sum(count for _, count in usages.values())}개 항목)")
+            lines.append(f"남은 공간: {format_size(free)}" if free is not None else "남은 공간: 알 수 없음")
+            self.update_status(f"{title}: 크기 계산 완료 ({format_size(total)}, {how})", "green")
+            messagebox.showinfo(f"{title} 크기", "\n".join(lines))
+        self.run_task(f"{title} 크기 계산: {_items_label([(path,) for path in paths])}", task, done, hosts=(host,) if host else (), connections=(connection,))
+
     def update_local_listbox(self, path=None):
         current_path = path if path is not None else self.local_path_var.get()
-        self.local_path_var.set(current_path); self.local_listbox.delete(0, tk.END)
+        self.local_path_var.set(current_path)
         try:
-            items = os.listdir(current_path); dir_list, file_list = [], []
-            for item in items:
-                try:
-                    full_path = os.path.join(current_path, item)
-                    mtime = datetime.fromtimestamp(os.path.getmtime(full_path)).strftime('%Y-%m-%d %H:%M')
-                    display_name = f" [D] {item}" if os.path.isdir(full_path) else f" [F] {item}"
-                    formatted_item = f"{display_name:<50}{mtime}"
-                    if os.path.isdir(full_path): dir_list.append(formatted_item)
-                    else: file_list.append(formatted_item)
-                except OSError: continue
-            for item in sorted(dir_list) + sorted(file_list): self.local_listbox.insert(tk.END, item)
+            self.local_file_list.set_entries(scan_local_dir(current_path)); self.local_watcher.watch(current_path)
         except Exception as e: messagebox.showwarning("오류", f"로컬 디렉토리 접근 오류:\n{e}", parent=self.root)
 
+    def refresh_local_listbox(self):
+        """작업 후 호출합니다. inotify로 감시 중이면 변경분이 자동으로 반영되므로 전체를 다시 읽지 않습니다."""
+        if self.local_watcher.wd is None: self.update_local_listbox()
+
+    def _poll_local_changes(self):
+        changed, removed, rescan = self.local_watcher.poll()
+        if rescan: self.update_local_listbox()
+        elif changed or removed:
+            base = self.local_path_var.get(); upserted = []
+            for name in changed:
+                try: upserted.append(FileEntry.from_path(base, name))
+                except OSError: removed.add(name)
+            for name in set(changed) | set(removed): self.usage_cache.invalidate(None, os.path.join(base, name))
+            self.local_file_list.apply_changes(upserted, removed)
+        self.root.after(LOCAL_WATCH_POLL_MS, self._poll_local_changes)
+
+    def _selected_items(self, file_list, src_base, dst_base, src_join, dst_join):
+        """목록의 선택 항목을 (원본 경로, 대상 경로, 디렉토리 여부) 목록으로 바꿉니다."""
+        return [(src_join(src_base, entry.name), dst_join(dst_base, entry.name), entry.is_dir) for entry in file_list.selected_entries()]
+
+    def _workers(self):
+        try: return int(self.workers_var.get())
+        except (tk.TclError, ValueError): return TRANSFER_WORKERS
+
+    def _new_engine(self, kind, src_pool=None, dst_pool=None, use_journal=True, use_sync=True):
+        return TransferEngine(kind, src_pool, dst_pool, self._workers(), status=lambda message: self.update_status(message, "blue"), journal=self.journal if use_journal else None,
+                              sync=use_sync and self.sync_var.get(), strict=use_sync and self.strict_var.get(), archive=self.archive_var.get(), compress=self.compress_var.get(),
+                              verify=self.verify_var.get())
+
+    def run_task(self, label, task, on_done, on_error=None, hosts=(), connections=()):
+        """task(progress)를 전송 대기열에 넣습니다. 스케줄러가 순서와 호스트별 제한에 맞춰 백그라운드에서 실행하고,
+        완료 처리와 오류 대화상자는 Tk 스레드에서 실행합니다. 취소된 전송은 오류로 보지 않습니다.
+        connections는 작업이 실행되는 동안 풀 참조를 잡아, 그사이 창이 연결을 끊어도 풀이 닫지 않습니다."""
+        connections = [connection for connection in dict.fromkeys(connections) if connection]
+        def run(progress):
+            for connection in connections: self.connections.retain(connection)
+            try: return task(progress)
+            finally:
+                for connection in connections: self.connections.release(connection)
+        def failed(error):
+            if isinstance(error, TransferCancelled): self.update_status(f"{label} 취소됨 (이어받기로 계속할 수 있습니다)", "red")
+            elif on_error: on_error(error)
+            else: messagebox.showerror(f"{label} 실패", f"{label} 실패:\n{error}"); self.update_status(f"{label} 실패", "red")
+        try: bandwidth = max(0, int(self.bandwidth_var.get())) * 1024
+        except (tk.TclError, ValueError): bandwidth = 0
+        return self.queue.submit(label, run, hosts, bandwidth=bandwidth, on_done=on_done, on_error=failed)
+
+    def _queue_action(self, action, *args):
+        for iid in self.queue_tree.selection(): action(int(iid), *args)
+        self._refresh_queue()
+
+    def _change_bandwidth(self):
+        selection = self.queue_tree.selection()
+        if not selection: messagebox.showinfo("정보", "대역폭 제한을 바꿀 작업을 선택하세요."); return
+        rate = simpledialog.askinteger("대역폭 제한", "초당 KB (0 = 무제한):", minvalue=0, parent=self.root)
+        if rate is not None: self._queue_action(self.queue.set_bandwidth, rate * 1024)
+
+    def _on_host_limit_changed(self, *args):
+        try: self.queue.host_limit = max(1, int(self.host_limit_var.get()))
+        except (tk.TclError, ValueError): return
+        self.queue.schedule()
+
+    def _refresh_queue(self):
+        """대기열 표를 작업 목록과 맞춥니다. 순서는 대기열 순서를 따릅니다."""
+        jobs = self.queue.jobs(); existing = set(self.queue_tree.get_children())
+        for index, job in enumerate(jobs):
+            iid = str(job.id); rate = job.progress.limiter.rate
+            values = (job.label, job.state, job.priority, job.progress.summary() if job.state != TransferQueue.WAITING else "", f"{format_size(rate)}/s" if rate else "무제한")
+            if iid in existing: self.queue_tree.item(iid, values=values); self.queue_tree.move(iid, "", index)
+            else: self.queue_tree.insert("", index, iid=iid, values=values)
+        for iid in existing - {str(job.id) for job in jobs}: self.queue_tree.delete(iid)
+
     def upload_to_source(self):
-        if not self.source_server_frame.sftp_client: messagebox.showerror("오류", "Source Server에 연결하세요."); return
-        indices = self.local_listbox.curselection();
-        if not indices: messagebox.showinfo("정보", "업로드할 항목을 선택하세요."); return
-        remote_base = self.source_server_frame.path_var.get(); local_base = self.local_path_var.get(); sftp = self.source_server_frame.sftp_client
-        for index in indices:
-            item_full = self.local_listbox.get(index); item_name = self._parse_item_name(item_full)
-            if not item_name: continue
-            local_path = os.path.join(local_base, item_name); remote_path = os.path.join(remote_base, item_name).replace("\\", "/")
-            try:
-                if item_full.strip().startswith('[D]'): self._upload_dir_recursive(sftp, local_path, remote_path, "Source Server")
-                else: self.update_status(f"업로드 중: {item_name} -> Source", "blue"); sftp.put(local_path, remote_path)
-            except Exception as e: messagebox.showerror("업로드 실패", f"{item_name} 업로드 실패:\n{e}"); self.update_status("업로드 실패", "red"); return
-        self.update_status("업로드 완료", "green"); self.source_server_frame.update_listbox()
-    
-    def _upload_dir_recursive(self, sftp, local_parent, remote_parent, server_name):
-        self.update_status(f"폴더 생성: {remote_parent} on {server_name}", "blue")
-        try: sftp.mkdir(remote_parent)
-        except Exception: pass
-        for item_name in os.listdir(local_parent):
-            local_path = os.path.join(local_parent, item_name); remote_path = os.path.join(remote_parent, item_name).replace("\\", "/")
-            if os.path.isdir(local_path): self._upload_dir_recursive(sftp, local_path, remote_path, server_name)
-            else: self.update_status(f"업로드 중: {item_name} -> {server_name}", "blue"); sftp.put(local_path, remote_path)
-            
+        frame = self.source_server_frame
+        if not frame.sftp_client: messagebox.showerror("오류", "Source Server에 연결하세요."); return
+        if not self.local_file_list.selected_entries(): messagebox.showinfo("정보", "업로드할 항목을 선택하세요."); return
+        items = self._selected_items(self.local_file_list, self.local_path_var.get(), frame.path_var.get(), os.path.join, remote_join)
+        engine = self._new_engine('upload', dst_pool=frame.channel_pool); host = frame.channel_pool.host
+        def done(count):
+            self.invalidate_remote(host, [dst for _, dst, _ in items])
+            self.update_status(f"업로드 완료 ({count}개 파일)", "green"); frame.update_listbox()
+        self.run_task(f"업로드: {_items_label(items)}", lambda progress: engine.run(items, progress), done, hosts=(host,), connections=(frame.connection,))
+
     def download_from_source(self):
-        if not self.source_server_frame.sftp_client: messagebox.showerror("오류", "Source Server에 연결하세요."); return
-        indices = self.source_server_frame.listbox.curselection();
-        if not indices: messagebox.showinfo("정보", "다운로드할 항목을 선택하세요."); return
-        remote_base = self.source_server_frame.path_var.get(); local_base = self.local_path_var.get(); sftp = self.source_server_frame.sftp_client
-        for index in indices:
-            item_full = self.source_server_frame.listbox.get(index); item_name = self._parse_item_name(item_full)
-            if not item_name: continue
-            remote_path = os.path.join(remote_base, item_name).replace("\\", "/"); local_path = os.path.join(local_base, item_name)
-            try:
-                if item_full.strip().startswith('[D]'): self._download_dir_recursive(sftp, remote_path, local_path, "Source Server")
-                else: self.update_status(f"다운로드 중: {item_name} from Source", "blue"); sftp.get(remote_path, local_path)
-            except Exception as e: messagebox.showerror("다운로드 실패", f"{item_name} 다운로드 실패:\n{e}"); self.update_status("다운로드 실패", "red"); return
-        self.update_status("다운로드 완료", "green"); self.update_local_listbox()
-
-    def _download_dir_recursive(self, sftp, remote_parent, local_parent, server_name):
-        self.update_status(f"폴더 생성: {local_parent}", "blue"); os.makedirs(local_parent, exist_ok=True)
-        for attr in sftp.listdir_attr(remote_parent):
-            remote_path = f"{remote_parent}/{attr.filename}".replace("\\", "/"); local_path = os.path.join(local_parent, attr.filename)
-            if stat.S_ISDIR(attr.st_mode): self._download_dir_recursive(sftp, remote_path, local_path, server_name)
-            else: self.update_status(f"다운로드 중: {attr.filename} from {server_name}", "blue"); sftp.get(remote_path, local_path)
+        frame = self.source_server_frame
+        if not frame.sftp_client: messagebox.showerror("오류", "Source Server에 연결하세요."); return
+        if not frame.file_list.selected_entries(): messagebox.showinfo("정보", "다운로드할 항목을 선택하세요."); return
+        items = self._selected_items(frame.file_list, frame.path_var.get(), self.local_path_var.get(), remote_join, os.path.join)
+        engine = self._new_engine('download', src_pool=frame.channel_pool)
+        def done(count):
+            for _, dst, _ in items: self.usage_cache.invalidate(None, dst)
+            self.update_status(f"다운로드 완료 ({count}개 파일)", "green"); self.refresh_local_listbox()
+        self.run_task(f"다운로드: {_items_label(items)}", lambda progress: engine.run(items, progress), done, hosts=(frame.channel_pool.host,),
+                      connections=(frame.connection,))
 
     def transfer_server_to_server(self):
         source_frame = self.source_server_frame; dest_frame = self.dest_server_frame
         if not source_frame.sftp_client: messagebox.showerror("오류", "Source Server에 연결하세요."); return
         if not dest_frame.sftp_client: messagebox.showerror("오류", "Destination Server에 연결하세요."); return
-        indices = source_frame.listbox.curselection()
-        if not indices: messagebox.showinfo("정보", "전송할 항목을 Source Server에서 선택하세요."); return
+        if not source_frame.file_list.selected_entries(): messagebox.showinfo("정보", "전송할 항목을 Source Server에서 선택하세요."); return
+        items = self._selected_items(source_frame.file_list, source_frame.path_var.get(), dest_frame.path_var.get(), remote_join, remote_join)
+        engine = self._new_engine('relay', source_frame.channel_pool, dest_frame.channel_pool); host = dest_frame.channel_pool.host
+        def done(count):
+            self.invalidate_remote(host, [dst for _, dst, _ in items])
+            self.update_status(f"서버 간 전송 완료 ({count}개 파일)", "green"); dest_frame.update_listbox()
+        def failed(error):
+            # 직접 전송용 채널을 열 수 없을 때만 임시 디렉토리 방식으로 다시 시도합니다. 검증 실패, 권한 오류 등은 그대로 알립니다.
+            if isinstance(error, RelayUnavailable):
+                self.update_status(f"직접 전송 실패, 임시 디렉토리 방식으로 재시도: {error}", "red")
+                self._transfer_via_temp_dir(source_frame, dest_frame, items); return
+            messagebox.showerror("공간 부족" if isinstance(error, InsufficientSpace) else "서버 간 전송 실패", str(error))
+            self.update_status(f"서버 간 전송 실패: {error}", "red")
+        self.run_task(f"서버 간 전송: {_items_label(items)}", lambda progress: engine.run(items, progress), done, failed, hosts=(source_frame.channel_pool.host, host),
+                      connections=(source_frame.connection, dest_frame.connection))
+
+    def open_fanout(self):
+        frame = self.source_server_frame
+        if not frame.connection: messagebox.showerror("오류", "Source Server에 연결하세요."); return
+        if not frame.file_list.selected_entries(): messagebox.showinfo("정보", "배포할 항목을 Source Server에서 선택하세요."); return
+        FanoutDialog(self, frame.connection)
+
+    def fanout_to_servers(self, configs, dst_base):
+        """Source Server의 선택 항목을 여러 프로필의 서버에 동시에 보냅니다. 파일마다 원본을 한 번만 읽고, 한 서버의 실패는
+        그 서버의 결과에만 남습니다. 대상 연결도 작업 안에서 동시에 맺습니다."""
+        frame = self.source_server_frame; source = frame.connection; workers = self._workers()
+        items = self._selected_items(frame.file_list, frame.path_var.get(), dst_base, remote_join, remote_join)
+        def connect(config): return self.connections.acquire(config['ip'], int(config['port']), config['user'], config.get('pwd'), config.get('transport'))[0]
+        def task(progress):
+            connections, results = {}, {}
+            with ThreadPoolExecutor(max_workers=len(configs)) as executor:
+                futures = {ProfileIndex.display_name(config): executor.submit(connect, config) for config in configs}
+            for name, future in futures.items():
+                try: connections[name] = future.result()
+                except Exception as e: results[name] = {'sent': 0, 'failed': [], 'dropped': e}
+            try:
+                if connections: results.update(FanoutTransfer(source, connections, workers, lambda message: self.update_status(message, "blue")).run(items, progress))
+            finally:
+                for connection in connections.values(): self.connections.release(connection)
+            return results, {name: connection.host for name, connection in connections.items()}
+        def done(result):
+            results, hosts = result; lines = []
+            for name, outcome in results.items():
+                line = f"{name}: {outcome['sent']}개 파일 전송"
+                if outcome['failed']: line += f", 실패 {len(outcome['failed'])}개 ({outcome['failed'][0][1]})"
+                if outcome['dropped']: line += f", 중단됨: {outcome['dropped']}"
+                lines.append(line)
+            for host in set(hosts.values()): self.invalidate_remote(host, [dst for _, dst, _ in items])
+            ok = all(not outcome['failed'] and not outcome['dropped'] for outcome in results.values())
+            self.update_status(f"배포 {'완료' if ok else '일부 실패'} ({len(results)}개 서버)", "green" if ok else "red")
+            (messagebox.showinfo if ok else messagebox.showwarning)("배포 결과", "\n".join(lines))
+        hosts = (source.host, *(f"{config['ip']}:{config['port']}" for config in configs))
+        self.run_task(f"배포: {_items_label(items)} → {len(configs)}개 서버", task, done, hosts=hosts, connections=(source,))
+
+    def _transfer_via_temp_dir(self, source_frame, dest_frame, items):
         temp_dir = tempfile.mkdtemp(prefix="sftp-transfer-"); self.update_status("임시 디렉토리 생성: " + temp_dir, "blue")
-        try:
-            remote_base = source_frame.path_var.get(); sftp_source = source_frame.sftp_client
-            for index in indices:
-                item_full = source_frame.listbox.get(index); item_name = self._parse_item_name(item_full)
-                if not item_name: continue
-                remote_path = os.path.join(remote_base, item_name).replace("\\", "/"); local_path = os.path.join(temp_dir, item_name)
-                if item_full.strip().startswith('[D]'): self._download_dir_recursive(sftp_source, remote_path, local_path, "Source")
-                else: self.update_status(f"임시 다운로드: {item_name}", "blue"); sftp_source.get(remote_path, local_path)
-            dest_base = dest_frame.path_var.get(); sftp_dest = dest_frame.sftp_client
-            for item_name in os.listdir(temp_dir):
-                local_path = os.path.join(temp_dir, item_name); remote_path = os.path.join(dest_base, item_name).replace("\\", "/")
-                if os.path.isdir(local_path): self._upload_dir_recursive(sftp_dest, local_path, remote_path, "Destination")
-                else: self.update_status(f"서버로 업로드: {item_name}", "blue"); sftp_dest.put(local_path, remote_path)
+        downloads, uploads = [], []
+        for src, dst, is_dir in items:
+            temp_path = os.path.join(temp_dir, os.path.basename(dst)); downloads.append((src, temp_path, is_dir)); uploads.append((temp_path, dst, is_dir))
+        # 임시 디렉토리는 실패 시 지워지므로 이어받기 저널에 기록하지 않습니다.
+        download_engine = self._new_engine('download', src_pool=source_frame.channel_pool, use_journal=False, use_sync=False)
+        upload_engine = self._new_engine('upload', dst_pool=dest_frame.channel_pool, use_journal=False); host = dest_frame.channel_pool.host
+        def task(progress):
+            try: download_engine.run(downloads, progress); return upload_engine.run(uploads, progress)
+            finally: shutil.rmtree(temp_dir, ignore_errors=True); self.update_status("임시 디렉토리 삭제", "blue")
+        def done(count):
+            self.invalidate_remote(host, [dst for _, dst, _ in items])
             self.update_status("서버 간 전송 완료", "green"); dest_frame.update_listbox()
-        except Exception as e: messagebox.showerror("전송 실패", f"서버 간 전송 실패:\n{e}"); self.update_status("서버 간 전송 실패", "red")
-        finally: shutil.rmtree(temp_dir); self.update_status("임시 디렉토리 삭제", "blue")
+        self.run_task(f"서버 간 전송(임시 디렉토리): {_items_label(items)}", task, done, hosts=(source_frame.channel_pool.host, host),
+                      connections=(source_frame.connection, dest_frame.connection))
+
+    def invalidate_remote(self, host, paths):
+        """삭제·업로드·전송처럼 원격 내용을 바꾼 뒤, 같은 서버에 연결된 모든 창에서 해당 경로와 부모 디렉토리의 캐시된 목록을 버립니다."""
+        for frame in (self.source_server_frame, self.dest_server_frame):
+            if not frame.channel_pool or frame.channel_pool.host != host: continue
+            for path in paths: frame.invalidate_listing(path); frame.invalidate_listing(posixpath.dirname(path.rstrip('/')) or '/', recursive=False)
+        for path in paths: self.usage_cache.invalidate(host, path)
+
+    def resume_transfers(self):
+        """저널에 남은 중단된 작업을 현재 연결된 서버로 다시 실행합니다. 완료된 파일은 건너뛰고, 나머지는 확인된 오프셋부터 이어받습니다."""
+        entries = self.journal.pending()
+        if not any(not entry['done'] for entry in entries): messagebox.showinfo("정보", "이어받을 전송이 없습니다."); return
+        pools = {frame.channel_pool.host: frame.channel_pool for frame in (self.source_server_frame, self.dest_server_frame) if frame.channel_pool}
+        groups = {}
+        for entry in entries: groups.setdefault((entry['kind'], entry['src_host'], entry['dst_host']), []).append(TransferJob(entry['src'], entry['dst'], entry['size'], entry.get('mtime')))
+        runnable, skipped = [], 0
+        for (kind, src_host, dst_host), jobs in groups.items():
+            if (src_host and src_host not in pools) or (dst_host and dst_host not in pools): skipped += len(jobs); continue
+            runnable.append((self._new_engine(kind, pools.get(src_host), pools.get(dst_host), use_sync=False), jobs))
+        def done(resumed):
+            message = f"이어받기 완료 ({resumed}개 파일)" + (f", 연결되지 않은 서버의 작업 {skipped}개는 남겨 둠" if skipped else "")
+            self.update_status(message, "green"); self.refresh_local_listbox()
+            for frame in (self.source_server_frame, self.dest_server_frame): frame.invalidate_listing(); frame.update_listbox()
+        pools = [pool for engine, _ in runnable for pool in (engine.src_pool, engine.dst_pool) if pool]; hosts = [pool.host for pool in pools]
+        self.run_task("이어받기", lambda progress: sum(engine.execute([], engine.refresh_sources(jobs), progress) for engine, jobs in runnable), done, hosts=hosts,
+                      connections=[pool.connection for pool in pools])
+
+    def _report_startup_time(self):
+        elapsed = (time.perf_counter() - STARTED_AT) * 1000
+        self.update_status(f"대기 중 (시작 시간 {elapsed:.0f} ms, 목표 {STARTUP_BUDGET_MS} ms)", "black" if elapsed <= STARTUP_BUDGET_MS else "red")
+
+    def refresh_profile_lists(self):
+        """프로필을 추가·삭제·저장한 뒤 두 창의 목록을 함께 새로 고칩니다."""
+        for frame in (self.source_server_frame, self.dest_server_frame): frame.load_profiles_to_listbox()
+
+    def show_stats(self):
+        if self.stats_window and self.stats_window.winfo_exists(): self.stats_window.lift(); return
+        self.stats_window = StatsWindow(self.root)
+
+    def cancel_tasks(self):
+        """대기 중이거나 진행 중인 모든 작업에 취소를 알립니다. 각 작업은 진행 중인 요청만 마치고 멈춥니다."""
+        self.queue.cancel_all()
+
+    def run_on_ui(self, func, *args):
+        """다른 스레드에서 Tk 작업을 예약합니다. 다음 틱에 Tk 스레드가 실행합니다."""
+        self._ui_calls.put((func, args))
 
     def update_status(self, message, color="black"):
-        self.status_var.set(f"상태: {message}"); self.status_label.config(foreground=color); self.root.update_idletasks()
+        """어느 스레드에서든 호출할 수 있습니다. Tk 스레드가 아니면 마지막 메시지만 남겨 두었다가 다음 틱에 반영합니다."""
+        if current_thread() is main_thread(): self.status_var.set(f"상태: {message}"); self.status_label.config(foreground=color)
+        else: self._pending_status = (message, color)
+
+    def _tick(self):
+        """주기적으로 예약된 Tk 작업, 마지막 상태 메시지, 작업별 진행률을 반영합니다. 전송 스레드는 Tk를 직접 건드리지 않습니다."""
+        try:
+            while True:
+                func, args = self._ui_calls.get_nowait()
+                try: func(*args)
+                except Exception as e: self.status_var.set(f"상태: 오류 - {e}")
+        except Empty: pass
+        pending, self._pending_status = self._pending_status, None
+        if pending: self.update_status(*pending)
+        running = [job.progress for job in self.queue.running()]; self._refresh_queue()
+        if running:
+            self.progress_var.set(" | ".join(progress.describe() for progress in running))
+            self.progress_bar.config(value=100 * sum(progress.fraction() for progress in running) / len(running))
+        else: self.progress_var.set(""); self.progress_bar.config(value=0)
+        self.root.after(PROGRESS_TICK_MS, self._tick)
 
 if __name__ == "__main__":
     root = ThemedTk(theme="ubuntu")
@@ -0,0 +1,119 @@
+"""core.py의 네트워크 없는 구성 요소 테스트: 저널, 토큰 버킷, 목록 캐시, sha256sum 해석, 전송 대기열"""
+import json
+import time
+from threading import Event
+
+import core
+from core import ListingCache, TokenBucket, TransferJournal, TransferQueue, _parse_sha256sum
+
+def saved(journal):
+    try:
+        with open(journal.path, encoding='utf-8') as f: return json.load(f)
+    except FileNotFoundError: return None
+
+def begin(journal, name, size=100, mtime=1000.0):
+    key = TransferJournal.key('upload', None, f"/src/{name}", 'host:22', f"/dst/{name}")
+    return key, journal.begin(key, 'upload', None, f"/src/{name}", 'host:22', f"/dst/{name}", size, mtime)
+
+# TransferJournal
+
+def test_journal_batches_finish_until_file_threshold(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, 'JOURNAL_FLUSH_FILES', 3); monkeypatch.setattr(core, 'JOURNAL_FLUSH_SECONDS', 3600)
+    journal = TransferJournal(str(tmp_path / 'journal.json'))
+    for name in ('a', 'b'): journal.finish(begin(journal, name)[0])
+    assert saved(journal) is None
+    journal.finish(begin(journal, 'c')[0])
+    assert all(entry['done'] for entry in saved(journal).values()) and len(saved(journal)) == 3
+
+def test_journal_flushes_offsets_by_bytes_and_time(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, 'JOURNAL_FLUSH_BYTES', 1000); monkeypatch.setattr(core, 'JOURNAL_FLUSH_SECONDS', 3600)
+    journal = TransferJournal(str(tmp_path / 'journal.json')); key, _ = begin(journal, 'a', size=5000)
+    journal.update(key, 500); assert saved(journal) is None
+    journal.update(key, 1500); assert saved(journal)[key]['offset'] == 1500
+    monkeypatch.setattr(core, 'JOURNAL_FLUSH_SECONDS', 0)
+    journal.update(key, 1600); assert saved(journal)[key]['offset'] == 1600
+
+def test_journal_resumes_only_unchanged_source(tmp_path):
+    path = str(tmp_path / 'journal.json'); journal = TransferJournal(path); key, _ = begin(journal, 'a')
+    journal.update(key, 40); journal.save()
+    journal = TransferJournal(path)
+    assert begin(journal, 'a')[1]['offset'] == 40
+    assert begin(journal, 'a', mtime=1000.5)[1]['offset'] == 40          # MTIME_TOLERANCE 안의 차이
+    journal.update(key, 40)
+    assert begin(journal, 'a', mtime=2000.0)[1]['offset'] == 0           # 같은 크기로 고쳐진 원본은 처음부터
+    journal.update(key, 40)
+    assert begin(journal, 'a', size=101, mtime=2000.0)[1]['offset'] == 0
+    journal.discard([key]); assert saved(journal) == {}
+
+# TokenBucket
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(100_000); started = time.monotonic()
+    for _ in range(6): bucket.consume(50_000)        # 처음 1초 분량은 버킷에 있으므로 나머지 200 KB에 약 2초
+    assert 1.7 <= time.monotonic() - started <= 3.0
+
+def test_token_bucket_unlimited_and_cancel():
+    bucket = TokenBucket(0); started = time.monotonic(); bucket.consume(10 ** 9)
+    assert time.monotonic() - started < 0.1
+    bucket.set_rate(1000); cancel = Event(); cancel.set(); started = time.monotonic(); bucket.consume(10 ** 6, cancel)
+    assert time.monotonic() - started < 0.5
+
+# ListingCache
+
+def test_listing_cache_ttl():
+    cache = ListingCache(ttl=0.05); cache.put('/a/', ['x'])
+    assert cache.get('/a') == ['x']
+    time.sleep(0.1)
+    assert cache.get('/a') is None
+
+def test_listing_cache_lru_eviction_and_invalidate():
+    cache = ListingCache(max_entries=2); cache.put('/a', [1]); cache.put('/b', [2])
+    cache.get('/a'); cache.put('/c', [3])                # /b가 가장 오래 안 쓴 항목
+    assert cache.get('/b') is None and cache.get('/a') == [1] and cache.get('/c') == [3]
+    cache.put('/a/x', [4]); cache.invalidate('/a', recursive=True)
+    assert cache.get('/a') is None and cache.get('/a/x') is None and cache.get('/c') == [3]
+
+# _parse_sha256sum
+
+def test_parse_sha256sum_escaped_names():
+    digest = 'ab' * 32
+    output = f"{digest}  /plain name\n\\{digest}  /new\\nline\n\\{digest}  /back\\\\slash\n"
+    assert _parse_sha256sum(output) == {'/plain name': digest, '/new\nline': digest, '/back\\slash': digest}
+
+# TransferQueue
+
+def blocking(started, release, name):
+    def task(progress): started.append(name); release.wait(5); return name
+    return task
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline: raise AssertionError("시간 안에 조건을 만족하지 못함")
+        time.sleep(0.01)
+
+def test_queue_runs_higher_priority_first():
+    queue = TransferQueue(max_running=1, host_limit=1); started = []; release = Event()
+    queue.submit('first', blocking(started, release, 'first'))
+    wait_for(lambda: started == ['first'])
+    queue.submit('low', blocking(started, release, 'low')); queue.submit('high', blocking(started, release, 'high'), priority=5)
+    release.set()
+    wait_for(lambda: all(job.state == TransferQueue.DONE for job in queue.jobs()))
+    assert started == ['first', 'high', 'low']
+
+def test_queue_respects_host_limit():
+    queue = TransferQueue(max_running=4, host_limit=1); started = []; release = Event()
+    first = queue.submit('a1', blocking(started, release, 'a1'), hosts=('a:22',))
+    second = queue.submit('a2', blocking(started, release, 'a2'), hosts=('a:22',))
+    other = queue.submit('b1', blocking(started, release, 'b1'), hosts=('b:22',))
+    wait_for(lambda: sorted(started) == ['a1', 'b1'])
+    assert second.state == TransferQueue.WAITING and first.state == other.state == TransferQueue.RUNNING
+    release.set()
+    wait_for(lambda: second.state == TransferQueue.DONE)
+
+def test_queue_cancel_waiting_job():
+    queue = TransferQueue(max_running=1); started = []; release = Event(); errors = []
+    queue.submit('first', blocking(started, release, 'first')); waiting = queue.submit('second', blocking(started, release, 'second'), on_error=errors.append)
+    queue.cancel(waiting.id); release.set()
+    wait_for(lambda: queue.jobs()[0].state == TransferQueue.DONE)
+    assert waiting.state == TransferQueue.CANCELLED and started == ['first']
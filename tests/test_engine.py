@@ -0,0 +1,149 @@
+"""TransferEngine을 bench.py의 프로세스 안 SFTP 서버에 대고 실행하는 테스트"""
+import hashlib
+import os
+from threading import Lock
+
+import pytest
+
+import core
+from bench import BenchServer
+from core import FanoutTransfer, SshConnectionPool, TransferCancelled, TransferEngine, TransferJournal, TransferProgress
+
+def sha256(path):
+    with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+def write_random(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f: f.write(os.urandom(size))
+
+@pytest.fixture
+def remote_root(tmp_path):
+    root = tmp_path / 'remote'; root.mkdir(); return root
+
+@pytest.fixture
+def pool():
+    pool = SshConnectionPool()
+    yield pool
+    pool.close_all()
+
+def connect(pool, server): return pool.acquire('127.0.0.1', server.port, 'bench', 'bench')[0]
+
+class DroppingProgress(TransferProgress):
+    """전송한 바이트가 after를 넘으면 서버 쪽 SSH 연결을 모두 한 번 끊습니다."""
+    def __init__(self, label, server, after):
+        super().__init__(label); self.server = server; self.after = after; self.sent = 0; self.dropped = False; self._drop_lock = Lock()
+
+    def transferred(self, count):
+        with self._drop_lock:
+            self.sent += count; drop = not self.dropped and self.sent >= self.after
+            if drop: self.dropped = True
+        if drop:
+            for transport in list(self.server.transports): transport.close()
+        super().transferred(count)
+
+@pytest.fixture
+def segmented(monkeypatch):
+    """1 MB 이상을 구간 전송으로 보내고, 작은 청크마다 저널 위치를 확인하게 합니다."""
+    monkeypatch.setattr(core, 'SEGMENT_THRESHOLD', 1024 * 1024)
+    monkeypatch.setattr(core, 'RELAY_CHUNK_SIZE', 256 * 1024); monkeypatch.setattr(core, 'JOURNAL_CONFIRM_BYTES', 256 * 1024)
+
+@pytest.mark.parametrize('kind', ['upload', 'download'])
+def test_segmented_resume_after_dropped_connection(tmp_path, remote_root, pool, segmented, kind):
+    """구간 전송 중 연결이 끊겨 저널의 구간 위치부터 이어받아도 결과가 원본과 같아야 합니다.
+    (미리 크기를 잡은 .part 파일에서는 응답을 받지 않은 쓰기의 위치가 저널에 남으면 이어받기가 빈 부분을 건너뜁니다.)"""
+    server = BenchServer(str(remote_root), bandwidth=8 * 1024 * 1024); size = 8 * 1024 * 1024
+    try:
+        connection = connect(pool, server); local, remote = str(tmp_path / 'local' / 'big.bin'), str(remote_root / 'big.bin')
+        write_random(local if kind == 'upload' else remote, size); os.makedirs(os.path.dirname(local), exist_ok=True)
+        journal = TransferJournal(str(tmp_path / 'journal.json')); progress = DroppingProgress(kind, server, size // 3)
+        if kind == 'upload': engine = TransferEngine('upload', dst_pool=connection.channels, workers=2, journal=journal); items = [(local, '/big.bin', False)]
+        else: engine = TransferEngine('download', src_pool=connection.channels, workers=2, journal=journal); items = [('/big.bin', local, False)]
+        assert engine.run(items, progress) == 1
+        assert progress.dropped and connection.generation > 0
+        assert sha256(local) == sha256(remote)
+    finally: server.close()
+
+class CancellingProgress(TransferProgress):
+    """전송한 바이트가 after를 넘으면 취소합니다."""
+    def __init__(self, label, after): super().__init__(label); self.after = after; self.sent = 0; self._count_lock = Lock()
+
+    def transferred(self, count):
+        with self._count_lock: self.sent += count; cancel = self.sent >= self.after
+        if cancel: self.cancel.set()
+        super().transferred(count)
+
+def make_tree(root):
+    """폴더 두 단계와 빈 파일, 여러 크기의 파일이 있는 트리. {상대 경로: sha256}을 돌려줍니다."""
+    files = {'a.bin': 300_000, 'empty': 0, 'sub/b.bin': 70_000, 'sub/deeper/c.bin': 1_500_000}
+    for name, size in files.items(): write_random(os.path.join(root, name), size)
+    return {name: sha256(os.path.join(root, name)) for name in files}
+
+def tree_hashes(root, names): return {name: sha256(os.path.join(root, name)) for name in names}
+
+@pytest.fixture
+def server(remote_root):
+    server = BenchServer(str(remote_root))
+    yield server
+    server.close()
+
+def test_upload_and_download_tree(tmp_path, remote_root, server, pool):
+    connection = connect(pool, server); expected = make_tree(str(tmp_path / 'local' / 'tree'))
+    upload = TransferEngine('upload', dst_pool=connection.channels, workers=4)
+    assert upload.run([(str(tmp_path / 'local' / 'tree'), '/tree', True)], TransferProgress('upload')) == len(expected)
+    assert tree_hashes(str(remote_root / 'tree'), expected) == expected
+    download = TransferEngine('download', src_pool=connection.channels, workers=4); progress = TransferProgress('download')
+    assert download.run([('/tree', str(tmp_path / 'back'), True)], progress) == len(expected)
+    assert tree_hashes(str(tmp_path / 'back'), expected) == expected
+    assert progress.total_bytes == sum(os.path.getsize(os.path.join(tmp_path / 'back', name)) for name in expected)
+
+def test_relay_between_servers(tmp_path, remote_root, server, pool):
+    other_root = tmp_path / 'other'; other_root.mkdir(); other = BenchServer(str(other_root))
+    try:
+        expected = make_tree(str(remote_root / 'tree')); src, dst = connect(pool, server), connect(pool, other)
+        engine = TransferEngine('relay', src.channels, dst.channels, workers=4)
+        assert engine.run([('/tree', '/copy', True)], TransferProgress('relay')) == len(expected)
+        assert tree_hashes(str(other_root / 'copy'), expected) == expected
+    finally: other.close()
+
+def test_segmented_upload(tmp_path, remote_root, server, pool, segmented):
+    connection = connect(pool, server); local = str(tmp_path / 'local' / 'big.bin'); write_random(local, 5 * 1024 * 1024 + 123)
+    engine = TransferEngine('upload', dst_pool=connection.channels, workers=2)
+    assert engine.run([(local, '/big.bin', False)], TransferProgress('upload')) == 1
+    assert sha256(local) == sha256(str(remote_root / 'big.bin'))
+    assert not os.path.exists(str(remote_root / 'big.bin') + core.PART_SUFFIX)
+
+@pytest.mark.parametrize('segments', [False, True])
+def test_cancel_then_resume_from_journal(tmp_path, remote_root, server, pool, segmented, monkeypatch, segments):
+    """취소한 전송을 같은 저널로 다시 실행하면 확인된 위치부터 이어받아 원본과 같은 결과를 냅니다 (순차 전송과 구간 전송)."""
+    if not segments: monkeypatch.setattr(core, 'SEGMENT_THRESHOLD', 1 << 40)
+    size = 5 * 1024 * 1024
+    connection = connect(pool, server); local = str(tmp_path / 'local' / 'big.bin'); write_random(local, size)
+    journal = TransferJournal(str(tmp_path / 'journal.json')); items = [(local, '/big.bin', False)]
+    with pytest.raises(TransferCancelled):
+        TransferEngine('upload', dst_pool=connection.channels, workers=2, journal=journal).run(items, CancellingProgress('upload', size // 2))
+    entry = next(iter(journal.pending()))
+    assert not entry['done'] and (entry['offset'] or sum(offset - int(start) for start, offset in entry.get('segments', {}).items()))
+    journal = TransferJournal(journal.path); progress = TransferProgress('resume')
+    assert TransferEngine('upload', dst_pool=connection.channels, workers=2, journal=journal).run(items, progress) == 1
+    assert sha256(local) == sha256(str(remote_root / 'big.bin'))
+    assert journal.pending() == []
+
+@pytest.fixture
+def destinations(tmp_path):
+    servers = {}
+    for name in ('d1', 'd2'): root = tmp_path / name; root.mkdir(); servers[name] = BenchServer(str(root))
+    yield servers
+    for server in servers.values(): server.close()
+
+def test_fanout_to_two_servers(tmp_path, remote_root, server, pool, destinations):
+    expected = make_tree(str(remote_root / 'tree'))
+    transfer = FanoutTransfer(connect(pool, server), {name: connect(pool, dst) for name, dst in destinations.items()}, workers=2)
+    results = transfer.run([('/tree', '/tree', True)], TransferProgress('fanout'))
+    assert all(result == {'sent': len(expected), 'failed': [], 'dropped': None} for result in results.values())
+    for name in destinations: assert tree_hashes(str(tmp_path / name / 'tree'), expected) == expected
+
+def test_fanout_cancel_leaves_no_partial_files(tmp_path, remote_root, server, pool, destinations):
+    write_random(str(remote_root / 'big.bin'), 4 * 1024 * 1024)
+    transfer = FanoutTransfer(connect(pool, server), {name: connect(pool, dst) for name, dst in destinations.items()}, workers=1)
+    with pytest.raises(TransferCancelled): transfer.run([('/big.bin', '/big.bin', False)], CancellingProgress('fanout', 1024 * 1024))
+    for name in destinations: assert os.listdir(tmp_path / name) == []
@@ -0,0 +1,12 @@
+"""plan_tree 전송 계획 테스트"""
+import os
+
+from core import _local_plan_list_dir, plan_tree
+
+def test_local_plan_skips_directory_symlinks(tmp_path):
+    """자기 자신을 가리키는 링크가 있어도 끝나야 하고, 파일 링크는 대상 파일의 크기로 계획합니다."""
+    src = tmp_path / 'src'; (src / 'sub').mkdir(parents=True); (src / 'sub' / 'a.txt').write_bytes(b'x' * 100)
+    os.symlink('.', src / 'loop'); os.symlink(src / 'sub', src / 'sub_link'); os.symlink(src / 'sub' / 'a.txt', src / 'a_link'); os.symlink(src / 'missing', src / 'broken')
+    dirs, files = plan_tree(str(src), '/dst', _local_plan_list_dir, os.path.join)
+    assert sorted(dirs) == ['/dst', '/dst/sub']
+    assert sorted((job.dst, job.size) for job in files) == [('/dst/a_link', 100), ('/dst/sub/a.txt', 100)]
@@ -0,0 +1,23 @@
+"""SshConnectionPool 참조 수 테스트 (네트워크 연결 없이 SshConnection 객체만 씁니다)"""
+from core import SshConnection, SshConnectionPool
+
+def make(pool, key='user@host:22'):
+    connection = SshConnection(key, 'host', 22, 'user', 'pwd', {}); pool._connections[key] = connection; connection.refs = 1
+    return connection
+
+def test_retained_connection_survives_window_disconnect():
+    """대기열 작업이 잡은 연결은 창이 연결을 끊어도(참조 해제) 유휴 정리에서 닫히지 않습니다."""
+    pool = SshConnectionPool(idle_timeout=0); connection = make(pool)
+    pool.retain(connection); pool.release(connection)
+    pool.release(make(pool, 'other@host:22'))            # 다른 호출이 유휴 정리를 돌려도
+    assert pool._connections.get(connection.key) is connection
+    pool.release(connection)
+    assert connection.key not in pool._connections
+
+def test_release_closes_connection_replaced_in_pool():
+    """작업 중에 같은 프로필로 새 연결이 풀에 들어가면, 작업이 끝날 때 예전 연결을 닫습니다."""
+    pool = SshConnectionPool(); old = make(pool); pool.retain(old); pool.release(old)
+    del pool._connections[old.key]; new = make(pool)
+    closed = []; old.close = lambda: closed.append(old)
+    pool.release(old)
+    assert closed == [old] and pool._connections[old.key] is new